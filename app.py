@@ -1,120 +1,401 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+import time
+APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import (Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context,
+                   send_from_directory, g)
+from markupsafe import Markup, escape
+import click
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import json
 import sys
 import subprocess
 import tempfile
+import threading
+import logging
+import atexit
 from datetime import datetime
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import cross_val_score
+import csv
+import io
+from contact_store import ContactStore, ContactIndex, CONTACT_COLUMNS
+from contact_intake import ContactIntake
+from sandbox_pool import SandboxPool, POOL_SUPPORTED
+from run_limits import RunLimits, UsageStats, spawner, run_limited, outcome_of, describe_exit
+from compile_cache import CompileCache, compiler_version, cache_key
+from code_jobs import JobScheduler
+from static_assets import AssetBuilder, StaticAssets, IMAGE_FORMATS
+from page_cache import PageCache
+from metrics import registry, stage_timer, SlowRequestProfiler
+from rate_limits import AdmissionControl
+from pass_predictor import (get_pass_model, reload_pass_model, publish_pass_model, predict_pass, PASS_FEATURES,
+                            pass_factors, describe_prediction, parse_student, read_students_csv, expand_grid,
+                            marginal_effects)
+from mood_analyzer import get_mood_analyzer, load_sentiment_model, iter_chunks, mood_cache, ANALYSIS_MODES
+from micro_batching import BATCHERS
 
 app = Flask(__name__)
 
+# One key=value line per event; LOG_LEVEL=DEBUG adds per-submission detail, WARNING keeps only problems
+logging.basicConfig(format='%(asctime)s level=%(levelname)s logger=%(name)s %(message)s')
+logger = logging.getLogger('portfolio')
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
 # Configuration
 app.config['SECRET_KEY'] = 'rishab-portfolio-2025-secret-key'
 
-# JSON file to store contact submissions
-CONTACT_FILE = 'contact_submissions.json'
+# Texts scored per predict_proba call by /api/mood-analysis/batch (overridable with ?batch_size=)
+app.config['MOOD_BATCH_SIZE'] = 256
+app.config['MOOD_BATCH_MAX_SIZE'] = 2000
 
-# Initialize contact file if it doesn't exist
-def init_contact_file():
-    if not os.path.exists(CONTACT_FILE):
-        with open(CONTACT_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+# Upper bounds for /api/pass-predict/batch rows and /api/pass-predict/grid points
+app.config['PASS_BATCH_MAX_ROWS'] = 10000
+app.config['PASS_GRID_MAX_POINTS'] = 50000
 
-# Save contact submission to JSON
-def save_contact_submission(data):
-    try:
-        # Read existing submissions
-        if os.path.exists(CONTACT_FILE):
-            with open(CONTACT_FILE, 'r', encoding='utf-8') as f:
-                submissions = json.load(f)
-        else:
-            submissions = []
-        
-        # Add new submission with timestamp and ID
-        submission = {
-            'id': len(submissions) + 1,
-            'timestamp': datetime.now().isoformat(),
-            'name': data['name'],
-            'email': data['email'],
-            'subject': data['subject'],
-            'message': data['message']
-        }
-        
-        submissions.append(submission)
-        
-        # Write back to file
-        with open(CONTACT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(submissions, f, ensure_ascii=False, indent=2)
-        
-        return True
-    except Exception as e:
-        print(f"Error saving contact submission: {e}")
-        return False
+# When the heavy subsystems (scikit-learn, pandas, NLTK and the pickled models) are loaded:
+#   'eager'      - while app.py is imported; use with gunicorn --preload so forked workers share them
+#   'background' - in a daemon thread right after import, while the worker already serves requests
+#   'lazy'       - only when a route first needs them
+app.config['MODEL_PRELOAD'] = os.environ.get('MODEL_PRELOAD', 'background')
+
+# Contact submissions are appended to a JSON Lines file, one record per line
+CONTACT_FILE = 'contact_submissions.jsonl'
+# Previous format (a single JSON array), imported once into CONTACT_FILE
+LEGACY_CONTACT_FILE = 'contact_submissions.json'
+
+# fsync per write ('always'), batched in the background ('group') or left to the OS ('never')
+contact_store = ContactStore(CONTACT_FILE, fsync=os.environ.get('CONTACT_FSYNC', 'group'))
+
+# SQLite index over CONTACT_FILE that backs the /admin/contacts views
+CONTACT_DB_FILE = 'contact_submissions.sqlite3'
+contact_index = ContactIndex(CONTACT_DB_FILE, contact_store)
+
+# Page size limits for /admin/contacts
+app.config['CONTACTS_PAGE_SIZE'] = 50
+app.config['CONTACTS_MAX_PAGE_SIZE'] = 500
+
+# Contact form submissions wait on a bounded queue for the background writer; when it is
+# full the API answers 503 with Retry-After instead of making the request wait on the disk
+app.config['CONTACT_QUEUE_SIZE'] = int(os.environ.get('CONTACT_QUEUE_SIZE', 1000))
+app.config['CONTACT_WRITE_BATCH'] = 100
+app.config['CONTACT_RETRY_AFTER'] = 2
+
+# Submissions the writer still cannot save after its retries (JSON Lines, owner-only),
+# kept out of the application log
+CONTACT_DEAD_LETTER_FILE = 'contact_submissions.deadletter.jsonl'
+
+contact_intake = ContactIntake(
+    contact_store, on_commit=contact_index.sync,
+    max_queue=app.config['CONTACT_QUEUE_SIZE'], batch_size=app.config['CONTACT_WRITE_BATCH'],
+    dead_letter_path=CONTACT_DEAD_LETTER_FILE
+)
+
+# Write out queued submissions and the pending fsync before the process exits
+@atexit.register
+def close_contact_store():
+    contact_intake.close()
+    contact_store.close()
+
+# Limits on every run of submitted code, compilers included (see run_limits.RunLimits;
+# 0 turns a limit off). Node and the JVM get RUN_MEMORY_MB as a heap cap instead of
+# an address-space limit.
+app.config['RUN_CPU_SECONDS'] = int(os.environ.get('RUN_CPU_SECONDS', 30))
+app.config['RUN_MEMORY_MB'] = int(os.environ.get('RUN_MEMORY_MB', 512))
+app.config['RUN_FILE_SIZE_MB'] = int(os.environ.get('RUN_FILE_SIZE_MB', 16))
+app.config['RUN_MAX_PROCESSES'] = int(os.environ.get('RUN_MAX_PROCESSES', 256))
+app.config['RUN_OUTPUT_LIMIT'] = int(os.environ.get('RUN_OUTPUT_LIMIT', 1024 * 1024))
+
+run_limits = RunLimits(
+    cpu_seconds=app.config['RUN_CPU_SECONDS'],
+    memory_mb=app.config['RUN_MEMORY_MB'],
+    file_size_mb=app.config['RUN_FILE_SIZE_MB'],
+    max_processes=app.config['RUN_MAX_PROCESSES'],
+    output_bytes=app.config['RUN_OUTPUT_LIMIT']
+)
+# CPU time, peak RSS and wall time of recent runs per language and stage, for /admin/run-usage
+run_usage = UsageStats()
+
+# Pre-started Python and JavaScript interpreters for /api/execute-code (POSIX only):
+#   SANDBOX_POOL_SIZE   - idle workers kept ready per language; 0 starts a process per request
+#   SANDBOX_MAX_RUNS    - runs a Python worker serves before it is replaced
+#   SANDBOX_TIMEOUT     - wall-clock seconds per run
+app.config['SANDBOX_POOL_SIZE'] = int(os.environ.get('SANDBOX_POOL_SIZE', 2)) if POOL_SUPPORTED else 0
+app.config['SANDBOX_MAX_RUNS'] = int(os.environ.get('SANDBOX_MAX_RUNS', 20))
+app.config['SANDBOX_TIMEOUT'] = int(os.environ.get('SANDBOX_TIMEOUT', 30))
+
+sandbox_pools = {
+    language: SandboxPool(language, size=app.config['SANDBOX_POOL_SIZE'],
+                          max_runs=app.config['SANDBOX_MAX_RUNS'], limits=run_limits)
+    for language in ('python', 'javascript')
+}
+
+# Start the idle interpreters (also happens on the first run in each process)
+def start_sandbox_pools():
+    if app.config['SANDBOX_POOL_SIZE']:
+        for pool in sandbox_pools.values():
+            pool.start()
+
+@atexit.register
+def close_sandbox_pools():
+    for pool in sandbox_pools.values():
+        pool.close()
+
+# C, C++ and Java build outputs, shared on disk by every worker on the host and keyed by
+# language, compiler version, flags and source; COMPILE_CACHE_MAX_MB=0 turns it off
+app.config['COMPILE_CACHE_DIR'] = os.environ.get('COMPILE_CACHE_DIR', os.path.join(app.root_path, 'compile_cache'))
+app.config['COMPILE_CACHE_MAX_MB'] = int(os.environ.get('COMPILE_CACHE_MAX_MB', 256))
+compile_cache = CompileCache(app.config['COMPILE_CACHE_DIR'], app.config['COMPILE_CACHE_MAX_MB'] * 1024 * 1024)
+
+# Minified, fingerprinted and precompressed copies of static/ written by `flask build-assets`.
+# url_for('static', ...) links to the fingerprinted copy when the build has one; those are
+# served in the encoding the client accepts and cached for a year. STATIC_ASSETS=off (and
+# debug mode, where the sources change under the build) links to the source files instead.
+app.config['STATIC_ASSETS'] = os.environ.get('STATIC_ASSETS', 'on') != 'off'
+app.config['STATIC_IMMUTABLE_MAX_AGE'] = 365 * 24 * 3600
+static_assets = StaticAssets(app.static_folder)
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and app.config['STATIC_ASSETS'] and not app.debug:
+        values['filename'] = static_assets.resolve(values['filename'])
+
+# Replaces Flask's static view: fingerprinted files get their precompressed variant and
+# immutable caching, everything else is served as before
+def serve_static(filename):
+    variant = static_assets.variant(filename, request.accept_encodings)
+    if variant is None:
+        return app.send_static_file(filename)
+    path, encoding, mimetype = variant
+    response = send_from_directory(app.static_folder, path, mimetype=mimetype,
+                                   max_age=app.config['STATIC_IMMUTABLE_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+# <picture> markup for an image under static/: AVIF, WebP and JPEG/PNG srcsets from the
+# asset build, so the browser fetches the smallest file that covers `sizes` at its pixel
+# density. Falls back to a plain <img> when the image has no resized copies.
+@app.template_global()
+def responsive_image(filename, alt, sizes='100vw', **attrs):
+    image = static_assets.image(filename) if app.config['STATIC_ASSETS'] and not app.debug else None
+    extra = ''.join(f' {escape(name.rstrip("_").replace("_", "-"))}="{escape(value)}"' for name, value in attrs.items())
+    if image is None:
+        return Markup(f'<img src="{escape(url_for("static", filename=filename))}" alt="{escape(alt)}"{extra}>')
+
+    def srcset(variants):
+        return ', '.join(f"{url_for('static', filename=v['path'])} {v['width']}w" for v in variants)
+    formats = [f for f in IMAGE_FORMATS if f in image['variants']]
+    fallback = image['variants'][formats[-1]]
+    sources = ''.join(
+        f'<source type="{IMAGE_FORMATS[f][2]}" srcset="{escape(srcset(image["variants"][f]))}" sizes="{escape(sizes)}">'
+        for f in formats[:-1]
+    )
+    return Markup(
+        f'<picture>{sources}<img src="{escape(url_for("static", filename=fallback[-1]["path"]))}" '
+        f'srcset="{escape(srcset(fallback))}" sizes="{escape(sizes)}" '
+        f'width="{image["width"]}" height="{image["height"]}" alt="{escape(alt)}"{extra}></picture>'
+    )
+
+# Initialize contact file if it doesn't exist (migrating the old JSON array if present)
+def init_contact_file():
+    migrated = contact_store.migrate_from_json(LEGACY_CONTACT_FILE)
+    if migrated:
+        logger.info('contact.migrated records=%d source=%s target=%s', migrated, LEGACY_CONTACT_FILE, CONTACT_FILE)
+    # Import anything not yet in the admin index (all existing submissions on first run)
+    contact_index.sync()
 
 # Initialize contact file on startup
 init_contact_file()
 
-# --- GLOBAL MODEL TRAINING (runs once at startup) ---
-def train_pass_predictor_model():
-    np.random.seed(42)
-    n = 200
-    df = pd.DataFrame({
-        'study_hours': np.random.randint(1, 11, n),
-        'sleep_hours': np.random.randint(4, 10, n),
-        'attendance': np.random.randint(40, 100, n),
-        'class_avg_score': np.random.randint(40, 100, n),
-        'student_test_score': np.random.randint(30, 100, n),
-        'student_assignment_score': np.random.randint(30, 100, n),
-        'num_failed_before': np.random.randint(0, 4, n),
-        'participation_score': np.random.randint(0, 11, n)
-    })
+STARTUP_STATS = {
+    'preload': app.config['MODEL_PRELOAD'],
+    'import_ms': None,
+    'warmup_ms': {},
+    'warmup_done': False
+}
 
-    score = (
-        df['study_hours'] * 4 +
-        df['sleep_hours'] * 1.5 +
-        df['attendance'] * 0.5 +
-        df['class_avg_score'] * 0.3 +
-        df['student_test_score'] * 1.2 +
-        df['student_assignment_score'] * 1.0 +
-        df['participation_score'] * 2 -
-        df['num_failed_before'] * 8 +
-        np.random.randn(n) * 10
+# Loads each heavy subsystem and records how long it took
+def warm_up():
+    steps = (
+        ('pass_model', get_pass_model),
+        ('sentiment_model', load_sentiment_model),
+        ('mood_analyzer', get_mood_analyzer),
+        ('sandbox_pools', start_sandbox_pools)
     )
-    df['passed'] = (score > 180).astype(int)
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+            STARTUP_STATS['warmup_ms'][name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            STARTUP_STATS['warmup_ms'][name] = f'failed: {type(e).__name__}'
+            logger.warning('startup.warmup_failed step=%s error=%r', name, e)
+    STARTUP_STATS['warmup_done'] = True
+
+# Request metrics for /metrics: latency per route (the URL rule, so every job id counts
+# as /api/jobs/<job_id>), responses per status and requests in flight. Latency ends when
+# the view has returned its response, so for a streamed response it covers the start only.
+REQUEST_SECONDS = registry.histogram(
+    'portfolio_http_request_duration_seconds', 'Time until the response was ready', ('method', 'route')
+)
+REQUESTS_TOTAL = registry.counter('portfolio_http_requests_total', 'Responses sent', ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = registry.gauge('portfolio_http_requests_in_flight', 'Requests being handled', ('route',))
+registry.gauge_function('portfolio_contact_queue_pending', 'Contact submissions waiting for the writer',
+                        lambda: contact_intake.pending())
+registry.gauge_function('portfolio_jobs_queued', 'Code jobs waiting to start', lambda: code_jobs.stats()['queued'])
+registry.gauge_function('portfolio_jobs_running', 'Code jobs running per language',
+                        lambda: {(language,): count for language, count in code_jobs.stats()['running'].items()},
+                        ('language',))
+
+# Slow-request profiles: PROFILE_SAMPLE_RATE of requests (0, the default, turns it off) run
+# under cProfile, and each one taking PROFILE_SLOW_MS or longer is written to PROFILE_DIR
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_SLOW_MS'] = int(os.environ.get('PROFILE_SLOW_MS', 500))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.root_path, 'profiles'))
+request_profiler = SlowRequestProfiler(app.config['PROFILE_DIR'], app.config['PROFILE_SAMPLE_RATE'],
+                                       app.config['PROFILE_SLOW_MS'])
+
+@app.before_request
+def start_request_metrics():
+    rule = request.url_rule
+    route = rule.rule if rule is not None else 'unmatched'
+    REQUESTS_IN_FLIGHT.inc(route)
+    g.request_metrics = (route, request_profiler.start(), time.perf_counter())
+
+@app.after_request
+def record_request_metrics(response):
+    state = g.get('request_metrics')
+    if state is not None:
+        method = request.method
+        REQUEST_SECONDS.observe(time.perf_counter() - state[2], method, state[0])
+        REQUESTS_TOTAL.inc(method, state[0], response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error):
+    state = g.get('request_metrics')
+    if state is None:
+        return
+    route, profiler, start = state
+    REQUESTS_IN_FLIGHT.dec(route)
+    if profiler is not None:
+        request_profiler.finish(profiler, f'{request.method} {route}', time.perf_counter() - start)
+
+# Prometheus scrape endpoint; the numbers are this worker process's own
+@app.route("/metrics")
+def metrics():
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Admission control for the expensive endpoints, so one client cannot starve the pages.
+# POSTs to the endpoints in ADMISSION_CLASSES are limited per class:
+#   RATE_LIMITS        - (requests per second, burst) per client IP and route
+#   CONCURRENCY_LIMITS - requests of the class running at once in this worker process
+# Everything else, GETs included, is never limited. Over a limit the answer is an
+# immediate 429 with Retry-After (the HTML contact form flashes a message instead).
+# RATE_LIMITS=off in the environment turns both off.
+# Behind a reverse proxy, set TRUSTED_PROXIES to the number of proxies in front of the
+# app so the client IP comes from X-Forwarded-For.
+app.config['ADMISSION_CONTROL'] = os.environ.get('RATE_LIMITS', 'on') != 'off'
+app.config['ADMISSION_CLASSES'] = {
+    'api_execute_code': 'execute',
+    'submit_job': 'execute',
+    'api_mood_analysis': 'inference',
+    'api_mood_analysis_batch': 'inference',
+    'api_pass_predict': 'inference',
+    'api_pass_predict_batch': 'inference',
+    'api_pass_predict_grid': 'inference',
+    'api_contact': 'contact',
+    'contact': 'contact'
+}
+app.config['RATE_LIMITS'] = {'execute': (0.2, 10), 'inference': (5, 30), 'contact': (0.1, 5)}
+app.config['CONCURRENCY_LIMITS'] = {'execute': 2, 'inference': 4, 'contact': 4}
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
 
-    X = df.drop(columns='passed')
-    y = df['passed']
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    model = LogisticRegression(solver='liblinear')
-    model.fit(X_scaled, y)
+admission = AdmissionControl(app.config['RATE_LIMITS'], app.config['CONCURRENCY_LIMITS'])
+ADMISSION_REJECTED = registry.counter('portfolio_admission_rejected_total', 'Requests turned away with a 429',
+                                      ('class', 'reason'))
+registry.gauge_function('portfolio_admission_active', 'Admission-controlled requests running per class',
+                        lambda: {(name,): count for name, count in admission.active().items()}, ('class',))
+registry.gauge_function('portfolio_rate_limit_buckets', 'Client rate limit buckets held in memory',
+                        lambda: len(admission.buckets))
 
-    # Accuracy for info
-    acc = accuracy_score(y, model.predict(X_scaled))
-    return model, scaler, acc
+@app.before_request
+def admit_request():
+    if not app.config['ADMISSION_CONTROL'] or request.method in ('GET', 'HEAD', 'OPTIONS'):
+        return None
+    endpoint_class = app.config['ADMISSION_CLASSES'].get(request.endpoint)
+    if endpoint_class is None:
+        return None
+    refusal = admission.admit(request.remote_addr, endpoint_class, request.endpoint)
+    if refusal is not None:
+        reason, retry_after = refusal
+        ADMISSION_REJECTED.inc(endpoint_class, reason)
+        logger.info('admission.rejected class=%s reason=%s client=%s retry_after=%d',
+                    endpoint_class, reason, request.remote_addr, retry_after)
+        if request.endpoint == 'contact':
+            # The HTML form reports it the way it reports a full queue
+            flash('Too many messages right now. Please try again in a moment.', 'error')
+            return redirect(url_for('contact'))
+        response = jsonify({'success': False, 'message': f'Too many requests. Please try again in {retry_after} s.'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    g.admission_class = endpoint_class
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    endpoint_class = g.pop('admission_class', None)
+    if endpoint_class is not None:
+        admission.release(endpoint_class)
+
+# Micro-batching of concurrent single predictions: batches run and their sizes
+@app.route("/admin/batching")
+def batching_stats():
+    return jsonify({'success': True, 'batchers': {batcher.name: batcher.stats() for batcher in BATCHERS}})
+
+# Admission limits in force and how many requests each class let in or turned away
+@app.route("/admin/limits")
+def admission_stats():
+    return jsonify({'success': True, 'enabled': app.config['ADMISSION_CONTROL'], **admission.stats()})
 
-# Train once at startup
-PASS_MODEL, PASS_SCALER, PASS_MODEL_ACC = train_pass_predictor_model()
+# Pages without per-request content are rendered (and gzipped) once, then served from
+# memory with strong ETags and Last-Modified, so revalidating browsers get a 304.
+# PAGE_CACHE=off renders every time. In debug mode Jinja reloads changed templates, which
+# also refreshes the cache.
+app.config['PAGE_CACHE'] = os.environ.get('PAGE_CACHE', 'on') != 'off'
+page_cache = PageCache(app.jinja_env)
+
+def cached_page(template_name):
+    if not app.config['PAGE_CACHE']:
+        return render_template(template_name)
+    # Links to static files change with the asset build and the mount point
+    version = static_assets.version
+    page = page_cache.get(template_name, lambda: render_template(template_name),
+                          key=(request.script_root, version, app.debug),
+                          modified=version / 1e9 if version else None)
+    body, headers, not_modified = page.respond(request.accept_encodings, request.if_none_match,
+                                               request.if_modified_since)
+    if not_modified:
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='text/html', headers=headers)
 
 @app.route("/")
 def home():
-    return render_template("home.html")
+    return cached_page("home.html")
 
 @app.route("/projects")
 def projects():
-    return render_template("projects.html")
+    return cached_page("projects.html")
 
 @app.route("/about")
 def about():
-    return render_template("about.html")
+    return cached_page("about.html")
 
 @app.route("/contact", methods=["GET", "POST"])
 def contact():
@@ -129,7 +410,7 @@ def contact():
                 flash('Please fill all fields!', 'error')
                 return redirect(url_for('contact'))
             
-            # Save to JSON file
+            # Queue for the background writer
             data = {
                 'name': name,
                 'email': email,
@@ -137,16 +418,16 @@ def contact():
                 'message': message
             }
             
-            if save_contact_submission(data):
+            if contact_intake.submit(data):
                 flash('Message saved successfully! I\'ll get back to you soon.', 'success')
             else:
-                flash('Error saving message. Please try again later.', 'error')
+                flash('Too many messages right now. Please try again in a moment.', 'error')
             
             return redirect(url_for('contact'))
             
         except Exception as e:
             flash('Error processing message. Please try again later.', 'error')
-            print(f"Contact error: {e}")
+            logger.exception('contact.form_error error=%r', e)
             return redirect(url_for('contact'))
     
     return render_template("contact.html")
@@ -154,44 +435,49 @@ def contact():
 # Demo routes for projects
 @app.route("/demo/leetcode")
 def demo_leetcode():
-    return render_template("demos/leetcode.html")
+    return cached_page("demos/leetcode.html")
 
 @app.route("/demo/resume-maker")
 def demo_resume_maker():
-    return render_template("demos/resume_maker.html")
+    return cached_page("demos/resume_maker.html")
 
 @app.route("/demo/erp")
 def demo_erp():
-    return render_template("demos/erp.html")
+    return cached_page("demos/erp.html")
 
 @app.route("/demo/mood-detector")
 def demo_mood_detector():
-    return render_template("demos/mood_detector.html")
+    return cached_page("demos/mood_detector.html")
 
 @app.route("/demo/chat-app")
 def demo_chat_app():
-    return render_template("demos/chat_app.html")
+    return cached_page("demos/chat_app.html")
 
 @app.route("/demo/pass-predictor")
 def demo_pass_predictor():
-    return render_template("demos/pass_predictor.html")
+    return cached_page("demos/pass_predictor.html")
 
 # API routes for dynamic functionality
 @app.route("/api/contact", methods=["POST"])
 def api_contact():
+    body, status, headers = contact_submission(request.get_json(silent=True))
+    return jsonify(body), status, headers
+
+# Body, status and headers for a JSON contact submission; the ASGI app (asgi.py) answers
+# /api/contact with it too
+def contact_submission(data):
     try:
-        print("API contact endpoint called!")
-        data = request.get_json()
-        print(f"Received data: {data}")
+        if not isinstance(data, dict):
+            return {'success': False, 'message': 'Please fill all fields!'}, 400, {}
         name = data.get('name')
         email = data.get('email')
         subject = data.get('subject')
         message = data.get('message')
         
-        if not all([name, email, subject, message]):
-            return jsonify({'success': False, 'message': 'Please fill all fields!'}), 400
+        if not all(isinstance(value, str) and value.strip() for value in (name, email, subject, message)):
+            return {'success': False, 'message': 'Please fill all fields!'}, 400, {}
         
-        # Save to JSON file
+        # Queue for the background writer and answer right away
         contact_data = {
             'name': name,
             'email': email,
@@ -199,221 +485,264 @@ def api_contact():
             'message': message
         }
         
-        if save_contact_submission(contact_data):
-            print(f"""
-            ===== NEW CONTACT MESSAGE SAVED =====
-            Name: {name}
-            Email: {email}
-            Subject: {subject}
-            Message: {message}
-            Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            =====================================
-            """)
-            return jsonify({'success': True, 'message': 'Message saved! I\'ll get back to you soon.'})
-        else:
-            return jsonify({'success': False, 'message': 'Error saving message. Please try again.'}), 500
+        if contact_intake.submit(contact_data):
+            return {'success': True, 'message': 'Message saved! I\'ll get back to you soon.'}, 202, {}
+        
+        return ({'success': False, 'message': 'Too many messages right now. Please try again in a moment.'}, 503,
+                {'Retry-After': str(app.config['CONTACT_RETRY_AFTER'])})
         
     except Exception as e:
-        print(f"API Contact error: {e}")
-        return jsonify({'success': False, 'message': 'Error processing message. Please try again.'}), 500
+        logger.exception('contact.api_error error=%r', e)
+        return {'success': False, 'message': 'Error processing message. Please try again.'}, 500, {}
 
-# Route to view all contact submissions (for admin purposes)
+# Queue depth and writer counters for the contact intake
+@app.route("/admin/contacts/intake")
+def contact_intake_stats():
+    return jsonify({'success': True, 'intake': contact_intake.stats()})
+
+# Filters shared by the admin contact views: ?since=&until= (ISO timestamps), ?email=, ?subject= (substring)
+def contact_filters():
+    return {
+        'since': request.args.get('since') or None,
+        'until': request.args.get('until') or None,
+        'email': request.args.get('email') or None,
+        'subject': request.args.get('subject') or None
+    }
+
+# Route to view contact submissions (for admin purposes), newest first, one page at a time.
+# Pass the returned next_cursor as ?cursor= to get the following page.
 @app.route("/admin/contacts")
 def view_contacts():
     try:
-        if os.path.exists(CONTACT_FILE):
-            with open(CONTACT_FILE, 'r', encoding='utf-8') as f:
-                submissions = json.load(f)
-        else:
-            submissions = []
+        contact_index.sync()
+        limit = request.args.get('limit', app.config['CONTACTS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['CONTACTS_MAX_PAGE_SIZE']))
+        order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+        filters = contact_filters()
+        
+        submissions, next_cursor = contact_index.page(
+            limit=limit, cursor=request.args.get('cursor', type=int), order=order, **filters
+        )
         
         return jsonify({
             'success': True,
             'submissions': submissions,
-            'count': len(submissions)
+            'count': len(submissions),
+            'total': contact_index.count(**filters),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error reading contacts: {e}'}), 500
 
+# Full-text search over subject and message: ?q= (all words must match, end with * for a
+# prefix match), ranked by relevance with highlighted snippets. Supports the same
+# filters as /admin/contacts and ?limit=/?offset= paging.
+@app.route("/admin/contacts/search")
+def search_contacts():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'success': False, 'message': 'Provide a search query with ?q='}), 400
+    try:
+        contact_index.sync()
+        limit = request.args.get('limit', app.config['CONTACTS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['CONTACTS_MAX_PAGE_SIZE']))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        results, next_offset = contact_index.search(q, limit=limit, offset=offset, **contact_filters())
+        
+        return jsonify({
+            'success': True,
+            'query': q,
+            'results': results,
+            'count': len(results),
+            'next_offset': next_offset
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error searching contacts: {e}'}), 500
+
+# Streams every matching submission as NDJSON (default) or CSV (?format=csv) without
+# holding the full result in memory. Accepts the same filters as /admin/contacts.
+@app.route("/admin/contacts/export")
+def export_contacts():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+    try:
+        contact_index.sync()
+        rows = contact_index.iter_rows(**contact_filters())
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error reading contacts: {e}'}), 500
+    
+    if export_format == 'ndjson':
+        def generate():
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CONTACT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    return Response(
+        stream_with_context(generate_csv()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=contact_submissions.csv'}
+    )
+
 @app.route("/api/mood-analysis", methods=["POST"])
 def api_mood_analysis():
+    body, status = mood_analysis(request.get_json(silent=True))
+    return jsonify(body), status
+
+# Body and status for one /api/mood-analysis request (shared with asgi.py)
+def mood_analysis(data):
     try:
-        data = request.get_json()
+        if not isinstance(data, dict):
+            return {'success': False, 'message': 'Send a JSON object with "text"'}, 400
         text = data.get('text', '')
         
+        if not isinstance(text, (str, type(None))):
+            return {'success': False, 'message': '"text" must be a string'}, 400
         if not text:
-            return jsonify({'success': False, 'message': 'Please provide text for analysis'}), 400
+            return {'success': False, 'message': 'Please provide text for analysis'}, 400
         
-        # Advanced ML-based sentiment analysis using techniques from sentiment_analysis.py
-        import re
-        import nltk
-        from nltk.corpus import stopwords
-        from nltk.stem import WordNetLemmatizer
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from sklearn.ensemble import RandomForestClassifier
-        import numpy as np
+        mode = data.get('mode', 'model')
+        if mode not in ANALYSIS_MODES:
+            return {'success': False, 'message': f"Unknown mode '{mode}'. Use one of: {', '.join(ANALYSIS_MODES)}"}, 400
         
-        # Download NLTK data if not already downloaded
-        try:
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            nltk.download('stopwords')
+        result = get_mood_analyzer().analyze(text, mode=mode)
+        return {'success': True, **result}, 200
         
+    except Exception as e:
+        logger.exception('mood.error error=%r', e)
+        return {'success': False, 'message': 'Error analyzing text'}, 500
+
+
+# Result cache counters and the analyzer version cache keys are built from
+@app.route("/api/mood-analysis/stats")
+def api_mood_analysis_stats():
+    analyzer = get_mood_analyzer()
+    return jsonify({
+        'success': True,
+        'analyzer_version': analyzer.version,
+        'model_loaded': analyzer.model is not None,
+        'lexicon_size': len(analyzer.lexicon),
+        'cache': mood_cache.stats()
+    })
+
+# Reads texts from an NDJSON body one line at a time (a string or {"text": ...} per line)
+# Stands in for an NDJSON line that is not valid JSON, so it gets its own error item
+INVALID_JSON_LINE = object()
+
+def iter_ndjson_texts(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
         try:
-            nltk.data.find('corpora/wordnet')
-        except LookupError:
-            nltk.download('wordnet')
-        
-        # Text preprocessing function (same as in sentiment_analysis.py)
-        stop_words = set(stopwords.words('english'))
-        lemmatizer = WordNetLemmatizer()
-        
-        def clean_text(text):
-            text = re.sub(r'[^\w\s]', '', text.lower())
-            words = text.split()
-            words = [lemmatizer.lemmatize(w) for w in words if w not in stop_words]
-            return ' '.join(words)
-        
-        # Clean the input text
-        cleaned_text = clean_text(text)
-        
-        # Enhanced positive and negative word lists (expanded from sentiment_analysis.py)
-        positive_words = [
-            'love', 'great', 'good', 'excellent', 'amazing', 'wonderful', 'fantastic', 'awesome',
-            'perfect', 'beautiful', 'happy', 'joy', 'pleased', 'satisfied', 'delighted', 'thrilled',
-            'outstanding', 'brilliant', 'superb', 'marvelous', 'incredible', 'fabulous', 'terrific',
-            'best', 'favorite', 'enjoy', 'like', 'adore', 'cherish', 'appreciate', 'grateful',
-            'blessed', 'lucky', 'fortunate', 'successful', 'achieved', 'accomplished', 'proud',
-            'excited', 'enthusiastic', 'optimistic', 'hopeful', 'inspired', 'motivated', 'energetic',
-            'peaceful', 'calm', 'relaxed', 'content', 'fulfilled', 'gratified', 'elated', 'ecstatic'
-        ]
-        
-        negative_words = [
-            'hate', 'terrible', 'awful', 'horrible', 'disgusting', 'worst', 'bad', 'sad',
-            'angry', 'upset', 'disappointed', 'frustrated', 'annoyed', 'irritated', 'mad',
-            'dislike', 'loathe', 'despise', 'abhor', 'detest', 'miserable', 'depressed',
-            'suffering', 'pain', 'hurt', 'broken', 'damaged', 'ruined', 'destroyed',
-            'failure', 'failed', 'lose', 'lost', 'defeat', 'defeated', 'hopeless', 'useless',
-            'worried', 'anxious', 'stressed', 'tired', 'exhausted', 'bored', 'lonely', 'afraid',
-            'scared', 'fearful', 'nervous', 'tense', 'confused', 'conflicted', 'torn', 'divided'
-        ]
-        
-        neutral_words = [
-            'okay', 'fine', 'alright', 'maybe', 'perhaps', 'possibly', 'might', 'could',
-            'average', 'normal', 'regular', 'standard', 'usual', 'typical', 'ordinary',
-            'neutral', 'indifferent', 'unconcerned', 'uninterested', 'bored', 'tired',
-            'moderate', 'balanced', 'stable', 'steady', 'consistent', 'predictable', 'routine'
-        ]
-        
-        # Count word occurrences
-        words = cleaned_text.split()
-        total_words = len(words)
-        
-        # Initialize variables
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        positive_score = 0
-        negative_score = 0
-        neutral_score = 0
-        emotional_intensity = 0
-        
-        if total_words == 0:
-            mood = 'Neutral'
-            confidence = 50
+            item = json.loads(line)
+        except ValueError:
+            yield INVALID_JSON_LINE
+            continue
+        yield item.get('text', '') if isinstance(item, dict) else item
+
+# Message for a batch item that could not be analyzed
+def batch_item_error(text):
+    if text is INVALID_JSON_LINE:
+        return 'Invalid JSON'
+    if text is not None and not isinstance(text, str):
+        return 'Text must be a string'
+    return 'Please provide text for analysis'
+
+@app.route("/api/mood-analysis/batch", methods=["POST"])
+def api_mood_analysis_batch():
+    try:
+        mode = request.args.get('mode', 'model')
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            texts = iter_ndjson_texts(request.stream)
         else:
-            positive_count = sum(1 for word in positive_words if word in words)
-            negative_count = sum(1 for word in negative_words if word in words)
-            neutral_count = sum(1 for word in neutral_words if word in words)
-            
-            # Calculate scores
-            positive_score = (positive_count / total_words) * 100
-            negative_score = (negative_count / total_words) * 100
-            neutral_score = (neutral_count / total_words) * 100
-            
-            # Enhanced scoring algorithm with ML-inspired approach
-            # Add bonus for emotional intensity (more emotional words = higher confidence)
-            emotional_intensity = (positive_count + negative_count) / total_words
-            
-            # Determine sentiment with confidence
-            if positive_score > negative_score and positive_score > neutral_score:
-                mood = 'Positive'
-                base_confidence = 60 + (positive_score * 0.8)
-                confidence = min(95, base_confidence + (emotional_intensity * 20))
-            elif negative_score > positive_score and negative_score > neutral_score:
-                mood = 'Negative'
-                base_confidence = 60 + (negative_score * 0.8)
-                confidence = min(95, base_confidence + (emotional_intensity * 20))
-            else:
-                mood = 'Neutral'
-                base_confidence = 60 + (neutral_score * 0.8)
-                confidence = min(95, base_confidence + (emotional_intensity * 20))
-        
-        # Generate detailed analysis with ML insights
-        analysis_details = []
-        if positive_count > 0:
-            analysis_details.append(f"Found {positive_count} positive indicators")
-        if negative_count > 0:
-            analysis_details.append(f"Found {negative_count} negative indicators")
-        if neutral_count > 0:
-            analysis_details.append(f"Found {neutral_count} neutral indicators")
-        
-        # Add ML-specific insights
-        if total_words > 0:
-            emotional_density = (positive_count + negative_count) / total_words
-            if emotional_density > 0.3:
-                analysis_details.append("High emotional content detected")
-            elif emotional_density > 0.1:
-                analysis_details.append("Moderate emotional content")
-            else:
-                analysis_details.append("Low emotional content")
-        
-        analysis_text = f"Analyzed {total_words} words using advanced NLP preprocessing. {' '.join(analysis_details)}. Detected {mood.lower()} sentiment with {confidence:.1f}% confidence using Random Forest-inspired classification."
-        
-        # Additional ML metrics
-        ml_metrics = {
-            'text_length': len(text),
-            'cleaned_length': total_words,
-            'positive_density': positive_score,
-            'negative_density': negative_score,
-            'neutral_density': neutral_score,
-            'emotional_intensity': round(emotional_intensity, 3) if total_words > 0 else 0.0,
-            'processing_method': 'TF-IDF + Random Forest Classification'
-        }
+            data = request.get_json()
+            if isinstance(data, dict):
+                mode = data.get('mode', mode)
+                data = data.get('texts')
+            if not isinstance(data, list):
+                return jsonify({'success': False, 'message': 'Provide "texts" as a JSON array or send NDJSON'}), 400
+            texts = data
         
-        return jsonify({
-            'success': True,
-            'mood': mood,
-            'confidence': round(confidence, 1),
-            'analysis': analysis_text,
-            'details': {
-                'total_words': total_words,
-                'positive_count': positive_count if total_words > 0 else 0,
-                'negative_count': negative_count if total_words > 0 else 0,
-                'neutral_count': neutral_count if total_words > 0 else 0,
-                'positive_score': round(positive_score, 1),
-                'negative_score': round(negative_score, 1),
-                'neutral_score': round(neutral_score, 1)
-            },
-            'ml_metrics': ml_metrics
-        })
+        if mode not in ANALYSIS_MODES:
+            return jsonify({'success': False, 'message': f"Unknown mode '{mode}'. Use one of: {', '.join(ANALYSIS_MODES)}"}), 400
         
+        batch_size = request.args.get('batch_size', app.config['MOOD_BATCH_SIZE'], type=int)
+        batch_size = max(1, min(batch_size, app.config['MOOD_BATCH_MAX_SIZE']))
+        analyzer = get_mood_analyzer()
     except Exception as e:
-        print(f"Mood analysis error: {e}")
-        return jsonify({'success': False, 'message': 'Error analyzing text'}), 500
+        logger.exception('mood.batch_error error=%r', e)
+        return jsonify({'success': False, 'message': 'Error reading batch'}), 400
+    
+    # Results are streamed back as NDJSON, in input order, one chunk at a time
+    def generate():
+        index = 0
+        try:
+            for chunk in iter_chunks(texts, batch_size):
+                valid = [i for i, text in enumerate(chunk) if isinstance(text, str) and text]
+                results = analyzer.analyze_batch([chunk[i] for i in valid], mode=mode) if valid else []
+                by_position = dict(zip(valid, results))
+                lines = []
+                for i in range(len(chunk)):
+                    if i in by_position:
+                        item = {'index': index, 'success': True, **by_position[i]}
+                    else:
+                        item = {'index': index, 'success': False, 'message': batch_item_error(chunk[i])}
+                    lines.append(json.dumps(item))
+                    index += 1
+                yield '\n'.join(lines) + '\n'
+        except Exception as e:
+            logger.exception('mood.batch_error error=%r', e)
+            yield json.dumps({'index': index, 'success': False, 'message': 'Error analyzing batch'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
+# (language, code) from an /api/execute-code or /api/jobs body; ValueError carries the
+# message for a 400 (shared with asgi.py)
+def parse_execute_request(data):
+    if not isinstance(data, dict):
+        raise ValueError('Send a JSON object with "code" and "language"')
+    code = data.get('code', '')
+    language = data.get('language', 'python')
+    if not isinstance(code, str) or not isinstance(language, str):
+        raise ValueError('"code" and "language" must be strings')
+    if not code:
+        raise ValueError('No code provided')
+    return language, code
 
 @app.route("/api/execute-code", methods=["POST"])
 def api_execute_code():
     try:
-        data = request.get_json()
-        code = data.get('code', '')
-        language = data.get('language', 'python')
-        
-        if not code:
-            return jsonify({'success': False, 'error': 'No code provided'}), 400
+        try:
+            language, code = parse_execute_request(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-
+        if language in sandbox_pools and app.config['SANDBOX_POOL_SIZE']:
+            try:
+                return jsonify(execute_pooled(language, code))
+            except subprocess.TimeoutExpired:
+                return jsonify({
+                    'success': False,
+                    'error': f'{language.upper()} code execution timed out ({app.config["SANDBOX_TIMEOUT"]} seconds)'
+                })
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Execution error: {str(e)}'
+                })
         
         # Create temporary directory for compilation
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -445,7 +774,7 @@ def api_execute_code():
                 })
                 
     except Exception as e:
-        print(f"Code execution error: {e}")
+        logger.exception('execute.error error=%r', e)
         return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
 
 def get_file_extension(language):
@@ -458,180 +787,495 @@ def get_file_extension(language):
     }
     return extensions.get(language, 'txt')
 
-def execute_interpreted(language, file_path):
-    if language == 'python':
-        result = subprocess.run(
-            [sys.executable, file_path],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=os.path.dirname(file_path)
-        )
-    elif language == 'javascript':
-        result = subprocess.run(
-            ['node', file_path],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=os.path.dirname(file_path)
-        )
-    
-    if result.returncode == 0:
-        return {
+# JSON body for a finished run: the original success/output/error fields plus the
+# run's measured resource usage
+def run_response(result):
+    if result.truncated:
+        response = {
+            'success': False,
+            'output': result.stdout,
+            'error': f"{result.stderr}Output limit of {run_limits.output_bytes} bytes exceeded"
+        }
+    elif result.returncode == 0:
+        response = {
             'success': True,
             'output': result.stdout,
             'error': result.stderr
         }
     else:
-        return {
+        response = {
             'success': False,
-            'error': result.stderr or 'Execution failed'
+            'error': result.stderr or describe_exit(result.returncode)
         }
+    response['usage'] = result.usage
+    return response
 
-def execute_compiled(language, file_path, temp_dir):
-    if language == 'cpp':
-        # Compile C++
-        compile_result = subprocess.run(
-            ['g++', '-std=c++11', file_path, '-o', os.path.join(temp_dir, 'program')],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if compile_result.returncode != 0:
-            return {
-                'success': False,
-                'error': f'Compilation error:\n{compile_result.stderr}'
-            }
-        
-        # Execute compiled program
-        exec_result = subprocess.run(
-            [os.path.join(temp_dir, 'program')],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=temp_dir
-        )
-        
-    elif language == 'c':
-        # Compile C
-        compile_result = subprocess.run(
-            ['gcc', file_path, '-o', os.path.join(temp_dir, 'program')],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if compile_result.returncode != 0:
-            return {
-                'success': False,
-                'error': f'Compilation error:\n{compile_result.stderr}'
-            }
-        
-        # Execute compiled program
-        exec_result = subprocess.run(
-            [os.path.join(temp_dir, 'program')],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=temp_dir
-        )
-        
-    elif language == 'java':
+# Runs one step (compile or run) of submitted code under run_limits and records its usage
+def run_step(language, stage, command, cwd, address_space=True):
+    try:
+        with stage_timer(f'code_{stage}'):
+            result = run_limited(command, cwd, run_limits, 30, address_space=address_space)
+    except subprocess.TimeoutExpired:
+        run_usage.record(language, stage, None, 'timeout')
+        raise
+    run_usage.record(language, stage, result.usage, outcome_of(result))
+    return result
+
+# Runs Python/JavaScript on a warm worker from sandbox_pools
+def execute_pooled(language, code):
+    try:
+        with stage_timer('code_run'):
+            result = sandbox_pools[language].run(code, app.config['SANDBOX_TIMEOUT'])
+    except subprocess.TimeoutExpired:
+        run_usage.record(language, 'run', None, 'timeout')
+        raise
+    run_usage.record(language, 'run', result.usage, outcome_of(result))
+    return run_response(result)
+
+# Interpreter command for a script; node gets a heap cap in place of RLIMIT_AS
+def interpreter_command(language, file_path):
+    if language == 'python':
+        return [sys.executable, file_path], True
+    heap = [f'--max-old-space-size={run_limits.memory_mb}'] if run_limits.memory_mb else []
+    return ['node', *heap, file_path], False
+
+def execute_interpreted(language, file_path):
+    command, address_space = interpreter_command(language, file_path)
+    result = run_step(language, 'run', command, os.path.dirname(file_path), address_space=address_space)
+    return run_response(result)
+
+# Compiler, flags and the command that runs the result, per compiled language
+COMPILERS = {
+    'cpp': {'compiler': 'g++', 'flags': ['-std=c++11'], 'output': ['-o', 'program'], 'run': ['./program']},
+    'c': {'compiler': 'gcc', 'flags': [], 'output': ['-o', 'program'], 'run': ['./program']},
+    'java': {'compiler': 'javac', 'flags': [], 'output': [], 'run': ['java', 'Main'], 'heap_flag': '-Xmx{}m'}
+}
+
+# Extra arguments and whether RLIMIT_AS applies, for the compiler ('compile') or the
+# program ('run'); JVM tools reserve more address space than they use, so they get -Xmx
+def memory_options(language, stage):
+    heap_flag = COMPILERS[language].get('heap_flag')
+    if heap_flag is None:
+        return [], True
+    if not run_limits.memory_mb:
+        return [], False
+    flag = heap_flag.format(run_limits.memory_mb)
+    return [('-J' + flag) if stage == 'compile' else flag], False
+
+# Compiler outputs to keep: the binary, or every .class file javac wrote
+def compiled_files(language, temp_dir):
+    if language == 'java':
+        return sorted(name for name in os.listdir(temp_dir) if name.endswith('.class'))
+    return ['program']
+
+# Default compile step: runs the compiler under run_limits, returns (returncode, compiler errors)
+def run_compiler(language, command, cwd, address_space):
+    result = run_step(language, 'compile', command, cwd, address_space=address_space)
+    return result.returncode, result.stderr or result.stdout
+
+# Compiles file_path in temp_dir, or restores the build from compile_cache, and returns
+# (command that runs the program, None) or (None, compiler errors)
+def build_program(language, file_path, temp_dir, compile_step=run_compiler):
+    if language == 'java':
         # Always use Main.java for Java (handle Windows case-insensitive issue)
         java_file = os.path.join(temp_dir, 'Main.java')
         if os.path.abspath(file_path) != os.path.abspath(java_file):
             os.rename(file_path, java_file)
-        # Compile Java
-        compile_result = subprocess.run(
-            ['javac', 'Main.java'],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=temp_dir
-        )
-        if compile_result.returncode != 0:
-            return {
-                'success': False,
-                'error': f'Compilation error:\n{compile_result.stderr}'
-            }
-        # Execute Java program
-        exec_result = subprocess.run(
-            ['java', 'Main'],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd=temp_dir
+        file_path = java_file
+    settings = COMPILERS[language]
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    
+    # Reuse an earlier build of the same source with the same compiler and flags
+    key = cache_key(language, compiler_version(settings['compiler']), settings['flags'], source)
+    if not compile_cache.restore(key, temp_dir):
+        start = time.perf_counter()
+        memory_flags, address_space = memory_options(language, 'compile')
+        returncode, errors = compile_step(
+            language,
+            [settings['compiler'], *memory_flags, *settings['flags'], os.path.basename(file_path), *settings['output']],
+            temp_dir, address_space
         )
+        compile_ms = (time.perf_counter() - start) * 1000
+        if returncode != 0:
+            return None, errors
+        compile_cache.store(key, temp_dir, compiled_files(language, temp_dir), compile_ms)
     
-    if exec_result.returncode == 0:
-        return {
-            'success': True,
-            'output': exec_result.stdout,
-            'error': exec_result.stderr
-        }
-    else:
+    command = list(settings['run'])
+    if command[0].startswith('./'):
+        command[0] = os.path.join(temp_dir, command[0][2:])
+    memory_flags, _ = memory_options(language, 'run')
+    return command[:1] + memory_flags + command[1:], None
+
+def execute_compiled(language, file_path, temp_dir):
+    command, errors = build_program(language, file_path, temp_dir)
+    if command is None:
         return {
             'success': False,
-            'error': exec_result.stderr or 'Execution failed'
+            'error': f'Compilation error:\n{errors}'
         }
+    
+    # Execute compiled program
+    _, address_space = memory_options(language, 'run')
+    return run_response(run_step(language, 'run', command, temp_dir, address_space=address_space))
+
+# Resource usage of recent runs per language and stage (compile/run) with the limits in
+# force and rough capacity figures: concurrent runs that fit in this host's memory at the
+# p95 peak RSS, and runs per second its cores sustain at the mean CPU time
+@app.route("/admin/run-usage")
+def run_usage_stats():
+    try:
+        memory_kb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024
+    except (AttributeError, ValueError, OSError):
+        memory_kb = None
+    return jsonify({
+        'success': True,
+        'limits': run_limits.as_dict(),
+        'host': {'memory_kb': memory_kb, 'cpus': os.cpu_count()},
+        'spawner': spawner.stats(),
+        'usage': run_usage.stats(memory_budget_kb=memory_kb, cores=os.cpu_count())
+    })
+
+# Pages held by the rendered-page cache and how often it served them
+@app.route("/admin/page-cache")
+def page_cache_stats():
+    return jsonify({'success': True, 'enabled': app.config['PAGE_CACHE'], **page_cache.stats()})
+
+# Files in the current asset build and their source, minified and compressed sizes
+@app.route("/admin/assets")
+def asset_stats():
+    return jsonify({'success': True, 'enabled': app.config['STATIC_ASSETS'], **static_assets.stats()})
+
+# Hits, misses and compile time saved by the compile cache
+@app.route("/admin/compile-cache")
+def compile_cache_stats():
+    return jsonify({'success': True, 'compile_cache': compile_cache.stats()})
+
+# Runs one /api/jobs submission: writes the source, builds it if needed, then streams
+# the program's output into the job
+def run_code_job(job, temp_dir):
+    file_path = os.path.join(temp_dir, f'main.{get_file_extension(job.language)}')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(job.code)
+    
+    def step(stage, command, address_space, stream=True):
+        try:
+            with stage_timer(f'code_{stage}'):
+                result = job.run_step(command, temp_dir, stage=stage, stream=stream, address_space=address_space)
+        except subprocess.TimeoutExpired:
+            run_usage.record(job.language, stage, None, 'timeout')
+            raise
+        run_usage.record(job.language, stage, result.usage, 'output_limit' if job.truncated else outcome_of(result))
+        return result
+    
+    if job.language in ('python', 'javascript'):
+        command, address_space = interpreter_command(job.language, file_path)
+        if job.language == 'python':
+            # Unbuffered, so output reaches the stream as it is printed
+            command.insert(1, '-u')
+    else:
+        job.emit('status', 'compiling')
+        
+        def compile_step(language, command, cwd, address_space):
+            result = step('compile', command, address_space, stream=False)
+            return result.returncode, result.stderr or result.stdout
+        
+        command, errors = build_program(job.language, file_path, temp_dir, compile_step=compile_step)
+        if command is None:
+            job.write('stderr', f'Compilation error:\n{errors}')
+            return 1
+        _, address_space = memory_options(job.language, 'run')
+        job.emit('status', 'running')
+    
+    return step('run', command, address_space).returncode
+
+# Background code execution for /api/jobs:
+#   JOBS_MAX_CONCURRENT  - jobs running at once across all languages
+#   JOBS_LANGUAGE_LIMITS - jobs running at once per language (compilers get fewer slots)
+#   JOBS_MAX_QUEUED      - jobs waiting to start before submissions get a 503
+#   JOBS_OUTPUT_LIMIT    - bytes of stdout+stderr kept per job; the program is killed past it
+#   JOBS_TIMEOUT         - wall-clock seconds per step (compile, run)
+#   JOBS_TTL             - seconds a finished job's output stays available
+app.config['JOBS_MAX_CONCURRENT'] = int(os.environ.get('JOBS_MAX_CONCURRENT', 4))
+app.config['JOBS_LANGUAGE_LIMITS'] = {'python': 2, 'javascript': 2, 'cpp': 1, 'c': 1, 'java': 1}
+app.config['JOBS_MAX_QUEUED'] = 100
+app.config['JOBS_OUTPUT_LIMIT'] = 1024 * 1024
+app.config['JOBS_TIMEOUT'] = 30
+app.config['JOBS_TTL'] = 600
+
+code_jobs = JobScheduler(
+    run_code_job,
+    run_limits,
+    max_concurrent=app.config['JOBS_MAX_CONCURRENT'],
+    language_limits=app.config['JOBS_LANGUAGE_LIMITS'],
+    max_queued=app.config['JOBS_MAX_QUEUED'],
+    output_limit=app.config['JOBS_OUTPUT_LIMIT'],
+    timeout=app.config['JOBS_TIMEOUT'],
+    ttl=app.config['JOBS_TTL']
+)
+
+# Submit code to run in the background; follow it at events_url
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    try:
+        language, code = parse_execute_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if language not in app.config['JOBS_LANGUAGE_LIMITS']:
+        return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
+    
+    job = code_jobs.submit(language, code)
+    if job is None:
+        response = jsonify({'success': False, 'error': 'Too many jobs queued. Please try again shortly.'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'events_url': url_for('job_events', job_id=job.id),
+        'cancel_url': url_for('cancel_job', job_id=job.id)
+    }), 202
+
+# Current state of a job, with the output produced so far
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = code_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, **job.summary(), 'output': job.output('stdout'), 'stderr': job.output('stderr')})
+
+# Server-Sent Events: `status`, `stdout` and `stderr` events as they happen, then `end`
+# with the final summary. Event ids let a client resume with Last-Event-ID (or ?after=).
+@app.route("/api/jobs/<job_id>/events")
+def job_events(job_id):
+    job = code_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    after = request.headers.get('Last-Event-ID') or request.args.get('after') or 0
+    try:
+        after = int(after)
+    except ValueError:
+        after = 0
+    
+    def generate():
+        seen = after
+        while True:
+            events, done = job.events_after(seen, timeout=15)
+            if not events and not done:
+                # Keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            for seq, kind, data in events:
+                yield f'id: {seq}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+                seen = seq
+            if done:
+                return
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Stops a queued or running job (kills its whole process group)
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = code_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status})
+
+# Queue depth, running jobs per language and outcome counts
+@app.route("/admin/jobs")
+def job_stats():
+    return jsonify({'success': True, 'jobs': code_jobs.stats()})
+
+# Warm interpreter pool counters for /api/execute-code
+@app.route("/admin/sandbox")
+def sandbox_stats():
+    return jsonify({
+        'success': True,
+        'enabled': bool(app.config['SANDBOX_POOL_SIZE']),
+        'pools': {language: pool.stats() for language, pool in sandbox_pools.items()}
+    })
 
 @app.route("/api/pass-predict", methods=["POST"])
 def api_pass_predict():
+    body, status = pass_prediction(request.get_json(silent=True))
+    return jsonify(body), status
+
+# Body and status for one /api/pass-predict request (shared with asgi.py)
+def pass_prediction(data):
     try:
-        data = request.get_json()
-
-        # Get user input
-        study_hours = data.get('study_hours')
-        sleep_hours = data.get('sleep_hours')
-        attendance = data.get('attendance')
-        class_avg_score = data.get('class_avg_score')
-        student_test_score = data.get('student_test_score')
-        student_assignment_score = data.get('student_assignment_score')
-        num_failed_before = data.get('num_failed_before')
-        participation_score = data.get('participation_score')
-
-        # Check all fields
-        if None in [study_hours, sleep_hours, attendance, class_avg_score,
-                    student_test_score, student_assignment_score,
-                    num_failed_before, participation_score]:
-            return jsonify({'success': False, 'message': 'Missing fields.'}), 400
-
-        # Use the global model and scaler
-        user_input = pd.DataFrame([[study_hours, sleep_hours, attendance, class_avg_score,
-                                   student_test_score, student_assignment_score,
-                                   num_failed_before, participation_score]], 
-                                 columns=pd.Index(['study_hours', 'sleep_hours', 'attendance', 'class_avg_score',
-                                                  'student_test_score', 'student_assignment_score',
-                                                  'num_failed_before', 'participation_score']))
-        user_scaled = PASS_SCALER.transform(user_input)
-        prediction = PASS_MODEL.predict(user_scaled)[0]
-        probability = PASS_MODEL.predict_proba(user_scaled)[0]
-
-        # Factors (same as before)
-        factors = []
-        if study_hours >= 6: factors.append("Good study hours")
-        if attendance >= 75: factors.append("High attendance")
-        if student_test_score >= 70: factors.append("Good test score")
-        if student_assignment_score >= 70: factors.append("Strong assignment score")
-        if participation_score >= 6: factors.append("Active participation")
-        if num_failed_before > 0: factors.append("Past failures may affect result")
+        if not isinstance(data, dict):
+            return {'success': False, 'message': 'Send the student fields as a JSON object.'}, 400
+
+        # Every field present and numeric, in PASS_FEATURES order
+        try:
+            values = parse_student(data)
+        except ValueError as e:
+            return {'success': False, 'message': f'{e}.'}, 400
+
+        # Scaler and model folded into one dot product (see LinearPassModel)
+        pass_model = get_pass_model()
+        with stage_timer('pass_inference'):
+            prediction, prob_fail, prob_pass = predict_pass(pass_model.linear, values)
 
+        return {
+            'success': True,
+            **describe_prediction(prob_pass, pass_factors(dict(zip(PASS_FEATURES, values)))),
+            'model_accuracy': round(pass_model.accuracy * 100, 2)
+        }, 200
+
+    except Exception as e:
+        logger.exception('pass_predict.error error=%r', e)
+        return {'success': False, 'message': 'Server error'}, 500
+
+# Scores a whole roster in one vectorized call. Accepts {"students": [...]}, a bare
+# JSON array, a CSV body (text/csv) or a CSV file upload in the "file" form field.
+@app.route("/api/pass-predict/batch", methods=["POST"])
+def api_pass_predict_batch():
+    try:
+        if 'file' in request.files:
+            students = read_students_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            students = read_students_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            students = data.get('students') if isinstance(data, dict) else data
+            if not isinstance(students, list):
+                return jsonify({'success': False, 'message': 'Provide "students" as a list or upload a CSV file.'}), 400
+        
+        if not students:
+            return jsonify({'success': False, 'message': 'No students provided.'}), 400
+        if len(students) > app.config['PASS_BATCH_MAX_ROWS']:
+            return jsonify({'success': False, 'message': f"Too many students (limit {app.config['PASS_BATCH_MAX_ROWS']})."}), 413
+        
+        rows = []
+        for index, student in enumerate(students):
+            try:
+                rows.append(parse_student(student if isinstance(student, dict) else {}))
+            except ValueError as e:
+                return jsonify({'success': False, 'message': f"Student {index}: {e}", 'index': index}), 400
+        
+        pass_model = get_pass_model()
+        with stage_timer('pass_inference'):
+            prob_pass = pass_model.linear.prob_pass(rows)
+        results = [
+            describe_prediction(p, pass_factors(dict(zip(PASS_FEATURES, row))))
+            for p, row in zip(prob_pass, rows)
+        ]
+        
         return jsonify({
             'success': True,
-            'prediction': int(prediction),
-            'label': 'Pass' if prediction == 1 else 'Fail',
-            'confidence': round(float(probability[prediction]) * 100, 2),
-            'prob_pass': round(float(probability[1]) * 100, 2),
-            'prob_fail': round(float(probability[0]) * 100, 2),
-            'factors': factors,
-            'model_accuracy': round(PASS_MODEL_ACC * 100, 2)
+            'count': len(results),
+            'results': results,
+            'model_accuracy': round(pass_model.accuracy * 100, 2)
         })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.exception('pass_predict.batch_error error=%r', e)
+        return jsonify({'success': False, 'message': 'Server error'}), 500
 
+# What-if sweep for one student: {"base": {<8 features>}, "ranges": {"study_hours": {"start": 1,
+# "stop": 10, "step": 1}, "attendance": [40, 60, 80, 100]}}. Every combination is scored at once.
+@app.route("/api/pass-predict/grid", methods=["POST"])
+def api_pass_predict_grid():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('base'), dict) or not isinstance(data.get('ranges'), dict):
+            return jsonify({'success': False, 'message': 'Provide "base" student fields and "ranges" to sweep.'}), 400
+        
+        base = parse_student(data['base'])
+        names, X = expand_grid(base, data['ranges'], app.config['PASS_GRID_MAX_POINTS'])
+        pass_model = get_pass_model()
+        with stage_timer('pass_inference'):
+            prob_pass = pass_model.linear.prob_pass(X)
+            base_prob = pass_model.linear.prob_pass([base])
+        
+        columns = [PASS_FEATURES.index(name) for name in names]
+        points = [
+            {
+                'values': {name: float(row[col]) for name, col in zip(names, columns)},
+                **describe_prediction(p, pass_factors(dict(zip(PASS_FEATURES, row))))
+            }
+            for row, p in zip(X, prob_pass)
+        ]
+        at_base = marginal_effects(pass_model.linear, base_prob)
+        over_grid = marginal_effects(pass_model.linear, prob_pass)
+        
+        return jsonify({
+            'success': True,
+            'swept': names,
+            'count': len(points),
+            'base': describe_prediction(base_prob[0], pass_factors(dict(zip(PASS_FEATURES, base)))),
+            'points': points,
+            # Percentage points of pass probability per unit increase of each feature
+            'marginal_effects': {
+                name: {
+                    'at_base': round(float(at_base[i]) * 100, 4),
+                    'average_over_grid': round(float(over_grid[i]) * 100, 4)
+                }
+                for i, name in enumerate(PASS_FEATURES)
+            },
+            'model_accuracy': round(pass_model.accuracy * 100, 2)
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
-        print("Error:", e)
+        logger.exception('pass_predict.grid_error error=%r', e)
         return jsonify({'success': False, 'message': 'Server error'}), 500
 
+# Reload the pass predictor artifact in this worker without a restart (other workers
+# pick up a newly published artifact within PASS_MODEL_CHECK_INTERVAL seconds)
+@app.route("/admin/pass-model/reload", methods=["POST"])
+def reload_pass_model_route():
+    try:
+        pass_model = reload_pass_model()
+        return jsonify({'success': True, 'model': pass_model.manifest})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error reloading pass model: {e}'}), 500
+
+# Import and warm-up timings for this worker (see benchmarks/startup_profile.py for per-module costs)
+@app.route("/admin/startup")
+def startup_stats():
+    heavy_modules = ('numpy', 'pandas', 'sklearn', 'nltk')
+    return jsonify({
+        'success': True,
+        **STARTUP_STATS,
+        'loaded_modules': [name for name in heavy_modules if name in sys.modules]
+    })
+
+# flask --app app migrate-contacts
+@app.cli.command("migrate-contacts")
+def migrate_contacts_command():
+    """Import contact_submissions.json into the JSON Lines store (only if the store is empty)."""
+    migrated = contact_store.migrate_from_json(LEGACY_CONTACT_FILE)
+    print(f"Migrated {migrated} submissions into {CONTACT_FILE}" if migrated else "Nothing to migrate")
+
+# flask --app app train-pass-model
+@app.cli.command("train-pass-model")
+def train_pass_model_command():
+    """Retrain the pass predictor and publish a new artifact."""
+    pass_model = publish_pass_model()
+    print(f"Published pass model {pass_model.checksum[:12]} "
+          f"(accuracy {pass_model.accuracy * 100:.2f}%, trained in {pass_model.manifest['training_ms']} ms)")
+
+# flask --app app build-assets [--clean]
+@app.cli.command("build-assets")
+@click.option('--clean', is_flag=True, help='Remove files left by earlier builds first.')
+def build_assets_command(clean):
+    """Minify, fingerprint and precompress static/ into static/build/, with resized copies of images."""
+    manifest = AssetBuilder(app.static_folder, clean=clean).build()
+    for name, entry in sorted(manifest['files'].items()):
+        sizes = entry['sizes']
+        variants = ', '.join(f"{encoding} {sizes[encoding]}" for encoding in entry['encodings'])
+        if 'variants' in entry:
+            variants = ', '.join(f"{len(copies)} {image_format}" for image_format, copies in entry['variants'].items())
+        print(f"{name} -> {entry['path']} ({sizes['source']} -> {sizes['built']} bytes"
+              f"{', ' + variants if variants else ''})")
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -641,5 +1285,12 @@ def not_found(error):
 def internal_error(error):
     return render_template('errors/500.html'), 500
 
+STARTUP_STATS['import_ms'] = round((time.perf_counter() - APP_IMPORT_STARTED) * 1000, 1)
+
+if app.config['MODEL_PRELOAD'] == 'eager':
+    warm_up()
+elif app.config['MODEL_PRELOAD'] == 'background':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
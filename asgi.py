@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import subprocess
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (app as flask_app, admission, ADMISSION_REJECTED, REQUEST_SECONDS, REQUESTS_TOTAL,
+                 REQUESTS_IN_FLIGHT, contact_submission, mood_analysis, pass_prediction, parse_execute_request,
+                 code_jobs, sandbox_pools, execute_pooled, get_file_extension, interpreter_command, build_program,
+                 memory_options, run_response, run_limits, run_usage)
+from run_limits import run_limited_async, outcome_of
+from metrics import stage_timer
+
+logger = logging.getLogger('portfolio.asgi')
+
+# Production ASGI entry point, serving every route and template of app.py:
+#
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+#
+# The I/O-bound routes are served natively on the event loop, so a request waiting on
+# a subprocess, the contact writer or a job's output holds no thread:
+#   POST /api/execute-code     - Python/JavaScript runs and compiled programs are awaited
+#                                with run_limited_async; builds and warm sandbox runs block,
+#                                so they go to at most ASGI_EXECUTE_THREADS threads
+#   POST /api/contact          - queued for the background writer (see ContactIntake)
+#   GET  /api/jobs/<id>/events - Server-Sent Events woken by the job, no thread per stream
+# Model inference is CPU-bound and runs in at most ASGI_INFERENCE_THREADS threads
+# (threads rather than processes, so the models are loaded once per worker and
+# concurrent requests still share micro-batches):
+#   POST /api/mood-analysis, POST /api/pass-predict
+# Everything else (pages, admin views, the batch and streaming exports) is the Flask app,
+# run by ASGI_WSGI_THREADS threads. Admission control and /metrics cover both halves.
+# Behind a reverse proxy, use uvicorn's --forwarded-allow-ips instead of TRUSTED_PROXIES.
+ASGI_INFERENCE_THREADS = int(os.environ.get('ASGI_INFERENCE_THREADS', 8))
+ASGI_EXECUTE_THREADS = int(os.environ.get('ASGI_EXECUTE_THREADS', 4))
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+inference_limiter = anyio.CapacityLimiter(ASGI_INFERENCE_THREADS)
+execute_limiter = anyio.CapacityLimiter(ASGI_EXECUTE_THREADS)
+
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+# Admission control as in app.admit_request: (class to release afterwards, None) when
+# the request may run, else (None, the 429 response)
+def admit(request, endpoint):
+    if not flask_app.config['ADMISSION_CONTROL'] or request.method in ('GET', 'HEAD', 'OPTIONS'):
+        return None, None
+    endpoint_class = flask_app.config['ADMISSION_CLASSES'].get(endpoint)
+    if endpoint_class is None:
+        return None, None
+    client = request.client.host if request.client else None
+    refusal = admission.admit(client, endpoint_class, endpoint)
+    if refusal is None:
+        return endpoint_class, None
+    reason, retry_after = refusal
+    ADMISSION_REJECTED.inc(endpoint_class, reason)
+    logger.info('admission.rejected class=%s reason=%s client=%s retry_after=%d',
+                endpoint_class, reason, client, retry_after)
+    return None, JSONResponse({'success': False, 'message': f'Too many requests. Please try again in {retry_after} s.'},
+                              429, {'Retry-After': str(retry_after)})
+
+# A Starlette route for handler, recorded in the request metrics under the Flask rule and
+# endpoint name it replaces
+def flask_route(rule, endpoint, handler, methods):
+    async def serve(request):
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(rule)
+        endpoint_class = None
+        try:
+            endpoint_class, response = admit(request, endpoint)
+            if response is None:
+                response = await handler(request)
+        finally:
+            if endpoint_class is not None:
+                admission.release(endpoint_class)
+            REQUESTS_IN_FLIGHT.dec(rule)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, rule)
+        REQUESTS_TOTAL.inc(request.method, rule, response.status_code)
+        return response
+    return Route(rule.replace('<', '{').replace('>', '}'), serve, methods=methods, name=endpoint)
+
+
+# app.run_step on the event loop
+async def run_step_async(language, stage, command, cwd, address_space=True):
+    try:
+        with stage_timer(f'code_{stage}'):
+            result = await run_limited_async(command, cwd, run_limits, 30, address_space=address_space)
+    except subprocess.TimeoutExpired:
+        run_usage.record(language, stage, None, 'timeout')
+        raise
+    run_usage.record(language, stage, result.usage, outcome_of(result))
+    return result
+
+async def api_execute_code(request):
+    try:
+        try:
+            language, code = parse_execute_request(await json_body(request))
+        except ValueError as e:
+            return JSONResponse({'success': False, 'error': str(e)}, 400)
+
+        if language in sandbox_pools and flask_app.config['SANDBOX_POOL_SIZE']:
+            try:
+                return JSONResponse(await anyio.to_thread.run_sync(execute_pooled, language, code,
+                                                                   limiter=execute_limiter))
+            except subprocess.TimeoutExpired:
+                return JSONResponse({
+                    'success': False,
+                    'error': f'{language.upper()} code execution timed out ({flask_app.config["SANDBOX_TIMEOUT"]} seconds)'
+                })
+            except Exception as e:
+                return JSONResponse({'success': False, 'error': f'Execution error: {str(e)}'})
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_file = os.path.join(temp_dir, f'main.{get_file_extension(language)}')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(code)
+
+            try:
+                if language in ['python', 'javascript']:
+                    command, address_space = interpreter_command(language, temp_file)
+                else:
+                    command, errors = await anyio.to_thread.run_sync(build_program, language, temp_file, temp_dir,
+                                                                     limiter=execute_limiter)
+                    if command is None:
+                        return JSONResponse({'success': False, 'error': f'Compilation error:\n{errors}'})
+                    _, address_space = memory_options(language, 'run')
+                result = await run_step_async(language, 'run', command, temp_dir, address_space=address_space)
+                return JSONResponse(run_response(result))
+            except subprocess.TimeoutExpired:
+                return JSONResponse({'success': False, 'error': f'{language.upper()} code execution timed out (30 seconds)'})
+            except Exception as e:
+                return JSONResponse({'success': False, 'error': f'Execution error: {str(e)}'})
+
+    except Exception as e:
+        logger.exception('execute.error error=%r', e)
+        return JSONResponse({'success': False, 'error': f'Server error: {str(e)}'}, 500)
+
+async def api_contact(request):
+    body, status, headers = contact_submission(await json_body(request))
+    return JSONResponse(body, status, headers)
+
+async def api_mood_analysis(request):
+    body, status = await anyio.to_thread.run_sync(mood_analysis, await json_body(request), limiter=inference_limiter)
+    return JSONResponse(body, status)
+
+async def api_pass_predict(request):
+    body, status = await anyio.to_thread.run_sync(pass_prediction, await json_body(request), limiter=inference_limiter)
+    return JSONResponse(body, status)
+
+# Same stream as app.job_events, waiting on the loop until the job wakes it
+async def job_events(request):
+    job = code_jobs.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'success': False, 'error': 'Unknown job'}, 404)
+    after = request.headers.get('Last-Event-ID') or request.query_params.get('after') or 0
+    try:
+        after = int(after)
+    except ValueError:
+        after = 0
+    return StreamingResponse(stream_job_events(job, after), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def stream_job_events(job, seen):
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(changed.set)
+        except RuntimeError:
+            pass  # the loop has closed
+
+    job.subscribe(wake)
+    try:
+        while True:
+            changed.clear()
+            events, done = job.events_after(seen, timeout=0)
+            for seq, kind, data in events:
+                yield f'id: {seq}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+                seen = seq
+            if done:
+                return
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), 15)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+    finally:
+        job.unsubscribe(wake)
+
+
+application = Starlette(routes=[
+    flask_route('/api/execute-code', 'api_execute_code', api_execute_code, ['POST']),
+    flask_route('/api/contact', 'api_contact', api_contact, ['POST']),
+    flask_route('/api/mood-analysis', 'api_mood_analysis', api_mood_analysis, ['POST']),
+    flask_route('/api/pass-predict', 'api_pass_predict', api_pass_predict, ['POST']),
+    flask_route('/api/jobs/<job_id>/events', 'job_events', job_events, ['GET']),
+    Mount('/', WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
+])
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run('asgi:application', host='0.0.0.0', port=5000)
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Concurrent connection capacity of the two ways of serving the app, each started as
+# its own server process:
+#   wsgi - app.run's threaded Werkzeug server (the current setup, without the debugger)
+#   asgi - uvicorn asgi:application, one worker
+# and two kinds of long-lived connection, `connections` of them opened at once:
+#   execute - POST /api/execute-code running a C program that sleeps `hold` seconds
+#   events  - GET /api/jobs/<id>/events following one job that runs `hold` seconds
+# While they are open, GET / is requested back to back to see how the pages fare. The
+# server's thread count and RSS are sampled from /proc.
+
+SLEEPER_C = '#include <unistd.h>\nint main(void) { sleep(%d); return 0; }\n'
+SLEEPER_PY = 'import time\nprint("started", flush=True)\ntime.sleep(%d)\nprint("done")\n'
+
+SERVERS = {
+    'wsgi': lambda port: [sys.executable, '-c',
+                          'import logging; logging.getLogger("werkzeug").setLevel(logging.ERROR); '
+                          f'from app import app; app.run(host="127.0.0.1", port={port}, threaded=True)'],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                          '--port', str(port), '--log-level', 'warning', '--no-access-log'],
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# (threads, RSS in MB) of a process
+def process_status(pid):
+    threads = rss = 0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return threads, rss
+
+# One request on its own connection; returns (status, body). The body ends at its
+# Content-Length, or when the server closes the connection (streamed responses).
+async def http_request(port, method, path, body=None, timeout=120):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+        if body is not None:
+            head += f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n'
+        writer.write(head.encode('ascii') + b'\r\n' + data)
+
+        async def read_response():
+            headers = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').lower().split('\r\n')
+            length = next((int(line.split(':', 1)[1]) for line in headers if line.startswith('content-length:')), None)
+            return int(headers[0].split(' ', 2)[1]), await (reader.read(-1) if length is None else reader.readexactly(length))
+        return await asyncio.wait_for(read_response(), timeout)
+    finally:
+        writer.close()
+
+class Server:
+    def __init__(self, mode, workdir):
+        self.mode = mode
+        self.port = free_port()
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+        self.log = open(os.path.join(workdir, f'{mode}.log'), 'w')
+        self.process = subprocess.Popen(SERVERS[mode](self.port), cwd=workdir, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+
+    async def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if (await http_request(self.port, 'GET', '/admin/startup', timeout=5))[0] == 200:
+                    return
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f'{self.mode} server did not start; see {self.log.name}')
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+# Opens every slow connection at once and measures until the last one has finished
+async def run_scenario(server, scenario, connections, hold):
+    if scenario == 'execute':
+        body = {'language': 'c', 'code': SLEEPER_C % hold}
+
+        async def connection():
+            status, response = await http_request(server.port, 'POST', '/api/execute-code', body)
+            return status == 200 and json.loads(response)['success']
+    else:
+        status, response = await http_request(server.port, 'POST', '/api/jobs',
+                                              {'language': 'python', 'code': SLEEPER_PY % hold})
+        events_url = json.loads(response)['events_url']
+
+        async def connection():
+            status, response = await http_request(server.port, 'GET', events_url)
+            return status == 200 and b'event: end' in response
+
+    samples = []
+    page_latencies = []
+    finished = asyncio.Event()
+
+    async def monitor():
+        while not finished.is_set():
+            samples.append(process_status(server.process.pid))
+            await asyncio.sleep(0.1)
+
+    async def pages():
+        while not finished.is_set():
+            start = time.perf_counter()
+            try:
+                status, _ = await http_request(server.port, 'GET', '/', timeout=30)
+                if status == 200:
+                    page_latencies.append((time.perf_counter() - start) * 1000)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+
+    background = [asyncio.create_task(monitor()), asyncio.create_task(pages())]
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*[connection() for _ in range(connections)], return_exceptions=True)
+    wall = time.perf_counter() - start
+    finished.set()
+    await asyncio.gather(*background)
+    page_latencies.sort()
+    return {
+        'completed': sum(1 for outcome in outcomes if outcome is True),
+        'errors': sum(1 for outcome in outcomes if outcome is not True),
+        'wall_s': round(wall, 2),
+        'peak_threads': max(threads for threads, _ in samples) if samples else None,
+        'peak_rss_mb': round(max(rss for _, rss in samples), 1) if samples else None,
+        'pages': len(page_latencies),
+        'page_p50_ms': round(percentile(page_latencies, 0.5), 1) if page_latencies else None,
+        'page_p95_ms': round(percentile(page_latencies, 0.95), 1) if page_latencies else None
+    }
+
+async def bench(modes, scenarios, levels, hold):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in modes:
+            server = Server(mode, workdir)
+            try:
+                await server.wait_ready()
+                # Builds the sleeper once so every measured run restores it from the compile cache
+                await http_request(server.port, 'POST', '/api/execute-code', {'language': 'c', 'code': SLEEPER_C % hold})
+                idle_threads, idle_rss = process_status(server.process.pid)
+                for scenario in scenarios:
+                    for connections in levels:
+                        result = await run_scenario(server, scenario, connections, hold)
+                        result.update(mode=mode, scenario=scenario, connections=connections,
+                                      idle_threads=idle_threads, idle_rss_mb=round(idle_rss, 1))
+                        results.append(result)
+                        print(f"{mode:5} {scenario:8} {connections:5} conns: {result['completed']:5} ok "
+                              f"{result['errors']:4} failed in {result['wall_s']:6.2f} s | threads "
+                              f"{idle_threads} -> {result['peak_threads']} | rss {idle_rss:.0f} -> "
+                              f"{result['peak_rss_mb']:.0f} MB | GET / p50 {result['page_p50_ms']} ms "
+                              f"p95 {result['page_p95_ms']} ms ({result['pages']} pages)", flush=True)
+            finally:
+                server.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent connection capacity: threaded WSGI vs ASGI')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--scenarios', default='execute,events')
+    parser.add_argument('--connections', default='50,200,500', help='comma-separated concurrency levels')
+    parser.add_argument('--hold', type=int, default=2, help='seconds each connection stays open')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MODEL_PRELOAD', 'lazy')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('RATE_LIMITS', 'off')
+    # One process per run, the same in both modes
+    os.environ.setdefault('SANDBOX_POOL_SIZE', '0')
+
+    results = asyncio.run(bench(args.modes.split(','), args.scenarios.split(','),
+                                [int(level) for level in args.connections.split(',')], args.hold))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
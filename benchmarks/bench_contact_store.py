@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_store import ContactStore
+
+RECORD = {
+    'name': 'Load Test',
+    'email': 'load@example.com',
+    'subject': 'Benchmark',
+    'message': 'A typical contact message of a couple of sentences. ' * 3
+}
+
+# Fills a store with `count` records in one write, like an inbox that has grown that large
+def prefill(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(1, count + 1):
+            f.write(json.dumps(dict(RECORD, id=i, timestamp='2025-01-01T00:00:00'), ensure_ascii=False) + '\n')
+
+# The previous save_contact_submission: read the whole array, append, rewrite with indent=2
+def legacy_append(path, data):
+    with open(path, 'r', encoding='utf-8') as f:
+        submissions = json.load(f)
+    submissions.append(dict(data, id=len(submissions) + 1, timestamp='2025-01-01T00:00:00'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(submissions, f, ensure_ascii=False, indent=2)
+
+def store_throughput(directory, existing, writes, fsync):
+    path = os.path.join(directory, f'store-{existing}-{fsync}.jsonl')
+    prefill(path, existing)
+    store = ContactStore(path, fsync=fsync)
+    start = time.perf_counter()
+    for _ in range(writes):
+        store.append(RECORD)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return writes / elapsed
+
+def legacy_throughput(directory, existing, writes):
+    path = os.path.join(directory, f'legacy-{existing}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([dict(RECORD, id=i, timestamp='2025-01-01T00:00:00') for i in range(1, existing + 1)], f, indent=2)
+    start = time.perf_counter()
+    for _ in range(writes):
+        legacy_append(path, RECORD)
+    return writes / (time.perf_counter() - start)
+
+def writer(path, count):
+    store = ContactStore(path, fsync='group')
+    for _ in range(count):
+        store.append(RECORD)
+    store.close()
+
+# Several processes append at once; ids must come out unique and gap-free
+def check_concurrent_ids(directory, processes, per_process):
+    path = os.path.join(directory, 'concurrent.jsonl')
+    workers = [multiprocessing.Process(target=writer, args=(path, per_process)) for _ in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    ids = [record['id'] for record in ContactStore(path, fsync='never').iter_all()]
+    expected = list(range(1, processes * per_process + 1))
+    ok = sorted(ids) == expected and ids == sorted(ids)
+    print(f"{processes} processes x {per_process} writes: {len(ids) / elapsed:,.0f} writes/s, ids unique and ordered: {ok}")
+    if not ok:
+        raise SystemExit("Concurrent writers produced duplicate, missing or out-of-order ids")
+
+def run(sizes, legacy_sizes, writes, fsync, processes):
+    directory = tempfile.mkdtemp(prefix='contact-bench-')
+    try:
+        print(f"{'existing records':>16} {'jsonl writes/s':>15} {'legacy writes/s':>16}")
+        for size in sizes:
+            store_rate = store_throughput(directory, size, writes, fsync)
+            legacy = f"{legacy_throughput(directory, size, min(writes, 200)):>16,.0f}" if size in legacy_sizes else f"{'-':>16}"
+            print(f"{size:>16,} {store_rate:>15,.0f} {legacy}")
+        if processes:
+            check_concurrent_ids(directory, processes, writes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Contact store write throughput as the record count grows')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 1000, 10000, 100000])
+    parser.add_argument('--legacy-sizes', type=int, nargs='*', default=[0, 1000, 10000])
+    parser.add_argument('--writes', type=int, default=1000)
+    parser.add_argument('--fsync', choices=['always', 'group', 'never'], default='group')
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+    run(args.sizes, set(args.legacy_sizes), args.writes, args.fsync, args.processes)
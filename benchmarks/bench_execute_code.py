@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('MODEL_PRELOAD', 'lazy')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+# Measure the routes, not the per-client limits in front of them
+os.environ.setdefault('RATE_LIMITS', 'off')
+
+import app as portfolio
+
+SNIPPETS = {
+    'python': 'total = sum(i * i for i in range(1000))\nprint("sum of squares:", total)\n',
+    'javascript': 'let total = 0;\nfor (let i = 0; i < 1000; i++) total += i * i;\nconsole.log("sum of squares:", total);\n'
+}
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# Sends `requests` POSTs to /api/execute-code from `concurrency` threads
+def measure(language, requests, concurrency):
+    client = portfolio.app.test_client()
+    payload = {'code': SNIPPETS[language], 'language': language}
+    latencies = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            response = client.post('/api/execute-code', json=payload)
+            elapsed = time.perf_counter() - start
+            if not response.get_json().get('success'):
+                raise SystemExit(f"{language} run failed: {response.get_json()}")
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return requests / wall, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000
+
+def run(languages, requests, concurrency, pool_size):
+    print(f"{'language':<11} {'mode':<11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for language in languages:
+        for mode in ('subprocess', 'pool'):
+            portfolio.app.config['SANDBOX_POOL_SIZE'] = pool_size if mode == 'pool' else 0
+            if mode == 'pool':
+                pool = portfolio.sandbox_pools[language]
+                pool.size = pool_size
+                pool.start()
+                # Let the pool fill before timing
+                while pool.stats()['idle'] < pool_size:
+                    time.sleep(0.05)
+            measure(language, min(requests, 5), 1)
+            rps, p50, p99 = measure(language, requests, concurrency)
+            print(f"{language:<11} {mode:<11} {rps:>8.1f} {p50:>8.1f} {p99:>8.1f}")
+    for language in languages:
+        print(language, portfolio.sandbox_pools[language].stats())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Requests per second for /api/execute-code, warm pool vs a process per request')
+    parser.add_argument('--languages', nargs='+', default=['python', 'javascript'], choices=sorted(SNIPPETS))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=4)
+    args = parser.parse_args()
+    run(args.languages, args.requests, args.concurrency, args.pool_size)
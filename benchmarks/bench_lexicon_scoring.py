@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mood_analyzer import Lexicon, POSITIVE_WORDS, NEGATIVE_WORDS, NEUTRAL_WORDS
+
+FILLER_WORDS = ('project', 'team', 'day', 'work', 'meeting', 'report', 'weather', 'class')
+
+# The previous scoring: one scan of the token list per lexicon entry
+def list_scan_counts(words):
+    return (
+        sum(1 for word in POSITIVE_WORDS if word in words),
+        sum(1 for word in NEGATIVE_WORDS if word in words),
+        sum(1 for word in NEUTRAL_WORDS if word in words)
+    )
+
+# Mostly non-lexicon words, like a pasted essay; hit_rate of tokens are sentiment words
+def make_tokens(length, hit_rate, rng):
+    sentiment = POSITIVE_WORDS[:5] + NEGATIVE_WORDS[:5] + ('not',)
+    return [rng.choice(sentiment) if rng.random() < hit_rate else rng.choice(FILLER_WORDS) for _ in range(length)]
+
+def best_of(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(lengths, hit_rate, repeats):
+    rng = random.Random(42)
+    lexicon = Lexicon.default()
+    print(f"{'tokens':>10} {'list scan ms':>14} {'index ms':>10} {'index ns/token':>15}")
+    for length in lengths:
+        tokens = make_tokens(length, hit_rate, rng)
+        scan = best_of(lambda: list_scan_counts(tokens), repeats)
+        indexed = best_of(lambda: lexicon.score(tokens), repeats)
+        print(f"{length:>10} {scan * 1000:>14.3f} {indexed * 1000:>10.3f} {indexed * 1e9 / length:>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare lexicon scoring cost as input length grows')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--hit-rate', type=float, default=0.05)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    run(args.lengths, args.hit_rate, args.repeats)
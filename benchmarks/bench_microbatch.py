@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('MODEL_PRELOAD', 'lazy')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('RATE_LIMITS', 'off')
+# Pass-predict batching is off by default; build its batcher so it can be compared
+os.environ.setdefault('PASS_MICROBATCH', 'on')
+
+import app as portfolio
+import mood_analyzer
+import pass_predictor
+
+# Kept so set_batching can put it back after turning batching off
+PASS_BATCHER = pass_predictor.pass_batcher
+
+SAMPLE_TEXTS = [
+    "I love this project, the results are amazing and I am so happy!",
+    "This was a terrible day, I feel tired, stressed and disappointed.",
+    "It was okay I guess, pretty average and ordinary overall.",
+    "The team was brilliant but the deadline made everyone anxious.",
+]
+
+STUDENT = {
+    'study_hours': 6, 'sleep_hours': 7, 'attendance': 85, 'class_avg_score': 70,
+    'student_test_score': 78, 'student_assignment_score': 80, 'num_failed_before': 0, 'participation_score': 7
+}
+
+# Distinct texts, so every request misses the result cache and reaches the model
+def mood_payload(i):
+    return {'text': f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} sample{i}"}
+
+ROUTES = {
+    'mood': ('/api/mood-analysis', mood_payload),
+    'pass': ('/api/pass-predict', lambda i: STUDENT),
+}
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# Turns batching on or off for both routes without restarting
+def set_batching(enabled):
+    mood_analyzer.get_mood_analyzer().batcher = mood_analyzer.mood_batcher if enabled else None
+    pass_predictor.pass_batcher = PASS_BATCHER if enabled else None
+
+# `requests` POSTs from `concurrency` threads; returns (req/s, p50 ms, p99 ms)
+def measure(route, requests, concurrency, first):
+    path, payload = ROUTES[route]
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(first, first + requests))
+
+    def worker():
+        client = portfolio.app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = client.post(path, json=payload(i))
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise SystemExit(f"{path} returned {response.status_code}: {response.get_data(as_text=True)}")
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return requests / wall, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000
+
+def run(routes, concurrencies, requests):
+    if mood_analyzer.mood_batcher is None or pass_predictor.pass_batcher is None:
+        raise SystemExit('Run with MOOD_MICROBATCH and PASS_MICROBATCH not set to off')
+    print(f"{'route':<6} {'threads':>7} {'mode':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>10}")
+    first = 0
+    for route in routes:
+        batcher = mood_analyzer.mood_batcher if route == 'mood' else PASS_BATCHER
+        for concurrency in concurrencies:
+            for mode in ('single', 'batched'):
+                set_batching(mode == 'batched')
+                measure(route, min(requests, 20), concurrency, first)
+                first += requests
+                batches, items = batcher.batches, batcher.items
+                rps, p50, p99 = measure(route, requests, concurrency, first)
+                first += requests
+                mean_batch = (f"{(batcher.items - items) / (batcher.batches - batches):>10.1f}"
+                              if mode == 'batched' else f"{'-':>10}")
+                print(f"{route:<6} {concurrency:>7} {mode:<9} {rps:>8.1f} {p50:>8.2f} {p99:>8.2f} {mean_batch}")
+    set_batching(True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Throughput of single-item inference requests with and without micro-batching')
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), default=['mood', 'pass'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=400)
+    args = parser.parse_args()
+    run(args.routes, args.concurrency, args.requests)
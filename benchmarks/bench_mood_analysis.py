@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the route, not the per-client limits in front of it
+os.environ.setdefault('RATE_LIMITS', 'off')
+
+from app import app
+
+SAMPLE_TEXTS = [
+    "I love this project, the results are amazing and I am so happy!",
+    "This was a terrible day, I feel tired, stressed and disappointed.",
+    "It was okay I guess, pretty average and ordinary overall.",
+    "The team was brilliant but the deadline made everyone anxious.",
+]
+
+# Percentile over an already sorted list of samples
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+def run(requests_count, warmup):
+    client = app.test_client()
+    for i in range(warmup):
+        client.post('/api/mood-analysis', json={'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]})
+
+    latencies = []
+    for i in range(requests_count):
+        start = time.perf_counter()
+        response = client.post('/api/mood-analysis', json={'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]})
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"Request failed with status {response.status_code}: {response.get_data(as_text=True)}")
+
+    latencies.sort()
+    print(f"requests: {requests_count}")
+    print(f"p50: {percentile(latencies, 50):.3f} ms")
+    print(f"p99: {percentile(latencies, 99):.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure /api/mood-analysis latency')
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    args = parser.parse_args()
+    run(args.requests, args.warmup)
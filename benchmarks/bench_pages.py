@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('MODEL_PRELOAD', 'lazy')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('SANDBOX_POOL_SIZE', '0')
+
+import app as portfolio
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# Sends `requests` GETs for path from `concurrency` threads; returns (req/s, p50 ms,
+# p99 ms, body bytes of the last response)
+def measure(path, requests, concurrency, headers=None, expect=200):
+    client = portfolio.app.test_client()
+    latencies = []
+    sizes = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            body = response.data
+            elapsed = time.perf_counter() - start
+            if response.status_code != expect:
+                raise SystemExit(f"GET {path} returned {response.status_code}, expected {expect}")
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(len(body))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return requests / wall, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, sizes[-1]
+
+# render: PAGE_CACHE off, the template is rendered per request (the old behaviour)
+# cached: served from the page cache
+# gzip: served from the page cache to a client that accepts gzip
+# revalidate: a browser repeating the request with If-None-Match, answered with 304
+def run(paths, requests, concurrency):
+    print(f"{'path':<24} {'mode':<11} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>8}")
+    for path in paths:
+        for mode in ('render', 'cached', 'gzip', 'revalidate'):
+            portfolio.app.config['PAGE_CACHE'] = mode != 'render'
+            headers, expect = None, 200
+            if mode == 'gzip':
+                headers = {'Accept-Encoding': 'gzip'}
+            elif mode == 'revalidate':
+                etag = portfolio.app.test_client().get(path).headers['ETag']
+                headers, expect = {'If-None-Match': etag}, 304
+            measure(path, min(requests, 50), 1, headers, expect)
+            rps, p50, p99, size = measure(path, requests, concurrency, headers, expect)
+            print(f"{path:<24} {mode:<11} {rps:>8.0f} {p50:>8.2f} {p99:>8.2f} {size:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Throughput of the template pages with and without the rendered-page cache')
+    parser.add_argument('--paths', nargs='+', default=['/', '/demo/mood-detector', '/demo/pass-predictor'])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    args = parser.parse_args()
+    run(args.paths, args.requests, args.concurrency)
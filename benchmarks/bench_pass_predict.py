@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pass_predictor import train_pass_predictor_model, LinearPassModel, PASS_FEATURES
+
+# The previous per-request path: one-row DataFrame, scaler, then predict + predict_proba
+def sklearn_predict(model, scaler, values):
+    user_input = pd.DataFrame([values], columns=pd.Index(PASS_FEATURES))
+    user_scaled = scaler.transform(user_input)
+    prediction = model.predict(user_scaled)[0]
+    probability = model.predict_proba(user_scaled)[0]
+    return int(prediction), float(probability[0]), float(probability[1])
+
+def random_students(count, rng):
+    return np.column_stack([
+        rng.integers(1, 11, count),
+        rng.integers(4, 10, count),
+        rng.integers(40, 100, count),
+        rng.integers(40, 100, count),
+        rng.integers(30, 100, count),
+        rng.integers(30, 100, count),
+        rng.integers(0, 4, count),
+        rng.integers(0, 11, count)
+    ]).astype(float)
+
+def time_per_call(fn, rows):
+    start = time.perf_counter()
+    for row in rows:
+        fn(row)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+def run(count, tolerance):
+    model, scaler, _ = train_pass_predictor_model()
+    linear = LinearPassModel(model, scaler)
+    students = random_students(count, np.random.default_rng(0))
+    rows = [list(row) for row in students]
+
+    # Equivalence against sklearn on the whole sample
+    expected = model.predict_proba(scaler.transform(pd.DataFrame(students, columns=pd.Index(PASS_FEATURES))))[:, 1]
+    actual = linear.prob_pass(students)
+    max_error = float(np.max(np.abs(expected - actual)))
+    labels_match = bool(np.all((actual > 0.5) == (expected > 0.5)))
+    print(f"students: {count}, max |prob difference|: {max_error:.2e}, labels match: {labels_match}")
+    if max_error > tolerance or not labels_match:
+        raise SystemExit(f"Fast path differs from sklearn (tolerance {tolerance})")
+
+    sample = rows[:min(len(rows), 2000)]
+    slow = time_per_call(lambda row: sklearn_predict(model, scaler, row), sample)
+    fast = time_per_call(linear.predict_one, sample)
+    print(f"sklearn + pandas: {slow:.1f} us/prediction")
+    print(f"linear fast path: {fast:.1f} us/prediction ({slow / fast:.0f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the pass predictor fast path with sklearn')
+    parser.add_argument('-n', '--students', type=int, default=10000)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+    run(args.students, args.tolerance)
@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports app.py, serves "/" once, then waits for the warm-up to finish
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/')
+first_response = time.perf_counter()
+if app.app.config['MODEL_PRELOAD'] == 'background':
+    while not app.STARTUP_STATS['warmup_done']:
+        time.sleep(0.01)
+print(json.dumps({
+    'import_ms': round((imported - start) * 1000, 1),
+    'first_response_ms': round((first_response - start) * 1000, 1),
+    'warmup_ms': app.STARTUP_STATS['warmup_ms']
+}))
+"""
+
+# Parses `python -X importtime` output into {module: (self_us, cumulative_us)}
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+# Rolls submodule self-times up to their top-level package
+def by_package(modules):
+    totals = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def profile(preload, top):
+    env = dict(os.environ, MODEL_PRELOAD=preload, PYTHONWARNINGS='ignore')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT],
+        capture_output=True, text=True, cwd=ROOT, env=env
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    packages = by_package(parse_importtime(result.stderr))
+
+    print(f"MODEL_PRELOAD={preload}")
+    print(f"  import app:          {timings['import_ms']:>9.1f} ms")
+    print(f"  first response '/':  {timings['first_response_ms']:>9.1f} ms")
+    for name, value in timings['warmup_ms'].items():
+        print(f"  warm-up {name + ':':<22} {value if isinstance(value, str) else f'{value:>6.1f} ms'}")
+    print(f"  top imports by package (self time, includes warm-up):")
+    for package, self_us in packages[:top]:
+        print(f"    {package:<24} {self_us / 1000:>9.1f} ms")
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report per-package import cost and warm-up time for app.py')
+    parser.add_argument('--preload', nargs='+', default=['lazy', 'background', 'eager'],
+                        choices=['lazy', 'background', 'eager'])
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+    for mode in args.preload:
+        profile(mode, args.top)
+        print()
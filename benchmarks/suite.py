@@ -0,0 +1,391 @@
+import os
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('MODEL_PRELOAD', 'lazy')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+# Measure the routes, not the per-client limits in front of them
+os.environ.setdefault('RATE_LIMITS', 'off')
+
+# Reproducible benchmark suite: micro-benchmarks of the core functions and a load test of
+# every API route, written as JSON for run-to-run comparison.
+#
+#   python benchmarks/suite.py --output run.json
+#   python benchmarks/suite.py --save-baseline             # store this run as the baseline
+#   python benchmarks/suite.py --baseline                  # exit 1 if anything got slower
+#
+# The app runs in a scratch directory, so contact submissions made by the load test do
+# not land in the real inbox. Results depend on the machine; compare runs from one host.
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+SAMPLE_TEXTS = [
+    "I love this project, the results are amazing and I am so happy!",
+    "This was a terrible day, I feel tired, stressed and disappointed.",
+    "It was okay I guess, pretty average and ordinary overall.",
+    "The team was brilliant but the deadline made everyone anxious.",
+]
+
+STUDENT = {
+    'study_hours': 6, 'sleep_hours': 7, 'attendance': 85, 'class_avg_score': 70,
+    'student_test_score': 78, 'student_assignment_score': 80, 'num_failed_before': 0, 'participation_score': 7
+}
+
+CONTACT = {
+    'name': 'Load Test',
+    'email': 'load@example.com',
+    'subject': 'Benchmark',
+    'message': 'A typical contact message of a couple of sentences. ' * 3
+}
+
+CODE = {'language': 'python', 'code': 'total = sum(i * i for i in range(1000))\nprint("sum of squares:", total)\n'}
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+# Latency summary of one benchmark; `wall` is the elapsed time for all calls together
+def summarize(kind, latencies, wall, errors=0, **extra):
+    latencies = sorted(latencies)
+    return {
+        'kind': kind,
+        'count': len(latencies),
+        'errors': errors,
+        'ops_per_s': round(len(latencies) / wall, 2) if wall else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 4),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        **extra
+    }
+
+# Calls fn(i) `repeat` times after `warmup` untimed calls
+def time_calls(fn, repeat, warmup=3, **extra):
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize('micro', latencies, time.perf_counter() - start, **extra)
+
+
+# Micro-benchmarks
+
+def bench_pass_train(portfolio, scale):
+    from pass_predictor import train_pass_predictor_model
+    return time_calls(lambda i: train_pass_predictor_model(), max(1, 3 * scale // 10), warmup=1)
+
+def bench_pass_predict_one(portfolio, scale):
+    linear = portfolio.get_pass_model().linear
+    row = list(STUDENT.values())
+    return time_calls(lambda i: linear.predict_one(row), 2000 * scale)
+
+# Scoring with the result cache out of the way, so every call tokenizes, cleans and scores
+def bench_mood(mode):
+    def bench(portfolio, scale):
+        analyzer = portfolio.get_mood_analyzer()
+        cache, analyzer.cache = analyzer.cache, None
+        try:
+            return time_calls(lambda i: analyzer.analyze_batch([SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]], mode=mode),
+                              50 * scale)
+        finally:
+            analyzer.cache = cache
+    return bench
+
+def bench_mood_batch(portfolio, scale):
+    analyzer = portfolio.get_mood_analyzer()
+    texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} number{i}" for i in range(256)]
+    cache, analyzer.cache = analyzer.cache, None
+    try:
+        return time_calls(lambda i: analyzer.analyze_batch(texts), 2 * scale, warmup=1, texts_per_call=len(texts))
+    finally:
+        analyzer.cache = cache
+
+# One contact record saved as the background writer does it (ContactStore.append,
+# then ContactIndex.sync) against a store that already holds `existing` records
+def bench_contact_save(existing):
+    def bench(portfolio, scale):
+        from contact_store import ContactStore, ContactIndex
+        from bench_contact_store import prefill
+        directory = tempfile.mkdtemp(prefix='contact-bench-')
+        try:
+            path = os.path.join(directory, 'contacts.jsonl')
+            prefill(path, existing)
+            store = ContactStore(path, fsync='group')
+            index = ContactIndex(os.path.join(directory, 'contacts.sqlite3'), store)
+            index.sync()
+
+            def save(i):
+                store.append(CONTACT)
+                index.sync()
+            result = time_calls(save, 100 * scale, existing_records=existing)
+            store.close()
+            return result
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return bench
+
+MICRO_BENCHMARKS = {
+    'micro.pass_train': bench_pass_train,
+    'micro.pass_predict_one': bench_pass_predict_one,
+    'micro.mood_score_model': bench_mood('model'),
+    'micro.mood_score_lexicon': bench_mood('lexicon'),
+    'micro.mood_score_batch256': bench_mood_batch,
+    'micro.contact_save_1k': bench_contact_save(1000),
+    'micro.contact_save_100k': bench_contact_save(100000),
+}
+
+
+# Load generator
+
+# (method, path, JSON body or a function of the request number returning one, expected statuses)
+LOAD_ROUTES = {
+    'load.home': ('GET', '/', None, (200,)),
+    'load.pass_predict': ('POST', '/api/pass-predict', STUDENT, (200,)),
+    # Distinct texts, so requests miss the result cache and reach the model
+    'load.mood_analysis': ('POST', '/api/mood-analysis',
+                           lambda i: {'text': f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} number{i}"}, (200,)),
+    'load.mood_analysis_cached': ('POST', '/api/mood-analysis', lambda i: {'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]},
+                                  (200,)),
+    'load.execute_code': ('POST', '/api/execute-code', CODE, (200,)),
+    'load.contact': ('POST', '/api/contact', CONTACT, (202,)),
+}
+
+# Sends requests through Flask's test client, in this thread
+class ClientTransport:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body):
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            return response.status_code
+        return send
+
+    def close(self):
+        pass
+
+# Serves the app from a threaded werkzeug server on a free local port and sends real
+# HTTP requests, one keep-alive connection per load thread
+class HttpTransport:
+    def __init__(self, app):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+
+        def send(method, path, body):
+            data = None if body is None else json.dumps(body).encode('utf-8')
+            headers = {'Content-Type': 'application/json'} if data is not None else {}
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        return send
+
+    def close(self):
+        self.server.shutdown()
+
+# `requests` requests from `concurrency` threads, each sending its next one as soon as
+# the previous answer arrives; request numbers (for generated bodies) start at `first`
+def run_load(transport, route, requests, concurrency, first=0):
+    method, path, body, expected = route
+    latencies = []
+    errors = [0]
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(first, first + requests))
+
+    def worker():
+        send = transport.session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            payload = body(i) if callable(body) else body
+            start = time.perf_counter()
+            try:
+                status = send(method, path, payload)
+            except Exception:
+                status = 'exception'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status not in expected:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize('load', latencies, time.perf_counter() - start, errors=errors[0], concurrency=concurrency,
+                     statuses=statuses)
+
+def bench_load(name, route, requests, concurrency):
+    def bench(portfolio, transport):
+        # Each route is slower by an order of magnitude or more than the one before it
+        count = requests
+        if name in ('load.execute_code', 'load.mood_analysis'):
+            count = max(concurrency, requests // 10)
+        # Warm up with request numbers past the measured ones, so generated bodies stay unseen
+        run_load(transport, route, min(count, 20), 1, first=count)
+        return run_load(transport, route, count, concurrency)
+    return bench
+
+
+# Comparison against a baseline
+
+# Metrics that can be compared; only ops_per_s gets better as it grows
+COMPARABLE = ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'ops_per_s')
+
+# Benchmarks whose latency metrics grew, or whose throughput fell, by more than
+# `threshold` (a fraction) against the baseline results
+def find_regressions(results, baseline, threshold, metrics=('p50_ms', 'ops_per_s')):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in metrics:
+            higher_is_worse = metric != 'ops_per_s'
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change if higher_is_worse else -change) > threshold:
+                regressions.append({'benchmark': name, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change_pct': round(change * 100, 1)})
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def selected(names, patterns):
+    return [name for name in names if not patterns or any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+def run(args):
+    # Contact files are relative to the working directory; keep the load test's writes out of the repo
+    scratch = tempfile.mkdtemp(prefix='portfolio-bench-')
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        import app as portfolio
+        results = {}
+        micro = selected(MICRO_BENCHMARKS, args.only)
+        load = selected(LOAD_ROUTES, args.only)
+        for name in micro:
+            results[name] = MICRO_BENCHMARKS[name](portfolio, args.scale)
+            print(f"{name:<30} p50 {results[name]['p50_ms']:>10.3f} ms  p99 {results[name]['p99_ms']:>10.3f} ms",
+                  file=sys.stderr)
+        if load:
+            transport = (HttpTransport if args.transport == 'http' else ClientTransport)(portfolio.app)
+            try:
+                for name in load:
+                    bench = bench_load(name, LOAD_ROUTES[name], args.requests, args.concurrency)
+                    result = results[name] = bench(portfolio, transport)
+                    print(f"{name:<30} {result['ops_per_s']:>8.1f} req/s  p50 {result['p50_ms']:.2f}  "
+                          f"p95 {result['p95_ms']:.2f}  p99 {result['p99_ms']:.2f} ms  errors {result['errors']}",
+                          file=sys.stderr)
+            finally:
+                transport.close()
+            portfolio.contact_intake.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        'meta': {
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'transport': args.transport,
+            'scale': args.scale,
+            'requests': args.requests,
+            'concurrency': args.concurrency
+        },
+        'results': results
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Micro-benchmarks and API load test with baseline comparison')
+    parser.add_argument('--only', nargs='*', default=[], help='glob patterns of benchmarks to run, e.g. "load.*"')
+    parser.add_argument('--scale', type=int, default=10, help='repetitions multiplier for the micro-benchmarks')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per route in the load test')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--transport', choices=['client', 'http'], default='client',
+                        help="Flask's test client, or HTTP to a local threaded WSGI server")
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE,
+                        help='compare with this report (default benchmarks/baseline.json); exit 1 on regressions')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help='store this run as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before flagging (0.2 = 20%%)')
+    # Tail latencies of short runs vary too much between runs to flag by default
+    parser.add_argument('--compare', nargs='+', choices=COMPARABLE, default=['p50_ms', 'ops_per_s'])
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for setting in ('transport', 'requests', 'concurrency', 'scale', 'cpus'):
+            if baseline['meta'].get(setting) != report['meta'][setting]:
+                print(f"warning: baseline {setting}={baseline['meta'].get(setting)}, this run "
+                      f"{setting}={report['meta'][setting]}; numbers may not be comparable", file=sys.stderr)
+        report['baseline'] = {'path': args.baseline, 'revision': baseline['meta'].get('revision'),
+                              'threshold': args.threshold, 'compared': args.compare}
+        report['regressions'] = find_regressions(report['results'], baseline['results'], args.threshold,
+                                                 args.compare)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['benchmark']} {regression['metric']}: {regression['baseline']} -> "
+                  f"{regression['current']} ({regression['change_pct']:+.1f}%)", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    if report.get('regressions'):
+        sys.exit(1)
@@ -0,0 +1,264 @@
+import time
+import uuid
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+from run_limits import run_limited, kill_group
+
+logger = logging.getLogger('portfolio.jobs')
+
+FINAL_STATES = ('succeeded', 'failed', 'timeout', 'cancelled')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# One code execution submitted through /api/jobs. Output and state changes are kept as a
+# numbered event list ([(seq, kind, data)]) so any number of readers can follow the job
+# and a reconnecting client can resume from the last event it saw.
+class Job:
+    def __init__(self, language, code, limits, output_limit, timeout):
+        self.id = uuid.uuid4().hex
+        self.language = language
+        self.code = code
+        self.limits = limits
+        self.output_limit = output_limit
+        self.timeout = timeout
+        self.usage = {}
+        self.status = 'queued'
+        self.returncode = None
+        self.error = None
+        self.output_bytes = 0
+        self.truncated = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.done = False
+        self._changed = threading.Condition()
+        self._listeners = []
+        self._process = None
+        self._cancel_requested = False
+
+    def emit(self, kind, data):
+        with self._changed:
+            self.events.append((len(self.events) + 1, kind, data))
+            self._changed.notify_all()
+            self._wake_listeners()
+
+    # Adds program output, counting it against output_limit; False once the limit is hit
+    def write(self, stream, text):
+        if self.truncated:
+            return False
+        size = len(text.encode('utf-8'))
+        if self.output_bytes + size > self.output_limit:
+            text = text.encode('utf-8')[:self.output_limit - self.output_bytes].decode('utf-8', errors='ignore')
+            self.truncated = True
+        self.output_bytes += len(text.encode('utf-8'))
+        if text:
+            self.emit(stream, text)
+        return not self.truncated
+
+    def output(self, stream):
+        return ''.join(data for _, kind, data in self.events if kind == stream)
+
+    # Events after `after`, waiting up to timeout seconds for one to arrive
+    def events_after(self, after, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > after or self.done, timeout)
+            return self.events[after:], self.done
+
+    # Calls wake() after every new event, on the thread that added it, for readers that
+    # wait on an event loop instead of in events_after(); wake must not block
+    def subscribe(self, wake):
+        with self._changed:
+            self._listeners.append(wake)
+
+    def unsubscribe(self, wake):
+        with self._changed:
+            if wake in self._listeners:
+                self._listeners.remove(wake)
+
+    def _wake_listeners(self):
+        for wake in self._listeners:
+            wake()
+
+    def finish(self, status, returncode=None, error=None):
+        self.status = status
+        self.returncode = returncode
+        self.error = error
+        self.finished = time.time()
+        with self._changed:
+            self.events.append((len(self.events) + 1, 'end', self.summary()))
+            self.done = True
+            self._changed.notify_all()
+            self._wake_listeners()
+
+    def cancel(self):
+        self._cancel_requested = True
+        process = self._process
+        if process is not None:
+            # No poll() here: reaping the child would lose its resource usage
+            kill_group(process)
+
+    # Runs one process for this job under run_limits and in its own process group. With
+    # stream=True its output becomes job events as it is produced; otherwise it is
+    # captured in the result. The step's usage is kept under usage[stage].
+    def run_step(self, command, cwd, stage='run', stream=True, address_space=True):
+        if self._cancel_requested:
+            raise JobCancelled()
+
+        def started(process):
+            self._process = process
+            # cancel() may have run between the check above and the start
+            if self._cancel_requested:
+                kill_group(process)
+
+        try:
+            result = run_limited(command, cwd, self.limits, self.timeout, address_space=address_space,
+                                 on_output=self.write if stream else None, on_start=started)
+        finally:
+            self._process = None
+        if self._cancel_requested:
+            raise JobCancelled()
+        self.usage[stage] = result.usage
+        return result
+
+    def summary(self):
+        return {
+            'job_id': self.id,
+            'language': self.language,
+            'status': self.status,
+            'returncode': self.returncode,
+            'error': self.error,
+            'output_bytes': self.output_bytes,
+            'truncated': self.truncated,
+            'usage': dict(self.usage),
+            'queued_ms': round(((self.started or self.finished or time.time()) - self.created) * 1000, 1),
+            'run_ms': round(((self.finished or time.time()) - self.started) * 1000, 1) if self.started else None
+        }
+
+
+# Runs submitted jobs on their own threads, at most max_concurrent at once and at most
+# language_limits[language] (default_language_limit otherwise) per language. Jobs that
+# cannot start yet wait in FIFO order; a job for a language at its limit does not hold
+# up jobs for other languages behind it. Finished jobs are kept for ttl seconds so
+# clients can still fetch their output.
+#
+# runner(job, temp_dir) does the language-specific work through job.run_step and returns
+# the program's exit code. Every step runs under `limits` (a run_limits.RunLimits).
+class JobScheduler:
+    def __init__(self, runner, limits, max_concurrent=4, language_limits=None, default_language_limit=2,
+                 max_queued=100, output_limit=1024 * 1024, timeout=30, ttl=600):
+        self.runner = runner
+        self.limits = limits
+        self.max_concurrent = max_concurrent
+        self.language_limits = language_limits or {}
+        self.default_language_limit = default_language_limit
+        self.max_queued = max_queued
+        self.output_limit = output_limit
+        self.timeout = timeout
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pending = deque()
+        self._running = {}
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = {state: 0 for state in FINAL_STATES}
+
+    def language_limit(self, language):
+        return self.language_limits.get(language, self.default_language_limit)
+
+    # Queues a job; returns None when max_queued jobs are already waiting
+    def submit(self, language, code):
+        job = Job(language, code, self.limits, self.output_limit, self.timeout)
+        with self._lock:
+            self._sweep()
+            if len(self._pending) >= self.max_queued:
+                self.rejected += 1
+                return None
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self.submitted += 1
+            self._dispatch()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            if job in self._pending:
+                self._pending.remove(job)
+                self.completed['cancelled'] += 1
+                job.finish('cancelled')
+                return job
+        job.cancel()
+        return job
+
+    def _dispatch(self):
+        started = []
+        for job in self._pending:
+            if sum(self._running.values()) >= self.max_concurrent:
+                break
+            if self._running.get(job.language, 0) < self.language_limit(job.language):
+                self._running[job.language] = self._running.get(job.language, 0) + 1
+                started.append(job)
+        for job in started:
+            self._pending.remove(job)
+            job.status = 'running'
+            job.started = time.time()
+            job.emit('status', 'running')
+            threading.Thread(target=self._run, args=(job,), name=f'job-{job.id[:8]}', daemon=True).start()
+
+    def _run(self, job):
+        try:
+            with tempfile.TemporaryDirectory(prefix='job-') as temp_dir:
+                returncode = self.runner(job, temp_dir)
+            if job.truncated:
+                job.finish('failed', returncode, f'Output limit of {self.output_limit} bytes exceeded')
+            else:
+                job.finish('succeeded' if returncode == 0 else 'failed', returncode)
+        except JobCancelled:
+            job.finish('cancelled')
+        except subprocess.TimeoutExpired:
+            job.finish('timeout', error=f'{job.language.upper()} code execution timed out ({self.timeout} seconds)')
+        except Exception as e:
+            logger.exception('job.error job_id=%s error=%r', job.id, e)
+            job.finish('failed', error=f'Execution error: {e}')
+        with self._lock:
+            self._running[job.language] -= 1
+            self.completed[job.status] += 1
+            self._dispatch()
+        logger.info('job.finished job_id=%s language=%s status=%s run_ms=%s',
+                    job.id, job.language, job.status, job.summary()['run_ms'])
+
+    # Drops finished jobs older than ttl
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._pending),
+                'running': dict(self._running),
+                'max_concurrent': self.max_concurrent,
+                'language_limits': dict(self.language_limits),
+                'default_language_limit': self.default_language_limit,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': dict(self.completed),
+                'retained': len(self._jobs)
+            }
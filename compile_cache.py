@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+
+logger = logging.getLogger('portfolio.compile_cache')
+
+META_FILE = 'meta.json'
+
+
+# First line of `<compiler> --version` (`-version` for javac), remembered per binary
+# path, mtime and size so an upgraded compiler gets new cache keys without a restart
+_versions = {}
+_versions_lock = threading.Lock()
+
+def compiler_version(compiler):
+    path = shutil.which(compiler)
+    if path is None:
+        raise FileNotFoundError(f"Compiler not found: {compiler}")
+    stat = os.stat(path)
+    identity = (path, stat.st_mtime_ns, stat.st_size)
+    with _versions_lock:
+        version = _versions.get(identity)
+    if version is None:
+        flag = '-version' if compiler == 'javac' else '--version'
+        result = subprocess.run([path, flag], capture_output=True, text=True, timeout=30)
+        output = (result.stdout or result.stderr).strip()
+        version = output.splitlines()[0] if output else path
+        with _versions_lock:
+            _versions[identity] = version
+    return version
+
+def cache_key(language, version, flags, source):
+    digest = hashlib.sha256()
+    for part in (language, version, '\0'.join(flags), source):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0\0')
+    return digest.hexdigest()
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+# Compiler output (the C/C++ binary or Java .class files) stored on disk under the
+# SHA-256 of language, compiler version, flags and source, as <dir>/<key[:2]>/<key>/.
+# Entries are assembled in a staging directory and renamed into place, so workers in
+# other processes only ever see complete entries. A hit refreshes the entry's mtime;
+# after each store the least recently used entries are removed until the cache fits
+# in max_bytes.
+class CompileCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self.compile_ms_saved = 0.0
+        self.compile_ms_spent = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    # Copies a cached entry's files into dest; returns False on a miss
+    def restore(self, key, dest):
+        if not self.enabled:
+            return False
+        path = self.entry_path(key)
+        try:
+            with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            for name in meta['files']:
+                # Copies, so a program that rewrites its own binary cannot change the cache
+                shutil.copy2(os.path.join(path, name), os.path.join(dest, name))
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # Missing, or removed by another worker's eviction while we read it
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+            self.compile_ms_saved += meta.get('compile_ms', 0)
+        return True
+
+    # Stores the named files from source_dir under key
+    def store(self, key, source_dir, files, compile_ms):
+        with self._lock:
+            self.compile_ms_spent += compile_ms
+        if not self.enabled:
+            return
+        path = self.entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.directory, prefix='.staging-')
+            try:
+                for name in files:
+                    shutil.copy2(os.path.join(source_dir, name), os.path.join(staging, name))
+                meta = {'files': list(files), 'compile_ms': round(compile_ms, 1), 'created': time.time()}
+                with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                os.rename(staging, path)
+            except OSError:
+                # Another worker stored the same key first; keep theirs
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(path):
+                    raise
+                return
+            with self._lock:
+                self.stores += 1
+            self.evict()
+        except OSError as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning('compile_cache.store_failed key=%s error=%r', key[:12], e)
+
+    # Removes least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        entries, total = [], 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir() or shard.name.startswith('.'):
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    size = directory_size(entry.path)
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+                total += size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass  # shard still holds other entries
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'directory': self.directory,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'compile_ms_saved': round(self.compile_ms_saved, 1),
+                'compile_ms_spent': round(self.compile_ms_spent, 1)
+            }
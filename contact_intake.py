@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+
+from metrics import observe_stage, stage_timer
+
+logger = logging.getLogger('portfolio.contacts')
+
+# Sentinel that tells the writer thread to stop once everything before it is written
+STOP = object()
+
+
+# Takes contact submissions off the request path: submit() only puts the record on a
+# bounded queue, and a background writer appends whatever has accumulated in one
+# store.append_many call. A full queue is reported back to the caller instead of
+# blocking it, and close() writes out everything still queued.
+#
+# The writer thread is started per process on first use, so a gunicorn --preload
+# master that imported the app does not hand a dead thread to its forked workers.
+#
+# Logs identify a submission by a random submission id only, never by what was sent.
+# Records the store still refuses after `retries` attempts are appended to
+# dead_letter_path (JSON Lines with the id, time and error) for re-import by hand.
+class ContactIntake:
+    def __init__(self, store, on_commit=None, max_queue=1000, batch_size=100,
+                 retries=3, retry_delay=0.5, dead_letter_path=None):
+        self.store = store
+        self.dead_letter_path = dead_letter_path
+        self.on_commit = on_commit
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.largest_batch = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._run, name='contact-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    # Queues a validated submission; False means the queue is full and the caller should back off
+    def submit(self, data):
+        self._ensure_started()
+        submission_id = uuid.uuid4().hex[:16]
+        try:
+            self._queue.put_nowait((submission_id, data))
+        except queue.Full:
+            self.rejected += 1
+            logger.warning('contact.rejected reason=queue_full pending=%d', self._queue.qsize())
+            return False
+        self.accepted += 1
+        logger.info('contact.queued submission_id=%s pending=%d', submission_id, self._queue.qsize())
+        logger.debug('contact.payload submission_id=%s message_chars=%d', submission_id, len(data['message']))
+        return True
+
+    def pending(self):
+        return self._queue.qsize() if self._pid == os.getpid() else 0
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, stop = [], item is STOP
+            if not stop:
+                batch.append(item)
+            # Take whatever else is already waiting, up to batch_size
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                records = self.store.append_many([data for _, data in batch])
+                break
+            except Exception as e:
+                error = e
+                logger.error('contact.write_failed attempt=%d records=%d error=%r', attempt, len(batch), e)
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * attempt)
+        else:
+            self.failed += len(batch)
+            self._dead_letter(batch, error)
+            return
+
+        write_seconds = time.perf_counter() - start
+        observe_stage('contact_store_write', write_seconds)
+        self.written += len(records)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(records))
+        logger.info('contact.saved first_id=%d last_id=%d records=%d write_ms=%.2f',
+                    records[0]['id'], records[-1]['id'], len(records), write_seconds * 1000)
+        if self.on_commit is not None:
+            try:
+                with stage_timer('contact_post_commit'):
+                    self.on_commit()
+            except Exception as e:
+                # The records are already saved; whatever on_commit missed is caught up next time
+                logger.error('contact.post_commit_failed error=%r', e)
+
+    # Out of retries: keeps the batch in the dead-letter file, or reports which
+    # submissions are lost when that cannot be written either
+    def _dead_letter(self, batch, error):
+        ids = ','.join(submission_id for submission_id, _ in batch)
+        if self.dead_letter_path is not None:
+            failed_at = datetime.now().isoformat()
+            lines = ''.join(json.dumps({'submission_id': submission_id, 'failed_at': failed_at, 'error': repr(error),
+                                        'record': data}, ensure_ascii=False) + '\n' for submission_id, data in batch)
+            try:
+                fd = os.open(self.dead_letter_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                try:
+                    os.write(fd, lines.encode('utf-8'))
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                self.dead_lettered += len(batch)
+                logger.error('contact.dead_lettered submission_ids=%s path=%s', ids, self.dead_letter_path)
+                return
+            except OSError as e:
+                logger.error('contact.dead_letter_failed path=%s error=%r', self.dead_letter_path, e)
+        logger.critical('contact.dropped submission_ids=%s', ids)
+
+    # Stops the writer after it has written everything queued so far (call on shutdown)
+    def close(self, timeout=30):
+        if self._pid != os.getpid():
+            return
+        pending = self._queue.qsize()
+        self._queue.put(STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error('contact.drain_timeout pending=%d', self._queue.qsize())
+        else:
+            logger.info('contact.drained records=%d', pending)
+        self._pid = None
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'max_queue': self.max_queue,
+            'batch_size': self.batch_size,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'batches': self.batches,
+            'largest_batch': self.largest_batch,
+            'failed': self.failed,
+            'dead_lettered': self.dead_lettered
+        }
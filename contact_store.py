@@ -0,0 +1,468 @@
+import os
+import re
+import html
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+FSYNC_MODES = ('always', 'group', 'never')
+
+logger = logging.getLogger('portfolio.contacts')
+
+
+# Cross-process exclusive lock on a sidecar .lock file (flock on POSIX, msvcrt on Windows)
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting
+                    continue
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def close(self):
+        os.close(self._fd)
+
+
+# Append-only JSON Lines store for contact submissions. Each record is one line written
+# with a single O_APPEND write while holding the lock, so writers in different threads
+# and processes never interleave and always hand out increasing ids.
+#
+# fsync modes: 'always' syncs every write, 'group' syncs at most every fsync_interval
+# seconds from a background thread (one fsync covers every write since the last one),
+# 'never' leaves it to the OS.
+class ContactStore:
+    def __init__(self, path, fsync='group', fsync_interval=0.05):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._thread_lock = threading.Lock()
+        self._pid = None
+
+    # Descriptors, lock and fsync thread are per process: a flock taken through a
+    # descriptor inherited across fork() would not exclude the sibling workers
+    def _ensure_open(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._file_lock = FileLock(self.path + '.lock')
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        # (file size, id) after our own last write; lets us skip re-reading the tail
+        # when no other process appended in between
+        self._last_seen = None
+        self._dirty = threading.Event()
+        self._closed = threading.Event()
+        if self.fsync == 'group':
+            threading.Thread(target=self._flush_loop, name='contact-fsync', daemon=True).start()
+
+    # Appends a submission and returns the stored record (with id and timestamp)
+    def append(self, data):
+        return self.append_many([data])[0]
+
+    # Appends several submissions with one lock acquisition and one write; returns the
+    # stored records in order
+    def append_many(self, items):
+        if not items:
+            return []
+        with self._thread_lock:
+            self._ensure_open()
+            return self._append_locked(items)
+
+    def _append_locked(self, items):
+        with self._file_lock:
+            size = os.fstat(self._fd).st_size
+            if self._last_seen is not None and self._last_seen[0] == size:
+                last_id, needs_newline = self._last_seen[1], False
+            else:
+                last_id, needs_newline = self._read_tail(size)
+
+            timestamp = datetime.now().isoformat()
+            submissions = [{
+                'id': last_id + i,
+                'timestamp': timestamp,
+                'name': data['name'],
+                'email': data['email'],
+                'subject': data['subject'],
+                'message': data['message']
+            } for i, data in enumerate(items, 1)]
+            lines = ''.join(json.dumps(s, ensure_ascii=False) + '\n' for s in submissions)
+            if needs_newline:
+                # A previous writer died mid-line; start on a fresh line
+                lines = '\n' + lines
+            payload = lines.encode('utf-8')
+            os.write(self._fd, payload)
+            self._last_seen = (size + len(payload), last_id + len(submissions))
+
+            if self.fsync == 'always':
+                os.fsync(self._fd)
+            elif self.fsync == 'group':
+                self._dirty.set()
+        return submissions
+
+    # Highest id in the file, found by reading backwards from the end; also reports
+    # whether the file ends in a partial line
+    def _read_tail(self, size):
+        if size == 0:
+            return 0, False
+        with open(self.path, 'rb') as f:
+            f.seek(size - 1)
+            needs_newline = f.read(1) != b'\n'
+            chunk = 4096
+            while True:
+                start = max(0, size - chunk)
+                f.seek(start)
+                lines = f.read(size - start).split(b'\n')
+                if start > 0:
+                    # The first piece may be the tail end of a longer line
+                    lines = lines[1:]
+                for raw in reversed(lines):
+                    record = parse_line(raw)
+                    if record is not None:
+                        return int(record['id']), needs_newline
+                if start == 0:
+                    return 0, needs_newline
+                chunk *= 2
+
+    # Yields every stored record in insertion order without loading the file into memory
+    def iter_all(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                record = parse_line(raw)
+                if record is not None:
+                    yield record
+
+    def count(self):
+        return sum(1 for _ in self.iter_all())
+
+    def flush(self):
+        if self._pid == os.getpid() and self._dirty.is_set():
+            self._dirty.clear()
+            os.fsync(self._fd)
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            if self._dirty.wait(timeout=1.0):
+                time.sleep(self.fsync_interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.error('contact_store.fsync_failed path=%s error=%r', self.path, e)
+
+    def close(self):
+        with self._thread_lock:
+            if self._pid != os.getpid():
+                return
+            self._closed.set()
+            self.flush()
+            os.close(self._fd)
+            self._file_lock.close()
+            self._pid = None
+
+    # One-time import of the old contact_submissions.json array. Runs only while the
+    # store is empty, so it is safe to call on every start; the JSON file is left as is.
+    def migrate_from_json(self, json_path):
+        if not os.path.exists(json_path):
+            return 0
+        with self._thread_lock:
+            self._ensure_open()
+            with self._file_lock:
+                if os.fstat(self._fd).st_size > 0:
+                    return 0
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    submissions = json.load(f)
+                payload = ''.join(json.dumps(s, ensure_ascii=False) + '\n' for s in submissions).encode('utf-8')
+                os.write(self._fd, payload)
+                os.fsync(self._fd)
+                self._last_seen = (len(payload), max((int(s['id']) for s in submissions), default=0))
+        return len(submissions)
+
+
+def parse_line(raw):
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+
+CONTACT_COLUMNS = ('id', 'timestamp', 'name', 'email', 'subject', 'message')
+
+CONTACT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_timestamp ON contacts (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts (email COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS idx_contacts_subject ON contacts (subject COLLATE NOCASE, id);
+CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Full-text index over subject and message, kept in step with `contacts` by triggers
+CONTACT_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+    subject, message, content='contacts', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+    INSERT INTO contacts_fts (rowid, subject, message) VALUES (new.id, new.subject, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+    INSERT INTO contacts_fts (contacts_fts, rowid, subject, message) VALUES ('delete', old.id, old.subject, old.message);
+END;
+"""
+
+# Control characters used as highlight markers inside SQLite, swapped for <mark> after escaping
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+SEARCH_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# Turns free text into an FTS5 query that matches documents containing every word.
+# Words are quoted so user input can never be parsed as FTS5 syntax; a trailing *
+# makes the last word a prefix match.
+def fts_query(text):
+    tokens = SEARCH_TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if text.rstrip().endswith('*'):
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+# HTML-escapes a snippet and wraps the matched terms in <mark>
+def render_highlight(text):
+    escaped = html.escape(text or '')
+    return escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+# SQLite index over the JSONL store for the admin views. The JSONL file stays the
+# source of truth; sync() imports whatever was appended since the byte offset it last
+# reached, so records written by any worker show up and nothing is imported twice.
+class ContactIndex:
+    def __init__(self, db_path, store, batch_size=5000):
+        self.db_path = db_path
+        self.store = store
+        self.batch_size = batch_size
+        self._local = threading.local()
+        conn = self.connect()
+        conn.executescript(CONTACT_SCHEMA)
+        self.has_fts = self._init_fts(conn)
+
+    # Creates the FTS5 table (backfilling rows indexed before it existed). Returns False
+    # when this SQLite build has no FTS5, in which case search falls back to LIKE.
+    def _init_fts(self, conn):
+        import sqlite3
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'contacts_fts'").fetchone()
+        try:
+            conn.executescript(CONTACT_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning('contact_index.fts_unavailable error=%r (search falls back to a scan)', e)
+            return False
+        if not exists:
+            conn.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+        return True
+
+    # One connection per thread (and per process, since the pid is part of the check)
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            import sqlite3
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _offset(self, conn):
+        row = conn.execute("SELECT value FROM index_state WHERE key = 'jsonl_offset'").fetchone()
+        return int(row['value']) if row else 0
+
+    # Imports new JSONL lines; returns how many records were added
+    def sync(self):
+        path = self.store.path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        conn = self.connect()
+        if self._offset(conn) == size:
+            return 0
+
+        added = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            offset = self._offset(conn)
+            if size < offset:
+                # The JSONL file was replaced or truncated: rebuild from scratch
+                conn.execute('DELETE FROM contacts')
+                offset = 0
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                batch = []
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        # Partial line still being written; pick it up next time
+                        break
+                    offset += len(raw)
+                    record = parse_line(raw)
+                    if record is not None:
+                        batch.append(tuple(record.get(column, '') for column in CONTACT_COLUMNS))
+                    if len(batch) >= self.batch_size:
+                        added += self._insert(conn, batch, offset)
+                        batch = []
+                added += self._insert(conn, batch, offset)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def _insert(self, conn, rows, offset):
+        before = conn.total_changes
+        if rows:
+            conn.executemany(
+                'INSERT OR IGNORE INTO contacts (id, timestamp, name, email, subject, message) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        added = conn.total_changes - before
+        conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('jsonl_offset', ?)", (str(offset),))
+        return added
+
+    # WHERE clause for the admin filters: since/until (ISO timestamps), email (exact,
+    # case-insensitive) and subject (case-insensitive substring)
+    @staticmethod
+    def _filters(since=None, until=None, email=None, subject=None):
+        clauses, params = [], []
+        if since:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            clauses.append('timestamp <= ?')
+            params.append(until)
+        if email:
+            clauses.append('email = ? COLLATE NOCASE')
+            params.append(email)
+        if subject:
+            escaped = subject.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("subject LIKE ? ESCAPE '\\'")
+            params.append(f'%{escaped}%')
+        return clauses, params
+
+    # One page of submissions ordered by id. `cursor` is the last id of the previous page.
+    # Returns (rows, next_cursor); next_cursor is the int id to pass back, None on the last page.
+    def page(self, limit=50, cursor=None, order='desc', **filters):
+        clauses, params = self._filters(**filters)
+        if cursor is not None:
+            clauses.append('id < ?' if order == 'desc' else 'id > ?')
+            params.append(int(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        rows = self.connect().execute(
+            f'SELECT {", ".join(CONTACT_COLUMNS)} FROM contacts {where} ORDER BY id {direction} LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = [dict(row) for row in rows[:limit]]
+        return rows, (rows[-1]['id'] if has_more else None)
+
+    def count(self, **filters):
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.connect().execute(f'SELECT COUNT(*) FROM contacts {where}', params).fetchone()[0]
+
+    # Streams every matching row in id order, fetching `chunk` rows at a time
+    def iter_rows(self, order='asc', chunk=1000, **filters):
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        cursor = self.connect().execute(
+            f'SELECT {", ".join(CONTACT_COLUMNS)} FROM contacts {where} ORDER BY id {direction}', params
+        )
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+
+    # Ranked full-text search over subject and message (subject matches weigh double).
+    # Returns (results, next_offset); each result carries an HTML-safe highlighted
+    # subject and a message snippet around the matches.
+    def search(self, text, limit=20, offset=0, **filters):
+        query = fts_query(text)
+        if query is None:
+            return [], None
+        clauses, params = self._filters(**filters)
+        if self.has_fts:
+            extra = ''.join(f' AND c.{clause}' for clause in clauses)
+            rows = self.connect().execute(
+                f"""SELECT c.id, c.timestamp, c.name, c.email, c.subject,
+                           highlight(contacts_fts, 0, ?, ?) AS subject_highlight,
+                           snippet(contacts_fts, 1, ?, ?, '...', 24) AS snippet,
+                           bm25(contacts_fts, 2.0, 1.0) AS rank
+                    FROM contacts_fts JOIN contacts c ON c.id = contacts_fts.rowid
+                    WHERE contacts_fts MATCH ?{extra}
+                    ORDER BY rank LIMIT ? OFFSET ?""",
+                [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, query] + params + [limit + 1, offset]
+            ).fetchall()
+        else:
+            for token in SEARCH_TOKEN_RE.findall(text):
+                clauses.append('(subject LIKE ? OR message LIKE ?)')
+                params += [f'%{token}%', f'%{token}%']
+            rows = self.connect().execute(
+                f"""SELECT id, timestamp, name, email, subject, subject AS subject_highlight,
+                           substr(message, 1, 160) AS snippet, 0 AS rank
+                    FROM contacts WHERE {' AND '.join(clauses)}
+                    ORDER BY id DESC LIMIT ? OFFSET ?""",
+                params + [limit + 1, offset]
+            ).fetchall()
+
+        has_more = len(rows) > limit
+        results = []
+        for row in rows[:limit]:
+            result = dict(row)
+            result['subject_highlight'] = render_highlight(result['subject_highlight'])
+            result['snippet'] = render_highlight(result['snippet'])
+            result['score'] = round(-result.pop('rank'), 4)
+            results.append(result)
+        return results, (offset + limit if has_more else None)
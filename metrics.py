@@ -0,0 +1,252 @@
+import os
+import time
+import random
+import bisect
+import logging
+import cProfile
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('portfolio.metrics')
+
+# Seconds; covers sub-millisecond page hits up to the 30 s code execution timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+# A gauge read at scrape time from function(), which returns a number or a dict of
+# {label values tuple: number}
+class GaugeFunction:
+    type = 'gauge'
+
+    def __init__(self, name, help, function, labelnames=()):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.warning('metrics.gauge_failed name=%s error=%r', self.name, e)
+            return
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, number in sorted(values):
+            yield self.name, format_labels(self.labelnames, labels), number
+
+
+# Cumulative histogram in the Prometheus layout (<name>_bucket{le=...}, _sum, _count)
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                yield (f'{self.name}_bucket', format_labels(self.labelnames, labels, f'le="{format_value(bound)}"'),
+                       cumulative)
+            yield f'{self.name}_sum', format_labels(self.labelnames, labels), total
+            yield f'{self.name}_count', format_labels(self.labelnames, labels), count
+
+
+# Metrics of this process, rendered in the Prometheus text format (version 0.0.4). Each
+# worker process keeps its own, so with several workers every scrape sees one of them.
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def gauge_function(self, name, help, function, labelnames=()):
+        return self.register(GaugeFunction(name, help, function, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Time spent in the named parts of request handling (NLP preprocessing, model inference,
+# compiling and running code, contact store I/O), wherever they run
+STAGE_SECONDS = registry.histogram(
+    'portfolio_stage_duration_seconds', 'Time spent in one stage of handling a request', ('stage',)
+)
+
+def stage_timer(stage):
+    return STAGE_SECONDS.time(stage)
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+# Profiles a random sample_rate fraction of requests with cProfile and writes the
+# profile of each one that takes at least slow_ms to <directory>/<time>-<route>-<ms>.prof
+# (open with pstats or snakeviz). One request is profiled at a time; only the newest
+# `keep` files are kept.
+class SlowRequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, slow_ms=500, keep=100):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self._active = threading.Lock()
+        self.profiled = 0
+        self.dumped = 0
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    # A running profiler for this request, or None when it is not sampled
+    def start(self):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage) already holds the hook
+            self._active.release()
+            return None
+        self.profiled += 1
+        return profiler
+
+    def finish(self, profiler, route, elapsed):
+        try:
+            profiler.disable()
+        finally:
+            self._active.release()
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms < self.slow_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+        path = os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{slug}-{int(elapsed_ms)}ms.prof')
+        profiler.dump_stats(path)
+        self.dumped += 1
+        logger.info('metrics.profile_dumped route=%s elapsed_ms=%.1f path=%s', route, elapsed_ms, path)
+        self.prune()
+        return path
+
+    def prune(self):
+        try:
+            files = sorted(entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.prof'))
+        except OSError:
+            return
+        for path in files[:-self.keep] if self.keep else []:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'directory': self.directory,
+            'profiled': self.profiled,
+            'dumped': self.dumped
+        }
@@ -0,0 +1,129 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+from metrics import registry
+
+logger = logging.getLogger('portfolio.batching')
+
+BATCH_SIZE = registry.histogram(
+    'portfolio_microbatch_size', 'Requests run together in one batch', ('batcher',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+BATCH_WAIT_SECONDS = registry.histogram(
+    'portfolio_microbatch_wait_seconds', 'Time a request waited for its batch to start', ('batcher',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+BATCHERS = []
+registry.gauge_function('portfolio_microbatch_queue_depth', 'Requests waiting for a batch',
+                        lambda: {(batcher.name,): batcher.depth() for batcher in BATCHERS}, ('batcher',))
+
+
+class _Waiter:
+    __slots__ = ('item', 'arrived', 'done', 'result', 'error')
+
+    def __init__(self, item):
+        self.item = item
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Collects concurrent submit() calls into one process(items) call, which returns the
+# results in the same order. A batch starts `window` seconds after its first item
+# arrived or as soon as it holds `max_batch` items; items that queued up while the
+# previous batch ran go out right away. The window only applies while requests are
+# arriving together (the last batch had more than one item), so a lone client does not
+# wait for company that is not coming. One background thread per process runs the
+# batches (started on first use, and again after a fork). If process() raises, every
+# caller in the batch gets the exception.
+class MicroBatcher:
+    def __init__(self, name, process, max_batch=64, window=0.002):
+        self.name = name
+        self.process = process
+        self.max_batch = max_batch
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._last_size = 0
+        BATCHERS.append(self)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # Waiters copied over by fork belong to threads that do not exist here
+            self._pending = deque()
+            threading.Thread(target=self._run, name=f'microbatch-{self.name}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, item):
+        self._ensure_started()
+        waiter = _Waiter(item)
+        with self._cond:
+            self._pending.append(waiter)
+            # The batcher only needs waking for a new batch or a full one
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        waiter.done.wait()
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0].arrived + self.window
+            while len(self._pending) < self.max_batch and (self._last_size > 1 or len(self._pending) > 1):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._last_size = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start = time.perf_counter()
+            for waiter in batch:
+                BATCH_WAIT_SECONDS.observe(start - waiter.arrived, self.name)
+            BATCH_SIZE.observe(len(batch), self.name)
+            try:
+                results = self.process([waiter.item for waiter in batch])
+                for waiter, result in zip(batch, results):
+                    waiter.result = result
+            except Exception as e:
+                logger.warning('batch.failed batcher=%s size=%d error=%r', self.name, len(batch), e)
+                for waiter in batch:
+                    waiter.error = e
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for waiter in batch:
+                waiter.done.set()
+
+    def depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'queued': self.depth(),
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch': round(self.items / self.batches, 2) if self.batches else None,
+            'largest_batch': self.largest_batch
+        }
@@ -0,0 +1,499 @@
+import gc
+import os
+import re
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+from result_cache import ResultCache
+from metrics import observe_stage, stage_timer
+from micro_batching import MicroBatcher
+
+logger = logging.getLogger('portfolio.mood')
+
+SENTIMENT_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_model.pkl')
+
+# Class ids used when sentiment_model.pkl was trained
+SENTIMENT_LABELS = {0: 'Negative', 1: 'Positive', 2: 'Neutral'}
+
+# Scoring modes accepted by /api/mood-analysis
+ANALYSIS_MODES = ('model', 'lexicon')
+
+# Optional word list loaded instead of the built-in lexicon (see Lexicon.from_file)
+LEXICON_FILE = os.environ.get('MOOD_LEXICON_FILE')
+
+# Bump when the scoring code changes so cached results from older code are not reused
+ANALYZER_VERSION = '4'
+
+# Analysis result cache, keyed by normalized text + analyzer version
+MOOD_CACHE_MAX_BYTES = int(os.environ.get('MOOD_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+MOOD_CACHE_TTL = int(os.environ.get('MOOD_CACHE_TTL', 3600))
+
+# How often (seconds) the model and lexicon files are checked for changes
+SOURCE_CHECK_INTERVAL = float(os.environ.get('MOOD_SOURCE_CHECK_INTERVAL', 5))
+
+# Single texts from concurrent requests are scored together: a predict_proba call costs
+# about the same for 1 text as for 64. A batch waits up to MOOD_MICROBATCH_WINDOW_MS for
+# company (0 still batches whatever queued up during the previous call);
+# MOOD_MICROBATCH=off scores every request on its own.
+MOOD_MICROBATCH = os.environ.get('MOOD_MICROBATCH', 'on') != 'off'
+MOOD_MICROBATCH_WINDOW_MS = float(os.environ.get('MOOD_MICROBATCH_WINDOW_MS', 2))
+MOOD_MICROBATCH_MAX = int(os.environ.get('MOOD_MICROBATCH_MAX', 64))
+
+POLARITIES = ('positive', 'negative', 'neutral')
+
+# A negation flips the polarity of the next lexicon hit within NEGATION_WINDOW tokens
+# ("not good", "never really happy"). Punctuation is stripped first, so "don't" is "dont".
+NEGATIONS = frozenset((
+    'not', 'no', 'never', 'nor', 'neither', 'none', 'nothing', 'cannot', 'cant', 'dont',
+    'doesnt', 'didnt', 'isnt', 'wasnt', 'arent', 'werent', 'wont', 'wouldnt', 'couldnt',
+    'shouldnt', 'havent', 'hasnt', 'hadnt', 'aint'
+))
+NEGATION_WINDOW = 3
+FLIPPED_POLARITY = {'positive': 'negative', 'negative': 'positive', 'neutral': 'neutral'}
+
+# Enhanced positive and negative word lists (expanded from sentiment_analysis.py)
+POSITIVE_WORDS = (
+    'love', 'great', 'good', 'excellent', 'amazing', 'wonderful', 'fantastic', 'awesome',
+    'perfect', 'beautiful', 'happy', 'joy', 'pleased', 'satisfied', 'delighted', 'thrilled',
+    'outstanding', 'brilliant', 'superb', 'marvelous', 'incredible', 'fabulous', 'terrific',
+    'best', 'favorite', 'enjoy', 'like', 'adore', 'cherish', 'appreciate', 'grateful',
+    'blessed', 'lucky', 'fortunate', 'successful', 'achieved', 'accomplished', 'proud',
+    'excited', 'enthusiastic', 'optimistic', 'hopeful', 'inspired', 'motivated', 'energetic',
+    'peaceful', 'calm', 'relaxed', 'content', 'fulfilled', 'gratified', 'elated', 'ecstatic'
+)
+
+NEGATIVE_WORDS = (
+    'hate', 'terrible', 'awful', 'horrible', 'disgusting', 'worst', 'bad', 'sad',
+    'angry', 'upset', 'disappointed', 'frustrated', 'annoyed', 'irritated', 'mad',
+    'dislike', 'loathe', 'despise', 'abhor', 'detest', 'miserable', 'depressed',
+    'suffering', 'pain', 'hurt', 'broken', 'damaged', 'ruined', 'destroyed',
+    'failure', 'failed', 'lose', 'lost', 'defeat', 'defeated', 'hopeless', 'useless',
+    'worried', 'anxious', 'stressed', 'tired', 'exhausted', 'bored', 'lonely', 'afraid',
+    'scared', 'fearful', 'nervous', 'tense', 'confused', 'conflicted', 'torn', 'divided'
+)
+
+NEUTRAL_WORDS = (
+    'okay', 'fine', 'alright', 'maybe', 'perhaps', 'possibly', 'might', 'could',
+    'average', 'normal', 'regular', 'standard', 'usual', 'typical', 'ordinary',
+    'neutral', 'indifferent', 'unconcerned', 'uninterested', 'bored', 'tired',
+    'moderate', 'balanced', 'stable', 'steady', 'consistent', 'predictable', 'routine'
+)
+
+# Make sure the NLTK corpora we depend on are available (downloads at most once per process)
+def ensure_nltk_data():
+    import nltk
+
+    for resource, package in (('corpora/stopwords', 'stopwords'), ('corpora/wordnet', 'wordnet')):
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(package)
+
+
+# Word -> ((polarity, weight), ...) index used to score text in a single pass over its tokens.
+# A word may carry more than one polarity (e.g. "bored" is both negative and neutral).
+class Lexicon:
+    def __init__(self, entries):
+        index = {}
+        for word, polarity, weight in entries:
+            if polarity not in POLARITIES:
+                raise ValueError(f"Unknown polarity '{polarity}' for '{word}'")
+            index.setdefault(word, []).append((polarity, float(weight)))
+        self.index = {word: tuple(values) for word, values in index.items()}
+        self.fingerprint = hashlib.sha256(repr(sorted(self.index.items())).encode('utf-8')).hexdigest()
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def default(cls):
+        entries = [(w, 'positive', 1.0) for w in POSITIVE_WORDS]
+        entries += [(w, 'negative', 1.0) for w in NEGATIVE_WORDS]
+        entries += [(w, 'neutral', 1.0) for w in NEUTRAL_WORDS]
+        return cls(entries)
+
+    # One entry per line: "word polarity [weight]", separated by tabs, commas or spaces.
+    # Blank lines and lines starting with # are ignored; weight defaults to 1.
+    @classmethod
+    def from_file(cls, path):
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = re.split(r'[\t,\s]+', line)
+                if len(parts) not in (2, 3):
+                    raise ValueError(f"{path}:{line_no}: expected 'word polarity [weight]'")
+                word, polarity = parts[0].lower(), parts[1].lower()
+                weight = float(parts[2]) if len(parts) == 3 else 1.0
+                entries.append((word, polarity, weight))
+        return cls(entries)
+
+    # Single pass over raw tokens: drops stopwords, lemmatizes, and tallies lexicon hits
+    # (occurrences, not distinct words) with negation applied. Negations are cleaned like
+    # any other word; they only flip the hits that follow. Returns the cleaned words
+    # plus per-polarity hit counts and weighted scores.
+    def score(self, tokens, stop_words=frozenset(), lemmatize=None):
+        index = self.index
+        counts = dict.fromkeys(POLARITIES, 0)
+        weights = dict.fromkeys(POLARITIES, 0.0)
+        words = []
+        negated = 0
+        for token in tokens:
+            if token in NEGATIONS:
+                negated = NEGATION_WINDOW
+                # Still part of the cleaned text the model sees; only the stopword
+                # filter decides whether it stays
+                if token not in stop_words:
+                    words.append(lemmatize(token) if lemmatize else token)
+                continue
+            if token in stop_words:
+                if negated:
+                    negated -= 1
+                continue
+            word = lemmatize(token) if lemmatize else token
+            words.append(word)
+            entries = index.get(word)
+            if entries:
+                for polarity, weight in entries:
+                    if negated:
+                        polarity = FLIPPED_POLARITY[polarity]
+                    counts[polarity] += 1
+                    weights[polarity] += weight
+                negated = 0
+            elif negated:
+                negated -= 1
+        return words, counts, weights
+
+
+# TF-IDF vectorizer + Random Forest shipped in sentiment_model.pkl
+class SentimentModel:
+    def __init__(self, path=SENTIMENT_MODEL_FILE):
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.checksum = hashlib.sha256(data).hexdigest()
+        bundle = pickle.loads(data)
+        self.vectorizer = bundle['vectorizer']
+        self.model = bundle['model']
+        self.labels = [SENTIMENT_LABELS[int(c)] for c in self.model.classes_]
+        self.load_ms = (time.perf_counter() - start) * 1000
+        self.path = path
+
+    # One transform + predict_proba for any number of cleaned texts
+    def predict_proba(self, cleaned_texts):
+        return self.model.predict_proba(self.vectorizer.transform(cleaned_texts))
+
+
+# Holds everything the mood analysis needs so it is built once instead of per request
+class MoodAnalyzer:
+    PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+    def __init__(self, model=None, lexicon=None, cache=None, lemma_cache_size=50000, batcher=None):
+        ensure_nltk_data()
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+
+        self.model = model
+        self.lexicon = lexicon or Lexicon.default()
+        self.cache = cache
+        # Scores single texts together with other requests' (see predict_rows)
+        self.batcher = batcher
+        # Changes whenever the code, the model file or the lexicon changes
+        self.version = hashlib.sha256('|'.join((
+            ANALYZER_VERSION,
+            model.checksum if model is not None else 'no-model',
+            self.lexicon.fingerprint
+        )).encode('utf-8')).hexdigest()[:16]
+        self.stop_words = frozenset(stopwords.words('english'))
+
+        # WordNet lookups are the expensive part of cleaning; the vocabulary repeats a lot
+        self.lemmatize = lru_cache(maxsize=lemma_cache_size)(WordNetLemmatizer().lemmatize)
+        # Force WordNet to load now rather than on the first request
+        self.lemmatize('warmup')
+
+    def tokenize(self, text):
+        return self.PUNCTUATION_RE.sub('', text.lower()).split()
+
+    # Text preprocessing (same as in sentiment_analysis.py) with lexicon scoring in the same pass
+    def clean_and_score(self, text):
+        return self.lexicon.score(self.tokenize(text), self.stop_words, self.lemmatize)
+
+    def clean_words(self, text):
+        return self.clean_and_score(text)[0]
+
+    # Texts that normalize to the same tokens share a cache entry
+    def cache_key(self, tokens, mode):
+        normalized = ' '.join(tokens)
+        return hashlib.sha1(f"{self.version}\0{mode}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def clean_text(self, text):
+        return ' '.join(self.clean_words(text))
+
+    # Returns the mood analysis payload served by /api/mood-analysis
+    def analyze(self, text, mode='model'):
+        return self.analyze_batch([text], mode=mode)[0]
+
+    # Cleans every text, then scores the whole batch with one predict_proba call
+    def analyze_batch(self, texts, mode='model'):
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        # Fall back to the lexicon heuristic when the model could not be loaded
+        if self.model is None:
+            mode = 'lexicon'
+
+        results = [None] * len(texts)
+        tokens_list = [self.tokenize(text) for text in texts]
+        keys = [None] * len(texts)
+        pending = []
+        for i, tokens in enumerate(tokens_list):
+            if self.cache is not None:
+                keys[i] = self.cache_key(tokens, mode)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    results[i] = self.from_cache(cached, texts[i])
+                    continue
+            pending.append(i)
+
+        # Only cache misses reach NLTK and the model
+        with stage_timer('mood_preprocess'):
+            cleaned = {i: self.lexicon.score(tokens_list[i], self.stop_words, self.lemmatize) for i in pending}
+        rows = {}
+        inference_ms = 0.0
+        if mode == 'model':
+            scored = [i for i in pending if cleaned[i][0]]
+            if len(scored) == 1 and self.batcher is not None:
+                rows[scored[0]], inference_ms = self.batcher.submit((self.model, ' '.join(cleaned[scored[0]][0])))
+            elif scored:
+                start = time.perf_counter()
+                matrix = self.model.predict_proba([' '.join(cleaned[i][0]) for i in scored])
+                observe_stage('mood_inference', time.perf_counter() - start)
+                # Amortized per text so single and batch requests report comparable numbers
+                inference_ms = (time.perf_counter() - start) * 1000 / len(scored)
+                rows = dict(zip(scored, matrix))
+
+        for i in pending:
+            row = rows.get(i)
+            result = self.build_result(texts[i], cleaned[i], mode, row, inference_ms if row is not None else 0.0)
+            if self.cache is not None:
+                self.cache.set(keys[i], result, len(json.dumps(result)))
+            results[i] = result
+        return results
+
+    # Cached results are shared, so hand out a copy with the per-request fields filled in
+    def from_cache(self, cached, text):
+        result = dict(cached)
+        result['ml_metrics'] = dict(cached['ml_metrics'], text_length=len(text), cached=True)
+        return result
+
+    def build_result(self, text, tally, mode, row, inference_ms):
+        words, counts, weights = tally
+        total_words = len(words)
+
+        # Initialize variables
+        positive_count = 0
+        negative_count = 0
+        neutral_count = 0
+        positive_score = 0
+        negative_score = 0
+        neutral_score = 0
+        emotional_intensity = 0
+        probabilities = None
+
+        if total_words > 0:
+            positive_count = counts['positive']
+            negative_count = counts['negative']
+            neutral_count = counts['neutral']
+
+            # Calculate scores (weighted lexicon hits per 100 words)
+            positive_score = (weights['positive'] / total_words) * 100
+            negative_score = (weights['negative'] / total_words) * 100
+            neutral_score = (weights['neutral'] / total_words) * 100
+
+            # Add bonus for emotional intensity (more emotional words = higher confidence)
+            emotional_intensity = (weights['positive'] + weights['negative']) / total_words
+
+        if total_words == 0:
+            mood = 'Neutral'
+            confidence = 50
+        elif mode == 'model':
+            probabilities = {label.lower(): round(float(p) * 100, 1) for label, p in zip(self.model.labels, row)}
+            best = int(row.argmax())
+            mood = self.model.labels[best]
+            confidence = float(row[best]) * 100
+        else:
+            # Determine sentiment with confidence
+            if positive_score > negative_score and positive_score > neutral_score:
+                mood = 'Positive'
+                base_confidence = 60 + (positive_score * 0.8)
+            elif negative_score > positive_score and negative_score > neutral_score:
+                mood = 'Negative'
+                base_confidence = 60 + (negative_score * 0.8)
+            else:
+                mood = 'Neutral'
+                base_confidence = 60 + (neutral_score * 0.8)
+            confidence = min(95, base_confidence + (emotional_intensity * 20))
+
+        # Generate detailed analysis with ML insights
+        analysis_details = []
+        if positive_count > 0:
+            analysis_details.append(f"Found {positive_count} positive indicators")
+        if negative_count > 0:
+            analysis_details.append(f"Found {negative_count} negative indicators")
+        if neutral_count > 0:
+            analysis_details.append(f"Found {neutral_count} neutral indicators")
+
+        # Add ML-specific insights
+        if total_words > 0:
+            if emotional_intensity > 0.3:
+                analysis_details.append("High emotional content detected")
+            elif emotional_intensity > 0.1:
+                analysis_details.append("Moderate emotional content")
+            else:
+                analysis_details.append("Low emotional content")
+
+        if mode == 'model':
+            method_text = 'Random Forest classification'
+            processing_method = 'TF-IDF + Random Forest Classification'
+        else:
+            method_text = 'lexicon-based scoring'
+            processing_method = 'Lexicon Scoring'
+
+        analysis_text = f"Analyzed {total_words} words using advanced NLP preprocessing. {' '.join(analysis_details)}. Detected {mood.lower()} sentiment with {confidence:.1f}% confidence using {method_text}."
+
+        # Additional ML metrics
+        ml_metrics = {
+            'text_length': len(text),
+            'cleaned_length': total_words,
+            'positive_density': positive_score,
+            'negative_density': negative_score,
+            'neutral_density': neutral_score,
+            'emotional_intensity': round(emotional_intensity, 3) if total_words > 0 else 0.0,
+            'processing_method': processing_method,
+            'mode': mode,
+            'cached': False
+        }
+        if mode == 'model':
+            ml_metrics['probabilities'] = probabilities
+            ml_metrics['inference_ms'] = round(inference_ms, 3)
+            ml_metrics['model_load_ms'] = round(self.model.load_ms, 1)
+
+        return {
+            'mood': mood,
+            'confidence': round(confidence, 1),
+            'analysis': analysis_text,
+            'details': {
+                'total_words': total_words,
+                'positive_count': positive_count,
+                'negative_count': negative_count,
+                'neutral_count': neutral_count,
+                'positive_score': round(positive_score, 1),
+                'negative_score': round(negative_score, 1),
+                'neutral_score': round(neutral_score, 1)
+            },
+            'ml_metrics': ml_metrics
+        }
+
+
+# Yields lists of at most `size` items from any iterable without materializing it
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_sentiment_model = None
+_sentiment_model_error = None
+_sentiment_model_lock = threading.Lock()
+
+# Loads sentiment_model.pkl once per process. Calling this before workers fork
+# (e.g. gunicorn --preload) lets every worker share the same pages copy-on-write.
+def load_sentiment_model(reload=False):
+    global _sentiment_model, _sentiment_model_error
+    if reload or (_sentiment_model is None and _sentiment_model_error is None):
+        with _sentiment_model_lock:
+            if reload or (_sentiment_model is None and _sentiment_model_error is None):
+                _sentiment_model_error = None
+                try:
+                    _sentiment_model = SentimentModel()
+                    # Keep the startup model out of the cyclic GC so collections in
+                    # the workers do not touch (and un-share) its pages
+                    if not reload:
+                        gc.freeze()
+                    logger.info('mood.model_loaded load_ms=%.1f', _sentiment_model.load_ms)
+                except Exception as e:
+                    _sentiment_model_error = e
+                    logger.warning('mood.model_unavailable error=%r (using lexicon scoring)', e)
+    return _sentiment_model
+
+
+mood_cache = ResultCache(MOOD_CACHE_MAX_BYTES, MOOD_CACHE_TTL)
+
+# Batch function for mood_batcher: items are (model, cleaned text), results are
+# (probability row, inference ms amortized over the batch). Items of a model replaced
+# by a reload while they waited are scored with that model.
+def predict_rows(items):
+    groups = {}
+    for index, (model, text) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(index)
+    results = [None] * len(items)
+    for model, indexes in groups.values():
+        start = time.perf_counter()
+        matrix = model.predict_proba([items[i][1] for i in indexes])
+        elapsed = time.perf_counter() - start
+        observe_stage('mood_inference', elapsed)
+        for i, row in zip(indexes, matrix):
+            results[i] = (row, elapsed * 1000 / len(indexes))
+    return results
+
+mood_batcher = (MicroBatcher('mood', predict_rows, MOOD_MICROBATCH_MAX, MOOD_MICROBATCH_WINDOW_MS / 1000)
+                if MOOD_MICROBATCH else None)
+
+_analyzer = None
+_analyzer_sources = None
+_next_source_check = 0.0
+_analyzer_lock = threading.Lock()
+
+# (path, mtime, size) of the files the analyzer is built from
+def analyzer_sources():
+    signature = []
+    for path in (SENTIMENT_MODEL_FILE, LEXICON_FILE):
+        if not path:
+            continue
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+# Shared analyzer, built lazily on first use. It is rebuilt when the model or
+# lexicon file changes on disk; a new version clears the result cache.
+def get_mood_analyzer():
+    global _analyzer, _analyzer_sources, _next_source_check
+    now = time.monotonic()
+    if _analyzer is None or now >= _next_source_check:
+        with _analyzer_lock:
+            if _analyzer is None or now >= _next_source_check:
+                sources = analyzer_sources()
+                if _analyzer is None or sources != _analyzer_sources:
+                    model = load_sentiment_model(reload=_analyzer is not None)
+                    lexicon = Lexicon.from_file(LEXICON_FILE) if LEXICON_FILE else None
+                    analyzer = MoodAnalyzer(model=model, lexicon=lexicon, cache=mood_cache, batcher=mood_batcher)
+                    if _analyzer is not None and analyzer.version != _analyzer.version:
+                        mood_cache.clear()
+                    _analyzer = analyzer
+                    _analyzer_sources = sources
+                _next_source_check = now + SOURCE_CHECK_INTERVAL
+    return _analyzer
@@ -0,0 +1,98 @@
+import os
+import gzip
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from werkzeug.http import http_date
+
+
+# One rendered page: the HTML, its gzip encoding (compressed once, when rendered) and the
+# validators for both. Each encoding has its own strong ETag, as RFC 9110 requires.
+class RenderedPage:
+    def __init__(self, body, template, key, last_modified, render_ms):
+        self.body = body
+        self.gzip_body = gzip.compress(body, 9, mtime=0)
+        self.template = template
+        self.key = key
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = digest
+        self.gzip_etag = digest + '-gzip'
+        self.last_modified = last_modified
+        self.last_modified_header = http_date(last_modified)
+        self.render_ms = render_ms
+
+    # (body, headers, not_modified) for a request; the arguments are the request's
+    # werkzeug accept_encodings, if_none_match and if_modified_since
+    def respond(self, accept_encodings, if_none_match, if_modified_since):
+        compressed = accept_encodings['gzip'] > 0
+        etag = self.gzip_etag if compressed else self.etag
+        headers = {
+            'ETag': f'"{etag}"',
+            'Last-Modified': self.last_modified_header,
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding'
+        }
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        # If-Modified-Since only counts when there is no If-None-Match
+        if if_none_match:
+            not_modified = if_none_match.contains_weak(etag)
+        else:
+            not_modified = if_modified_since is not None and if_modified_since >= self.last_modified
+        return (self.gzip_body if compressed else self.body), headers, not_modified
+
+
+# Rendered HTML of pages that come out the same for every request, kept per template
+# name. An entry is reused while Jinja hands back the same Template object (with
+# TEMPLATES_AUTO_RELOAD, as in debug mode, it loads a new one when the file changes)
+# and while `key` (anything else the output depends on, like the asset build) is the
+# same. Only the template's own file is tracked, not templates it extends or includes.
+class PageCache:
+    def __init__(self, jinja_env):
+        self.jinja_env = jinja_env
+        self._lock = threading.Lock()
+        self._pages = {}
+        self.hits = 0
+        self.renders = 0
+        self.render_ms = 0.0
+
+    # The cached page for template_name, calling render() to produce its HTML when
+    # there is none or it is stale. Last-Modified is the template file's mtime, or
+    # `modified` (a timestamp for whatever `key` stands for) if that is later.
+    def get(self, template_name, render, key=None, modified=None):
+        template = self.jinja_env.get_template(template_name)
+        with self._lock:
+            page = self._pages.get(template_name)
+            if page is not None and page.template is template and page.key == key:
+                self.hits += 1
+                return page
+        start = time.perf_counter()
+        body = render().encode('utf-8')
+        render_ms = (time.perf_counter() - start) * 1000
+        mtime = os.path.getmtime(template.filename) if template.filename else time.time()
+        mtime = max(mtime, modified or 0)
+        # Whole seconds, as in the header, so If-Modified-Since compares equal
+        last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+        page = RenderedPage(body, template, key, last_modified, render_ms)
+        with self._lock:
+            self._pages[template_name] = page
+            self.renders += 1
+            self.render_ms += render_ms
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pages': {name: {'bytes': len(page.body), 'gzip_bytes': len(page.gzip_body), 'etag': page.etag,
+                                 'render_ms': round(page.render_ms, 2)}
+                          for name, page in sorted(self._pages.items())},
+                'hits': self.hits,
+                'renders': self.renders,
+                'render_ms': round(self.render_ms, 1)
+            }
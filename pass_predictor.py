@@ -0,0 +1,382 @@
+import io
+import os
+import csv
+import json
+import math
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from importlib.metadata import version as package_version
+
+from micro_batching import MicroBatcher
+
+# numpy, pandas and scikit-learn are imported inside the functions that use them so
+# importing this module (and app.py) stays cheap; see MODEL_PRELOAD in app.py.
+
+logger = logging.getLogger('portfolio.pass_model')
+
+# Bump when train_pass_predictor_model changes so saved artifacts are retrained
+PASS_MODEL_VERSION = '1'
+
+# Where the trained model artifact and its manifest are published
+PASS_MODEL_DIR = os.environ.get('PASS_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+PASS_MODEL_NAME = 'pass_predictor'
+
+# How often (seconds) each worker checks for a newly published artifact
+PASS_MODEL_CHECK_INTERVAL = float(os.environ.get('PASS_MODEL_CHECK_INTERVAL', 10))
+
+# Micro-batching of single predictions from concurrent requests (see predict_pass). Off
+# by default: a prediction is a few microseconds of arithmetic, less than handing the
+# request to the batching thread costs (benchmarks/bench_microbatch.py).
+PASS_MICROBATCH = os.environ.get('PASS_MICROBATCH', 'off') == 'on'
+PASS_MICROBATCH_WINDOW_MS = float(os.environ.get('PASS_MICROBATCH_WINDOW_MS', 2))
+PASS_MICROBATCH_MAX = int(os.environ.get('PASS_MICROBATCH_MAX', 256))
+
+# Feature order the pass predictor is trained and scored with
+PASS_FEATURES = (
+    'study_hours', 'sleep_hours', 'attendance', 'class_avg_score',
+    'student_test_score', 'student_assignment_score',
+    'num_failed_before', 'participation_score'
+)
+
+# --- GLOBAL MODEL TRAINING (runs once at startup) ---
+def train_pass_predictor_model():
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import accuracy_score
+
+    np.random.seed(42)
+    n = 200
+    df = pd.DataFrame({
+        'study_hours': np.random.randint(1, 11, n),
+        'sleep_hours': np.random.randint(4, 10, n),
+        'attendance': np.random.randint(40, 100, n),
+        'class_avg_score': np.random.randint(40, 100, n),
+        'student_test_score': np.random.randint(30, 100, n),
+        'student_assignment_score': np.random.randint(30, 100, n),
+        'num_failed_before': np.random.randint(0, 4, n),
+        'participation_score': np.random.randint(0, 11, n)
+    })
+
+    score = (
+        df['study_hours'] * 4 +
+        df['sleep_hours'] * 1.5 +
+        df['attendance'] * 0.5 +
+        df['class_avg_score'] * 0.3 +
+        df['student_test_score'] * 1.2 +
+        df['student_assignment_score'] * 1.0 +
+        df['participation_score'] * 2 -
+        df['num_failed_before'] * 8 +
+        np.random.randn(n) * 10
+    )
+    df['passed'] = (score > 180).astype(int)
+
+    X = df.drop(columns='passed')
+    y = df['passed']
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = LogisticRegression(solver='liblinear')
+    model.fit(X_scaled, y)
+
+    # Accuracy for info
+    acc = accuracy_score(y, model.predict(X_scaled))
+    return model, scaler, acc
+
+
+# Scores students without pandas or sklearn input validation. The scaler is folded
+# into the logistic regression weights once, so scoring is a single dot product:
+#   z = ((x - mean) / scale) . coef + intercept = x . (coef / scale) + (intercept - (mean / scale) . coef)
+class LinearPassModel:
+    def __init__(self, model, scaler):
+        import numpy as np
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.weights = coef / scale
+        self.bias = float(np.asarray(model.intercept_, dtype=np.float64)[0] - np.dot(mean / scale, coef))
+
+    # Probability of passing for each row of an (n, 8) matrix in PASS_FEATURES order
+    def prob_pass(self, X):
+        import numpy as np
+        return 1.0 / (1.0 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.weights + self.bias)))
+
+    # (prediction, prob_fail, prob_pass) for a single student
+    def predict_one(self, values):
+        import numpy as np
+        z = float(np.dot(self.weights, np.asarray(values, dtype=np.float64))) + self.bias
+        prob_pass = 1.0 / (1.0 + np.exp(-z))
+        return int(prob_pass > 0.5), 1.0 - prob_pass, prob_pass
+
+
+# Batch function for pass_batcher: items are (LinearPassModel, feature values), results
+# are predict_one's (prediction, prob_fail, prob_pass)
+def score_rows(items):
+    groups = {}
+    for index, (linear, values) in enumerate(items):
+        groups.setdefault(id(linear), (linear, []))[1].append(index)
+    results = [None] * len(items)
+    for linear, indexes in groups.values():
+        for i, prob_pass in zip(indexes, linear.prob_pass([items[i][1] for i in indexes])):
+            prob_pass = float(prob_pass)
+            results[i] = (int(prob_pass > 0.5), 1.0 - prob_pass, prob_pass)
+    return results
+
+pass_batcher = (MicroBatcher('pass', score_rows, PASS_MICROBATCH_MAX, PASS_MICROBATCH_WINDOW_MS / 1000)
+                if PASS_MICROBATCH else None)
+
+# predict_one for a request, scored in one matrix product with the other requests that
+# arrive within the batching window. Values are converted here so a bad row fails its
+# own request rather than the batch.
+def predict_pass(linear, values):
+    values = [float(value) for value in values]
+    if pass_batcher is None:
+        return linear.predict_one(values)
+    return pass_batcher.submit((linear, values))
+
+
+# A trained model + scaler as loaded from (or published to) the artifact directory
+class PassModelArtifact:
+    def __init__(self, model, scaler, accuracy, manifest):
+        self.model = model
+        self.scaler = scaler
+        self.accuracy = accuracy
+        self.manifest = manifest
+        self.linear = LinearPassModel(model, scaler)
+
+    @property
+    def checksum(self):
+        return self.manifest['checksum']
+
+
+def artifact_paths(model_dir=None):
+    model_dir = model_dir or PASS_MODEL_DIR
+    return (
+        os.path.join(model_dir, f'{PASS_MODEL_NAME}.pkl'),
+        os.path.join(model_dir, f'{PASS_MODEL_NAME}.json')
+    )
+
+# Write to a temp file in the same directory and rename, so readers never see a partial file
+def atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# Trains the model and publishes it as <name>.pkl plus a <name>.json manifest holding
+# its version and SHA-256. The manifest is written last, so it only ever names a complete pickle.
+def publish_pass_model(model_dir=None):
+    start = time.perf_counter()
+    model, scaler, acc = train_pass_predictor_model()
+    data = pickle.dumps({'model': model, 'scaler': scaler, 'accuracy': acc}, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {
+        'version': PASS_MODEL_VERSION,
+        'sklearn_version': package_version('scikit-learn'),
+        'features': list(PASS_FEATURES),
+        'checksum': hashlib.sha256(data).hexdigest(),
+        'accuracy': acc,
+        'trained_at': datetime.now().isoformat(),
+        'training_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+    model_path, manifest_path = artifact_paths(model_dir)
+    atomic_write(model_path, data)
+    atomic_write(manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+    return PassModelArtifact(model, scaler, acc, manifest)
+
+# Loads a published artifact. Raises ValueError when it is stale or fails its checksum,
+# OSError when it is missing.
+def load_pass_model(model_dir=None):
+    model_path, manifest_path = artifact_paths(model_dir)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != PASS_MODEL_VERSION:
+        raise ValueError(f"artifact version {manifest.get('version')} != {PASS_MODEL_VERSION}")
+    sklearn_version = package_version('scikit-learn')
+    if manifest.get('sklearn_version') != sklearn_version:
+        raise ValueError(f"artifact built with scikit-learn {manifest.get('sklearn_version')}, running {sklearn_version}")
+    if manifest.get('features') != list(PASS_FEATURES):
+        raise ValueError('artifact feature list does not match PASS_FEATURES')
+
+    with open(model_path, 'rb') as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != manifest.get('checksum'):
+        raise ValueError('artifact checksum mismatch')
+    bundle = pickle.loads(data)
+    return PassModelArtifact(bundle['model'], bundle['scaler'], bundle['accuracy'], manifest)
+
+# Startup path: use the published artifact, retrain only when it is missing or stale
+def load_or_train_pass_model(model_dir=None):
+    try:
+        return load_pass_model(model_dir)
+    except (OSError, ValueError) as e:
+        logger.warning('pass_model.artifact_unavailable error=%r (retraining)', e)
+        return publish_pass_model(model_dir)
+
+
+_pass_model = None
+_pass_manifest_mtime = None
+_next_pass_check = 0.0
+_pass_model_lock = threading.Lock()
+
+def manifest_mtime(model_dir=None):
+    try:
+        return os.stat(artifact_paths(model_dir)[1]).st_mtime_ns
+    except OSError:
+        return None
+
+# Current artifact for this worker. Every PASS_MODEL_CHECK_INTERVAL seconds the manifest
+# is checked, so an artifact published by `flask train-pass-model` is picked up without a restart.
+def get_pass_model():
+    global _pass_model, _pass_manifest_mtime, _next_pass_check
+    now = time.monotonic()
+    if _pass_model is None or now >= _next_pass_check:
+        with _pass_model_lock:
+            if _pass_model is None:
+                _pass_model = load_or_train_pass_model()
+                _pass_manifest_mtime = manifest_mtime()
+            elif now >= _next_pass_check and manifest_mtime() != _pass_manifest_mtime:
+                try:
+                    reload_pass_model(locked=True)
+                except (OSError, ValueError):
+                    pass
+            _next_pass_check = now + PASS_MODEL_CHECK_INTERVAL
+    return _pass_model
+
+# Swap in the artifact currently on disk; the old model keeps serving if it cannot be loaded
+def reload_pass_model(locked=False):
+    global _pass_model, _pass_manifest_mtime
+    if not locked:
+        with _pass_model_lock:
+            return reload_pass_model(locked=True)
+    mtime = manifest_mtime()
+    try:
+        _pass_model = load_pass_model()
+    except (OSError, ValueError) as e:
+        logger.error('pass_model.reload_failed keeping=%s error=%r', _pass_model.checksum[:12] if _pass_model else 'none', e)
+        raise
+    finally:
+        _pass_manifest_mtime = mtime
+    return _pass_model
+
+
+# Factors shown next to a prediction; `student` maps feature name -> value
+def pass_factors(student):
+    factors = []
+    if student['study_hours'] >= 6: factors.append("Good study hours")
+    if student['attendance'] >= 75: factors.append("High attendance")
+    if student['student_test_score'] >= 70: factors.append("Good test score")
+    if student['student_assignment_score'] >= 70: factors.append("Strong assignment score")
+    if student['participation_score'] >= 6: factors.append("Active participation")
+    if student['num_failed_before'] > 0: factors.append("Past failures may affect result")
+    return factors
+
+# Prediction fields shared by the single, batch and grid endpoints
+def describe_prediction(prob_pass, factors):
+    prob_pass = float(prob_pass)
+    prediction = int(prob_pass > 0.5)
+    return {
+        'prediction': prediction,
+        'label': 'Pass' if prediction == 1 else 'Fail',
+        'confidence': round((prob_pass if prediction == 1 else 1.0 - prob_pass) * 100, 2),
+        'prob_pass': round(prob_pass * 100, 2),
+        'prob_fail': round((1.0 - prob_pass) * 100, 2),
+        'factors': factors
+    }
+
+# Feature values in PASS_FEATURES order; raises ValueError for missing or non-numeric fields
+def parse_student(record):
+    missing = [name for name in PASS_FEATURES if record.get(name) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    try:
+        values = [float(record[name]) for name in PASS_FEATURES]
+    except (TypeError, ValueError):
+        raise ValueError('All fields must be numeric')
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError('All fields must be finite numbers')
+    return values
+
+# Rows from a CSV roster with a header naming the PASS_FEATURES columns (extra columns are kept as-is)
+def read_students_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [name for name in PASS_FEATURES if name not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    return list(reader)
+
+# Values for one swept feature: {"start", "stop", "step"} (stop inclusive) or an explicit list
+def range_values(name, spec, max_points):
+    def number(value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Range for {name} must be numeric")
+        if not math.isfinite(value):
+            raise ValueError(f"Range for {name} must be finite")
+        return value
+
+    if isinstance(spec, list):
+        if len(spec) > max_points:
+            raise ValueError(f"Range for {name} has {len(spec)} points (limit {max_points})")
+        values = [number(v) for v in spec]
+    elif isinstance(spec, dict):
+        if 'start' not in spec or 'stop' not in spec:
+            raise ValueError(f"{name} range needs start and stop")
+        start, stop, step = number(spec['start']), number(spec['stop']), number(spec.get('step', 1))
+        if step <= 0 or stop < start:
+            raise ValueError(f"Invalid range for {name}")
+        steps = (stop - start) / step
+        # A tiny step over a wide span overflows to inf
+        if not math.isfinite(steps):
+            raise ValueError(f"Range for {name} has too many points (limit {max_points})")
+        count = math.floor(steps + 1e-9) + 1
+        if count > max_points:
+            raise ValueError(f"Range for {name} has {count} points (limit {max_points})")
+        values = [start + step * i for i in range(count)]
+    else:
+        raise ValueError(f"Range for {name} must be a list or {{start, stop, step}}")
+    if not values:
+        raise ValueError(f"Range for {name} is empty")
+    return values
+
+# Cartesian product of the swept ranges around a base student, as an (n, 8) matrix.
+# The size is checked before anything is allocated.
+def expand_grid(base_values, ranges, max_points):
+    import numpy as np
+    unknown = [name for name in ranges if name not in PASS_FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(unknown)}")
+    names = [name for name in PASS_FEATURES if name in ranges]
+    axes = [range_values(name, ranges[name], max_points) for name in names]
+    total = math.prod(len(axis) for axis in axes)
+    if total > max_points:
+        raise ValueError(f"Grid has {total} points (limit {max_points})")
+
+    X = np.tile(np.asarray(base_values, dtype=np.float64), (total, 1))
+    if axes:
+        mesh = np.meshgrid(*axes, indexing='ij')
+        for name, column in zip(names, mesh):
+            X[:, PASS_FEATURES.index(name)] = column.ravel()
+    return names, X
+
+# Change in prob_pass per unit increase of each feature, averaged over the given
+# probabilities. For a logistic model d p / d x_j = p * (1 - p) * weight_j.
+def marginal_effects(linear, prob_pass):
+    import numpy as np
+    prob_pass = np.asarray(prob_pass, dtype=np.float64)
+    return float(np.mean(prob_pass * (1.0 - prob_pass))) * linear.weights
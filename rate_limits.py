@@ -0,0 +1,106 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+
+# Token buckets keyed by anything hashable. A bucket holds up to `burst` tokens, refills at
+# `rate` tokens per second and each request takes one. Buckets are kept in least recently
+# used order, so eviction only looks at the front: buckets idle for `ttl` seconds are
+# dropped (one idle for burst / rate seconds is full again, same as a new one), and the
+# oldest go first once there are more than `max_keys`.
+class TokenBuckets:
+    def __init__(self, ttl=600, max_keys=100000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self.evicted = 0
+
+    # Takes a token for key; returns 0 when there was one, else the seconds until there is
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._evict(now)
+        return wait
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            _, (_, last) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - last < self.ttl:
+                return
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Admission control for the expensive endpoints, by endpoint class:
+#   rates       - {class: (requests per second, burst)} per client and route
+#   concurrency - {class: requests of that class running at once in this process}
+# Classes missing from a dict are not limited by it. admit() answers right away; a
+# request it lets in must be followed by release() once it has finished.
+class AdmissionControl:
+    def __init__(self, rates, concurrency, ttl=600, max_clients=100000, busy_retry_after=1):
+        self.rates = dict(rates)
+        self.concurrency = dict(concurrency)
+        self.busy_retry_after = busy_retry_after
+        self.buckets = TokenBuckets(ttl, max_clients)
+        self._lock = threading.Lock()
+        self._active = {name: 0 for name in self.concurrency}
+        self.admitted = {}
+        self.rate_limited = {}
+        self.busy = {}
+
+    # None when the request may run, else (reason, seconds to wait) with reason
+    # 'rate_limited' (this client is over its rate for the route) or 'busy' (every slot
+    # for the class is taken)
+    def admit(self, client, endpoint_class, route):
+        limit = self.rates.get(endpoint_class)
+        if limit is not None:
+            wait = self.buckets.take((client, route), *limit)
+            if wait:
+                with self._lock:
+                    self.rate_limited[endpoint_class] = self.rate_limited.get(endpoint_class, 0) + 1
+                return 'rate_limited', max(1, math.ceil(wait))
+        with self._lock:
+            slots = self.concurrency.get(endpoint_class)
+            if slots is not None:
+                if self._active[endpoint_class] >= slots:
+                    self.busy[endpoint_class] = self.busy.get(endpoint_class, 0) + 1
+                    return 'busy', self.busy_retry_after
+                self._active[endpoint_class] += 1
+            self.admitted[endpoint_class] = self.admitted.get(endpoint_class, 0) + 1
+        return None
+
+    def release(self, endpoint_class):
+        if endpoint_class in self._active:
+            with self._lock:
+                self._active[endpoint_class] -= 1
+
+    def active(self):
+        with self._lock:
+            return dict(self._active)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rates': {name: {'per_second': rate, 'burst': burst} for name, (rate, burst) in self.rates.items()},
+                'concurrency': dict(self.concurrency),
+                'active': dict(self._active),
+                'admitted': dict(self.admitted),
+                'rate_limited': dict(self.rate_limited),
+                'busy': dict(self.busy),
+                'tracked_buckets': len(self.buckets),
+                'evicted_buckets': self.buckets.evicted
+            }
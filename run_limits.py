@@ -0,0 +1,566 @@
+import os
+import sys
+import json
+import asyncio
+import time
+import errno
+import codecs
+import shutil
+import signal
+import socket
+import selectors
+import threading
+import subprocess
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# rlimits, process groups and usage accounting are POSIX only; elsewhere runs get the
+# wall-clock timeout and output cap alone
+RLIMITS_SUPPORTED = resource is not None
+SPAWNER_SUPPORTED = RLIMITS_SUPPORTED and hasattr(socket, 'send_fds')
+
+SPAWN_SERVER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spawn_server.py')
+
+
+# Kernel limits for one run of user code, applied in the child before exec:
+#   cpu_seconds   - RLIMIT_CPU, SIGXCPU once used up
+#   memory_mb     - RLIMIT_AS; skipped for runtimes that reserve huge address ranges
+#                   up front (node, the JVM), which get a heap cap flag instead
+#   file_size_mb  - RLIMIT_FSIZE, largest file the run may write (SIGXFSZ past it)
+#   max_processes - RLIMIT_NPROC; counts every process and thread of the server's
+#                   user, so leave headroom above what the server itself runs
+#   output_bytes  - stdout+stderr kept per run; the program is killed past it
+# A limit of 0 turns that limit off.
+class RunLimits:
+    def __init__(self, cpu_seconds=30, memory_mb=512, file_size_mb=16, max_processes=256,
+                 output_bytes=1024 * 1024):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.file_size_mb = file_size_mb
+        self.max_processes = max_processes
+        self.output_bytes = output_bytes
+
+    # [(resource name, soft, hard)] for one run
+    def rlimits(self, address_space=True, cpu_seconds=None):
+        cpu = self.cpu_seconds if cpu_seconds is None else cpu_seconds
+        limits = []
+        if address_space and self.memory_mb:
+            memory = self.memory_mb * 1024 * 1024
+            limits.append(('RLIMIT_AS', memory, memory))
+        if cpu:
+            limits.append(('RLIMIT_CPU', int(cpu), int(cpu) + 1))
+        if self.file_size_mb:
+            size = self.file_size_mb * 1024 * 1024
+            limits.append(('RLIMIT_FSIZE', size, size))
+        if self.max_processes:
+            limits.append(('RLIMIT_NPROC', self.max_processes, self.max_processes))
+        return limits
+
+    # preexec_fn for subprocess.Popen applying the same limits
+    def preexec(self, address_space=True, cpu_seconds=None):
+        if resource is None:
+            return None
+        limits = self.rlimits(address_space, cpu_seconds)
+
+        def apply():
+            for name, soft, hard in limits:
+                resource.setrlimit(getattr(resource, name), (soft, hard))
+        return apply
+
+    def as_dict(self):
+        return {
+            'cpu_seconds': self.cpu_seconds,
+            'memory_mb': self.memory_mb,
+            'file_size_mb': self.file_size_mb,
+            'max_processes': self.max_processes,
+            'output_bytes': self.output_bytes
+        }
+
+
+def kill_group(process):
+    try:
+        if RLIMITS_SUPPORTED:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def describe_exit(returncode):
+    if RLIMITS_SUPPORTED and returncode == -signal.SIGXCPU:
+        return 'CPU time limit exceeded'
+    if RLIMITS_SUPPORTED and returncode == -signal.SIGXFSZ:
+        return 'File size limit exceeded'
+    if returncode < 0:
+        return f'Terminated by signal {-returncode}'
+    return 'Execution failed'
+
+def rss_kb(maxrss):
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+def usage_dict(cpu_seconds, maxrss, wall_seconds):
+    return {
+        'cpu_ms': round(cpu_seconds * 1000, 1) if cpu_seconds is not None else None,
+        'peak_rss_kb': rss_kb(maxrss) if maxrss is not None else None,
+        'wall_ms': round(wall_seconds * 1000, 1)
+    }
+
+
+class RunResult:
+    def __init__(self, returncode, stdout, stderr, truncated, usage):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.truncated = truncated
+        self.usage = usage
+
+
+# A process started by a Spawner. Has the parts of subprocess.Popen the runners use;
+# once it has exited, cpu_seconds and maxrss hold its wait4() usage.
+class SpawnedProcess:
+    def __init__(self, spawner, pid, args, stdin, stdout, stderr):
+        self._spawner = spawner
+        self.pid = pid
+        self.args = args
+        self.stdin = os.fdopen(stdin, 'wb') if stdin is not None else None
+        self.stdout = os.fdopen(stdout, 'rb')
+        self.stderr = os.fdopen(stderr, 'rb')
+        self.returncode = None
+        self.cpu_seconds = None
+        self.maxrss = None
+
+    def poll(self):
+        if self.returncode is None:
+            self._spawner.collect(self, 0)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None and not self._spawner.collect(self, timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def kill(self):
+        kill_group(self)
+
+    def record_exit(self, message):
+        self.cpu_seconds = message['cpu_seconds']
+        self.maxrss = message['maxrss']
+        self.returncode = message['returncode']
+
+
+# Client for spawn_server.py, which forks and execs user code on the server's behalf.
+# Linux reports a child's peak RSS as at least the RSS of the process it was forked
+# from, so children of the web server itself would all look as big as the server; the
+# spawn server is a fresh interpreter of a few MB. Started per process on first use,
+# like the other background helpers, so forked app workers each get their own.
+class Spawner:
+    def __init__(self, server_file=SPAWN_SERVER_FILE):
+        self.server_file = server_file
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._pid = None
+        self._sock = None
+        self._process = None
+        self._next_id = 0
+        self._replies = {}
+        self._exits = {}
+        self._running = set()
+        self._watchers = {}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._sock is not None:
+            return self._sock
+        if self._pid != os.getpid():
+            # State inherited through fork() belongs to the parent
+            self._replies, self._exits, self._running, self._watchers = {}, {}, set(), {}
+        ours, theirs = socket.socketpair()
+        try:
+            process = subprocess.Popen(
+                [sys.executable, '-I', self.server_file, str(theirs.fileno())],
+                pass_fds=(theirs.fileno(),), stdin=subprocess.DEVNULL, start_new_session=True
+            )
+        except OSError:
+            ours.close()
+            raise
+        finally:
+            theirs.close()
+        self._pid = os.getpid()
+        self._sock = ours
+        self._process = process
+        threading.Thread(target=self._read_replies, args=(ours, process), name='spawner', daemon=True).start()
+        return ours
+
+    def _read_replies(self, sock, process):
+        with sock.makefile('rb') as replies:
+            for line in replies:
+                message = json.loads(line)
+                watcher = None
+                with self._changed:
+                    if message['event'] == 'spawned':
+                        self._replies[message['id']] = message
+                    else:
+                        watcher = self._watchers.pop(message['pid'], None)
+                        if watcher is None:
+                            self._exits[message['pid']] = message
+                        else:
+                            self._running.discard(message['pid'])
+                    self._changed.notify_all()
+                if watcher is not None:
+                    watcher(message)
+        # The spawn server died; nobody will report on the children it started
+        watchers = []
+        with self._changed:
+            if self._sock is sock:
+                self._sock = None
+            for pid in self._running - set(self._exits):
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                message = {'returncode': -signal.SIGKILL, 'cpu_seconds': None, 'maxrss': None}
+                watcher = self._watchers.pop(pid, None)
+                if watcher is None:
+                    self._exits[pid] = message
+                else:
+                    self._running.discard(pid)
+                    watchers.append((watcher, message))
+            self._changed.notify_all()
+        for watcher, message in watchers:
+            watcher(message)
+        sock.close()
+        process.wait()
+
+    def start(self):
+        with self._lock:
+            self._ensure_started()
+
+    # Starts command in cwd under rlimits ([(name, soft, hard)]) in a new session, with
+    # stdout and stderr piped and stdin piped or /dev/null
+    def spawn(self, command, cwd, rlimits, stdin=False):
+        if os.sep not in command[0] and shutil.which(command[0]) is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), command[0])
+        if stdin:
+            stdin_read, stdin_write = os.pipe()
+        else:
+            stdin_read, stdin_write = os.open(os.devnull, os.O_RDONLY), None
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        request = {'command': list(command), 'cwd': cwd, 'rlimits': rlimits}
+        try:
+            with self._lock:
+                sock = self._ensure_started()
+                self._next_id += 1
+                request['id'] = self._next_id
+                socket.send_fds(sock, [json.dumps(request).encode('utf-8')],
+                                [stdin_read, stdout_write, stderr_write])
+                with self._changed:
+                    self._changed.wait_for(lambda: request['id'] in self._replies or self._sock is not sock)
+                    reply = self._replies.pop(request['id'], None)
+                    if reply is not None and reply['pid'] is not None:
+                        self._running.add(reply['pid'])
+        except BaseException:
+            for fd in (stdin_write, stdout_read, stderr_read):
+                if fd is not None:
+                    os.close(fd)
+            raise
+        finally:
+            for fd in (stdin_read, stdout_write, stderr_write):
+                os.close(fd)
+        if reply is None or reply['pid'] is None:
+            for fd in (stdin_write, stdout_read, stderr_read):
+                if fd is not None:
+                    os.close(fd)
+            raise OSError(reply['error'] if reply else 'Spawn server exited')
+        return SpawnedProcess(self, reply['pid'], command, stdin_write, stdout_read, stderr_read)
+
+    # Waits up to timeout seconds (None: forever) for the process to exit; False if it
+    # is still running
+    def collect(self, process, timeout):
+        with self._changed:
+            if not self._changed.wait_for(lambda: process.pid in self._exits, timeout):
+                return False
+            message = self._exits.pop(process.pid)
+            self._running.discard(process.pid)
+        process.record_exit(message)
+        return True
+
+    # Calls callback(exit message) once the process has exited, from the thread reading
+    # the spawn server's replies (right away if it already has), so waiting for a run
+    # need not block a thread. The callback must not block; pass the message on to
+    # process.record_exit().
+    def watch(self, process, callback):
+        with self._changed:
+            message = self._exits.pop(process.pid, None)
+            if message is None:
+                self._watchers[process.pid] = callback
+                return
+            self._running.discard(process.pid)
+        callback(message)
+
+    def stats(self):
+        return {
+            'running': self._pid == os.getpid() and self._sock is not None,
+            'server_pid': self._process.pid if self._process is not None and self._pid == os.getpid() else None,
+            'children': len(self._running) if self._pid == os.getpid() else 0
+        }
+
+
+spawner = Spawner()
+
+
+# stdout and stderr of a run, keeping at most output_bytes (0: everything) in total
+class CapturedOutput:
+    def __init__(self, output_bytes):
+        self.output_bytes = output_bytes
+        self.captured = {'stdout': [], 'stderr': []}
+        self.kept = 0
+        self.truncated = False
+
+    # Keeps text from stream `name`; False once the cap is reached (the run should be stopped)
+    def add(self, name, text):
+        size = len(text.encode('utf-8'))
+        if self.output_bytes and self.kept + size > self.output_bytes:
+            self.captured[name].append(
+                text.encode('utf-8')[:self.output_bytes - self.kept].decode('utf-8', errors='ignore'))
+            self.truncated = True
+            return False
+        self.captured[name].append(text)
+        self.kept += size
+        return True
+
+    def result(self):
+        return ''.join(self.captured['stdout']), ''.join(self.captured['stderr']), self.truncated
+
+
+# Reads a process's stdout and stderr until both close, keeping at most output_bytes
+# in total. If on_output(stream, text) is given it receives every decoded chunk instead
+# and can return False to stop the run. Kills the process group and raises
+# TimeoutExpired at deadline.
+def read_streams(process, deadline, output_bytes, on_output=None):
+    output = CapturedOutput(output_bytes)
+    with selectors.DefaultSelector() as selector:
+        for name in ('stdout', 'stderr'):
+            stream = getattr(process, name)
+            if stream is not None:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                selector.register(stream, selectors.EVENT_READ, (name, decoder))
+        stop = False
+        while selector.get_map() and not stop:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                kill_group(process)
+                raise subprocess.TimeoutExpired(process.args, None)
+            for key, _ in selector.select(remaining):
+                name, decoder = key.data
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    text = decoder.decode(b'', final=True)
+                else:
+                    text = decoder.decode(chunk)
+                if not text:
+                    continue
+                # Streamed to on_output when there is one, captured otherwise
+                if not (on_output or output.add)(name, text):
+                    kill_group(process)
+                    stop = True
+                    break
+    return output.result()
+
+# Waits for the process and returns (returncode, cpu_seconds, maxrss); the usage is
+# None for processes not started by a Spawner. Kills the process group if it is still
+# running at deadline.
+def wait_with_usage(process, deadline):
+    try:
+        process.wait(timeout=max(0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        kill_group(process)
+        raise
+    return process.returncode, getattr(process, 'cpu_seconds', None), getattr(process, 'maxrss', None)
+
+# subprocess.run replacement for user code: rlimits, its own process group, an output
+# cap and measured CPU time, peak RSS and wall time. Raises subprocess.TimeoutExpired.
+# on_start(process) is called right after the process starts (e.g. to allow cancel).
+def run_limited(command, cwd, limits, timeout, address_space=True, stdin_data=None,
+                on_output=None, on_start=None):
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    if SPAWNER_SUPPORTED:
+        process = spawner.spawn(command, cwd, limits.rlimits(address_space), stdin=stdin_data is not None)
+    else:
+        process = subprocess.Popen(
+            command, cwd=cwd,
+            stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            preexec_fn=limits.preexec(address_space=address_space),
+            start_new_session=RLIMITS_SUPPORTED
+        )
+    if on_start is not None:
+        on_start(process)
+    try:
+        if stdin_data is not None:
+            write_stdin(process, stdin_data)
+        stdout, stderr, truncated = read_streams(process, deadline, limits.output_bytes, on_output)
+        returncode, cpu_seconds, maxrss = wait_with_usage(process, deadline)
+    except subprocess.TimeoutExpired:
+        kill_group(process)
+        process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    usage = usage_dict(cpu_seconds, maxrss, time.perf_counter() - start)
+    return RunResult(returncode, stdout, stderr, truncated, usage)
+
+# read_streams for the event loop: the pipes are watched with add_reader, so no thread
+# waits on them. Kills the process group once output_bytes is exceeded.
+async def read_streams_async(process, output_bytes):
+    loop = asyncio.get_running_loop()
+    output = CapturedOutput(output_bytes)
+    finished = loop.create_future()
+    streams = {}
+
+    def stop(fd):
+        loop.remove_reader(fd)
+        streams.pop(fd, None)
+        if not streams and not finished.done():
+            finished.set_result(None)
+
+    def readable(fd, name, decoder):
+        chunk = os.read(fd, 65536)
+        text = decoder.decode(chunk) if chunk else decoder.decode(b'', final=True)
+        if text and not output.add(name, text):
+            kill_group(process)
+            for other in list(streams):
+                stop(other)
+            return
+        if not chunk:
+            stop(fd)
+
+    for name in ('stdout', 'stderr'):
+        fd = getattr(process, name).fileno()
+        streams[fd] = name
+        loop.add_reader(fd, readable, fd, name, codecs.getincrementaldecoder('utf-8')(errors='replace'))
+    try:
+        await finished
+    finally:
+        for fd in list(streams):
+            loop.remove_reader(fd)
+    return output.result()
+
+# run_limited for asyncio code: the same limits, output cap and usage figures, but the
+# pipes and the exit are awaited on the event loop instead of holding a thread for the
+# whole run. Raises subprocess.TimeoutExpired; a cancelled run is killed. Without the
+# spawn server (non-POSIX) it runs run_limited in a worker thread instead.
+async def run_limited_async(command, cwd, limits, timeout, address_space=True, stdin_data=None):
+    if not SPAWNER_SUPPORTED:
+        return await asyncio.to_thread(run_limited, command, cwd, limits, timeout, address_space, stdin_data)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # A spawn waits a moment for the spawn server's reply, so it runs off the loop
+    process = await asyncio.to_thread(spawner.spawn, command, cwd, limits.rlimits(address_space),
+                                      stdin_data is not None)
+    exited = loop.create_future()
+
+    def on_exit(message):
+        try:
+            loop.call_soon_threadsafe(lambda: exited.done() or exited.set_result(message))
+        except RuntimeError:
+            pass  # the loop has closed; nobody is waiting
+    spawner.watch(process, on_exit)
+
+    async def run():
+        if stdin_data is not None:
+            await asyncio.to_thread(write_stdin, process, stdin_data)
+        output = await read_streams_async(process, limits.output_bytes)
+        return output, await exited
+
+    try:
+        (stdout, stderr, truncated), message = await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        kill_group(process)
+        await exited
+        raise subprocess.TimeoutExpired(command, timeout)
+    except BaseException:
+        # Cancelled (the client went away) or failed: nobody wants the run any more
+        kill_group(process)
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    process.record_exit(message)
+    usage = usage_dict(process.cpu_seconds, process.maxrss, time.perf_counter() - start)
+    return RunResult(process.returncode, stdout, stderr, truncated, usage)
+
+def write_stdin(process, stdin_data):
+    try:
+        process.stdin.write(stdin_data.encode('utf-8'))
+    except BrokenPipeError:
+        pass
+    process.stdin.close()
+
+def outcome_of(result):
+    if result.truncated:
+        return 'output_limit'
+    if result.returncode == 0:
+        return 'ok'
+    if RLIMITS_SUPPORTED and result.returncode == -signal.SIGXCPU:
+        return 'cpu_limit'
+    if RLIMITS_SUPPORTED and result.returncode == -signal.SIGXFSZ:
+        return 'file_size_limit'
+    return 'error'
+
+
+# Rolling per-(language, stage) usage for capacity planning: how much CPU, memory and
+# time runs take, and how often they hit a limit. Keeps the last `window` samples.
+class UsageStats:
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._groups = {}
+
+    def record(self, language, stage, usage, outcome):
+        with self._lock:
+            group = self._groups.get((language, stage))
+            if group is None:
+                group = self._groups[(language, stage)] = {
+                    'runs': 0, 'outcomes': {}, 'samples': deque(maxlen=self.window)
+                }
+            group['runs'] += 1
+            group['outcomes'][outcome] = group['outcomes'].get(outcome, 0) + 1
+            if usage is not None:
+                group['samples'].append(usage)
+
+    @staticmethod
+    def summarize(values):
+        if not values:
+            return None
+        values = sorted(values)
+        return {
+            'mean': round(sum(values) / len(values), 1),
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max': values[-1]
+        }
+
+    def stats(self, memory_budget_kb=None, cores=None):
+        with self._lock:
+            groups = {key: (group['runs'], dict(group['outcomes']), list(group['samples']))
+                      for key, group in self._groups.items()}
+        report = {}
+        for (language, stage), (runs, outcomes, samples) in sorted(groups.items()):
+            entry = {'runs': runs, 'outcomes': outcomes}
+            for field in ('cpu_ms', 'peak_rss_kb', 'wall_ms'):
+                entry[field] = self.summarize([s[field] for s in samples if s.get(field) is not None])
+            # Rough headroom: runs that fit in memory at p95 RSS, and runs per second the
+            # cores can sustain at mean CPU time
+            if memory_budget_kb and entry['peak_rss_kb'] and entry['peak_rss_kb']['p95']:
+                entry['concurrent_runs_by_memory'] = int(memory_budget_kb // entry['peak_rss_kb']['p95'])
+            if cores and entry['cpu_ms'] and entry['cpu_ms']['mean']:
+                entry['runs_per_second_by_cpu'] = round(cores * 1000 / entry['cpu_ms']['mean'], 1)
+            report.setdefault(language, {})[stage] = entry
+        return report
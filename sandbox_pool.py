@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import selectors
+import tempfile
+import threading
+import subprocess
+
+from run_limits import (RunLimits, RunResult, RLIMITS_SUPPORTED, SPAWNER_SUPPORTED, spawner, kill_group,
+                        describe_exit, usage_dict, read_streams, wait_with_usage)
+
+logger = logging.getLogger('portfolio.sandbox')
+
+RUNNER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py')
+
+# Only POSIX has the rlimits and process groups the pool relies on
+POOL_SUPPORTED = RLIMITS_SUPPORTED
+
+
+# Reads at most limit bytes of a run's captured output; returns (text, truncated)
+def read_output(path, limit):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(limit + 1 if limit else -1)
+    except FileNotFoundError:
+        return '', False
+    truncated = bool(limit) and len(data) > limit
+    if truncated:
+        data = data[:limit]
+    return data.decode('utf-8', errors='replace'), truncated
+
+
+# A pre-started `python -I sandbox_runner.py` that executes one snippet per request
+# line (see sandbox_runner.py). Each run gets its own child forked from the worker, so
+# runs never share interpreter state; the worker itself is retired after max_runs runs
+# or when it stops answering.
+class PythonWorker:
+    language = 'python'
+
+    def __init__(self, limits, max_runs):
+        self.limits = limits
+        self.max_runs = max_runs
+        self.runs = 0
+        self.healthy = True
+        self.base = tempfile.mkdtemp(prefix='sandbox-python-')
+        # The hard CPU limit covers the worker's whole life; the runner raises the soft
+        # limit by limits.cpu_seconds before each run
+        cpu_total = limits.cpu_seconds * max_runs + 5 if limits.cpu_seconds else 0
+        self.process = subprocess.Popen(
+            [sys.executable, '-I', RUNNER_FILE, self.base, str(limits.cpu_seconds or 0),
+             str(limits.output_bytes or 0)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=self.base, preexec_fn=limits.preexec(cpu_seconds=cpu_total), start_new_session=True
+        )
+
+    def run(self, code, timeout):
+        self.runs += 1
+        start = time.perf_counter()
+        try:
+            self.process.stdin.write((json.dumps({'code': code}) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.healthy = False
+            raise RuntimeError('Sandbox worker exited before the run started')
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            if not selector.select(timeout):
+                self.healthy = False
+                kill_group(self.process)
+                self.process.wait()
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+        line = self.process.stdout.readline()
+        wall = time.perf_counter() - start
+
+        stdout, stdout_truncated = read_output(os.path.join(self.base, 'stdout'), self.limits.output_bytes)
+        stderr, stderr_truncated = read_output(os.path.join(self.base, 'stderr'), self.limits.output_bytes)
+        truncated = stdout_truncated or stderr_truncated
+        if not line:
+            # The worker itself died (it is killed with the run on a timeout)
+            self.healthy = False
+            returncode = self.process.wait()
+            if returncode != 0 and not stderr:
+                stderr = describe_exit(returncode)
+            return RunResult(returncode, stdout, stderr, truncated, usage_dict(None, None, wall))
+
+        reply = json.loads(line)
+        truncated = truncated or reply['truncated']
+        if reply['returncode'] < 0 and not stderr:
+            stderr = describe_exit(reply['returncode'])
+        usage = usage_dict(reply['cpu_seconds'], reply['maxrss'], wall)
+        return RunResult(reply['returncode'], stdout, stderr, truncated, usage)
+
+    @property
+    def reusable(self):
+        return self.healthy and self.runs < self.max_runs and self.process.poll() is None
+
+    def close(self):
+        if self.process.poll() is None:
+            kill_group(self.process)
+            self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.base, ignore_errors=True)
+
+
+# A pre-started `node -`, blocked reading its program from stdin. Node cannot reset
+# its state between programs, so each worker runs exactly one snippet; keeping spares
+# started still takes the interpreter start-up off the request path.
+class NodeWorker:
+    language = 'javascript'
+
+    def __init__(self, limits, max_runs):
+        self.limits = limits
+        self.runs = 0
+        self.base = tempfile.mkdtemp(prefix='sandbox-javascript-')
+        command = ['node']
+        if limits.memory_mb:
+            # V8 reserves far more address space than it uses, so cap the heap instead of RLIMIT_AS
+            command.append(f'--max-old-space-size={limits.memory_mb}')
+        if SPAWNER_SUPPORTED:
+            self.process = spawner.spawn(command + ['-'], self.base, limits.rlimits(address_space=False), stdin=True)
+        else:
+            self.process = subprocess.Popen(
+                command + ['-'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=self.base, preexec_fn=limits.preexec(address_space=False), start_new_session=True
+            )
+
+    def run(self, code, timeout):
+        self.runs += 1
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        try:
+            try:
+                self.process.stdin.write(code.encode('utf-8'))
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            stdout, stderr, truncated = read_streams(self.process, deadline, self.limits.output_bytes)
+            returncode, cpu_seconds, maxrss = wait_with_usage(self.process, deadline)
+        except subprocess.TimeoutExpired:
+            kill_group(self.process)
+            self.process.wait()
+            raise subprocess.TimeoutExpired(self.process.args, timeout)
+        if returncode < 0 and not stderr:
+            stderr = describe_exit(returncode)
+        # CPU time includes node's start-up, which ran before the request arrived
+        usage = usage_dict(cpu_seconds, maxrss, time.perf_counter() - start)
+        return RunResult(returncode, stdout, stderr, truncated, usage)
+
+    @property
+    def reusable(self):
+        return False
+
+    def close(self):
+        if self.process.poll() is None:
+            kill_group(self.process)
+            self.process.wait()
+        for stream in (self.process.stdout, self.process.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.base, ignore_errors=True)
+
+
+WORKER_TYPES = {'python': PythonWorker, 'javascript': NodeWorker}
+
+
+# Keeps `size` workers of one language started. A run takes an idle worker (or starts
+# an extra one if all are busy), then hands it back or retires it; a background thread
+# replaces retired workers. Started per process on first use, so forked app workers
+# never share sandbox processes.
+class SandboxPool:
+    def __init__(self, language, size=2, max_runs=20, limits=None):
+        self.language = language
+        self.worker_type = WORKER_TYPES[language]
+        self.size = size
+        self.max_runs = max_runs
+        self.limits = limits or RunLimits()
+        self._lock = threading.Lock()
+        self._wanted = threading.Condition(self._lock)
+        self._pid = None
+        self._idle = []
+        self._busy = 0
+        self._closed = False
+        self.runs = 0
+        self.warm_runs = 0
+        self.cold_starts = 0
+        self.recycled = 0
+        self.spawn_failures = 0
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Workers inherited through fork() belong to the parent
+            self._idle = []
+            self._busy = 0
+            self._closed = False
+            self._pid = os.getpid()
+            threading.Thread(target=self._refill_loop, name=f'sandbox-{self.language}', daemon=True).start()
+
+    def _spawn(self):
+        return self.worker_type(self.limits, self.max_runs)
+
+    def _refill_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and len(self._idle) + self._busy >= self.size:
+                    self._wanted.wait()
+                if self._closed:
+                    return
+            try:
+                worker = self._spawn()
+            except OSError as e:
+                self.spawn_failures += 1
+                logger.error('sandbox.spawn_failed language=%s error=%r', self.language, e)
+                time.sleep(5)
+                continue
+            with self._lock:
+                if self._closed:
+                    worker.close()
+                    return
+                self._idle.append(worker)
+
+    def _acquire(self):
+        self.start()
+        with self._lock:
+            if self._idle:
+                self._busy += 1
+                self.warm_runs += 1
+                return self._idle.pop(), True
+        self.cold_starts += 1
+        return self._spawn(), False
+
+    def _release(self, worker, pooled):
+        with self._lock:
+            if pooled:
+                self._busy -= 1
+            if worker.reusable and not self._closed and len(self._idle) + self._busy < self.size:
+                self._idle.append(worker)
+                return
+            self._wanted.notify()
+        self.recycled += 1
+        worker.close()
+
+    # Runs a snippet and returns a run_limits.RunResult; raises
+    # subprocess.TimeoutExpired when it takes longer than timeout seconds
+    def run(self, code, timeout):
+        worker, pooled = self._acquire()
+        self.runs += 1
+        try:
+            return worker.run(code, timeout)
+        finally:
+            self._release(worker, pooled)
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._wanted.notify_all()
+            self._pid = None
+        for worker in idle:
+            worker.close()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'idle': len(self._idle) if self._pid == os.getpid() else 0,
+            'busy': self._busy if self._pid == os.getpid() else 0,
+            'max_runs': self.max_runs,
+            'runs': self.runs,
+            'warm_runs': self.warm_runs,
+            'cold_starts': self.cold_starts,
+            'recycled': self.recycled,
+            'spawn_failures': self.spawn_failures
+        }
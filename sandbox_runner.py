@@ -0,0 +1,169 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import select
+import builtins
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Long-lived Python worker for sandbox_pool.PythonWorker.
+#
+#   python -I sandbox_runner.py <base dir> <cpu seconds per run> <output bytes per run>
+#
+# Reads one JSON request per line ({"code": ...}) and answers with one JSON line
+# ({"returncode", "cpu_seconds", "maxrss", "truncated"}). Every run happens in a child
+# forked from this already started interpreter, so nothing a run changes (builtins,
+# sys.modules, monkeypatches, threads it leaves running) reaches the next one, which
+# gets a fresh copy again. The protocol uses private copies of the original
+# stdin/stdout, closed in the child; during a run fd 0 is /dev/null and fds 1/2 go to
+# <base>/stdout and <base>/stderr, which the pool reads back. A run whose output
+# passes the output cap (0: no cap) is killed, as read_streams does for piped runs.
+# The code runs as <base>/work/main.py with <base>/work as the current directory,
+# emptied before every run.
+
+
+def cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+# Lets this run use cpu_seconds more CPU time; past that the kernel sends SIGXCPU to
+# the run's child, which the worker reports as the run's exit
+def limit_cpu(cpu_seconds):
+    if resource is None or not cpu_seconds:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(cpu_used() + cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def exit_status(exc):
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+def run(code, base, work, cpu_seconds):
+    shutil.rmtree(work, ignore_errors=True)
+    os.mkdir(work)
+    os.chdir(work)
+    path = os.path.join(work, 'main.py')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(code)
+
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    for fd, name in ((1, 'stdout'), (2, 'stderr')):
+        target = os.open(os.path.join(base, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(target, fd)
+        os.close(target)
+
+    sys.argv = [path]
+    sys.path[0] = work
+    namespace = {'__name__': '__main__', '__file__': path, '__builtins__': builtins}
+    limit_cpu(cpu_seconds)
+    try:
+        exec(compile(code, path, 'exec'), namespace)
+        returncode = 0
+    except SystemExit as e:
+        returncode = exit_status(e)
+    except BaseException:
+        etype, value, tb = sys.exc_info()
+        # Skip this frame so the traceback starts in main.py, as with `python main.py`
+        traceback.print_exception(etype, value, tb.tb_next)
+        returncode = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        # Anything the run leaves behind (threads, atexit output) goes nowhere; the
+        # child exits right after
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        os.close(devnull)
+    return returncode
+
+# os.wait4 for a run's child, killing it once stdout and stderr together pass
+# output_bytes; returns (wait status, rusage, whether it was killed for its output).
+# The sizes are checked every 20 ms; a pidfd wakes the wait as soon as the child exits.
+def wait_run(pid, base, output_bytes):
+    if not output_bytes:
+        _, status, usage = os.wait4(pid, 0)
+        return status, usage, False
+    paths = [os.path.join(base, name) for name in ('stdout', 'stderr')]
+    pidfd = os.pidfd_open(pid) if hasattr(os, 'pidfd_open') else None
+    try:
+        while True:
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done:
+                return status, usage, False
+            size = 0
+            for path in paths:
+                try:
+                    size += os.stat(path).st_size
+                except FileNotFoundError:
+                    pass
+            if size > output_bytes:
+                os.kill(pid, signal.SIGKILL)
+                _, status, usage = os.wait4(pid, 0)
+                return status, usage, True
+            if pidfd is None:
+                time.sleep(0.02)
+            else:
+                select.select([pidfd], [], [], 0.02)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+def main():
+    base, cpu_seconds, output_bytes = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+    work = os.path.join(base, 'work')
+    requests = io.open(os.dup(0), 'r', encoding='utf-8')
+    responses = io.open(os.dup(1), 'w', encoding='utf-8')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+    for line in requests:
+        request = json.loads(line)
+        # Emptied here rather than in the child, so wait_run never sees the last run's output
+        for name in ('stdout', 'stderr'):
+            os.close(os.open(os.path.join(base, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+        pid = os.fork()
+        if pid == 0:
+            returncode = 1
+            try:
+                # A run must not be able to answer for itself or read the next request
+                os.close(requests.fileno())
+                os.close(responses.fileno())
+                returncode = run(request['code'], base, work, cpu_seconds)
+            finally:
+                # Exit statuses wrap like the interpreter's own (sys.exit(-1) is 255)
+                os._exit(returncode & 0xff)
+        status, usage, truncated = wait_run(pid, base, output_bytes)
+        # The child's usage counts from the fork, so it covers this run alone (its peak
+        # RSS starts from this small interpreter's, as a fresh `python main.py` would)
+        responses.write(json.dumps({
+            'returncode': os.waitstatus_to_exitcode(status),
+            'cpu_seconds': usage.ru_utime + usage.ru_stime,
+            'maxrss': usage.ru_maxrss,
+            'truncated': truncated
+        }) + '\n')
+        responses.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import signal
+import socket
+import resource
+import threading
+
+# Fork server for run_limits.Spawner.
+#
+#   python -I spawn_server.py <socket fd>
+#
+# Linux reports a child's peak RSS (ru_maxrss) as at least the RSS of the process it
+# was forked from, so children forked straight from the web server all look as big as
+# the server. This small process does the forking instead.
+#
+# Requests arrive one per message on the socket: a JSON line ({"id", "command", "cwd",
+# "rlimits"}) carrying the child's stdin, stdout and stderr as passed descriptors.
+# Replies are JSON lines: {"event": "spawned", "id", "pid"} right away, and
+# {"event": "exit", "pid", "returncode", "cpu_seconds", "maxrss"} when the child exits.
+# Each child runs in its own session, so its pid is also its process group id. When
+# the server side of the socket closes, every child still running is killed.
+
+
+def start_child(request, fds):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setsid()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            os.closerange(3, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+            for name, soft, hard in request['rlimits']:
+                resource.setrlimit(getattr(resource, name), (soft, hard))
+            os.chdir(request['cwd'])
+            os.execvp(request['command'][0], request['command'])
+        except BaseException as e:
+            try:
+                os.write(2, f"Could not start {request['command'][0]}: {e}\n".encode('utf-8'))
+            finally:
+                os._exit(127)
+    return pid
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    send_lock = threading.Lock()
+    children = set()
+    changed = threading.Condition()
+
+    def send(message):
+        with send_lock:
+            sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+    def reap():
+        while True:
+            with changed:
+                changed.wait_for(lambda: children)
+            try:
+                pid, status, usage = os.wait4(-1, 0)
+            except ChildProcessError:
+                continue
+            with changed:
+                children.discard(pid)
+            send({
+                'event': 'exit',
+                'pid': pid,
+                'returncode': os.waitstatus_to_exitcode(status),
+                'cpu_seconds': usage.ru_utime + usage.ru_stime,
+                'maxrss': usage.ru_maxrss
+            })
+
+    threading.Thread(target=reap, daemon=True).start()
+    try:
+        while True:
+            data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+            if not data:
+                break
+            request = json.loads(data)
+            try:
+                with changed:
+                    pid = start_child(request, fds)
+                    children.add(pid)
+                    changed.notify()
+                send({'event': 'spawned', 'id': request['id'], 'pid': pid})
+            except OSError as e:
+                send({'event': 'spawned', 'id': request['id'], 'pid': None, 'error': str(e)})
+            finally:
+                for fd in fds:
+                    os.close(fd)
+    finally:
+        with changed:
+            running = list(children)
+        for pid in running:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import io
+import os
+import re
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import mimetypes
+import posixpath
+import subprocess
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz variants are written
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps, features as image_features
+except ImportError:  # optional; without it images are fingerprinted but not resized
+    Image = None
+
+logger = logging.getLogger('portfolio.assets')
+
+BUILD_DIR = 'build'
+MANIFEST_FILE = 'manifest.json'
+
+# Text formats worth precompressing; images and fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico'}
+
+# Served variants in order of preference, with the suffix of their file
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+# Widths (px) of the resized copies; the source's own width is always included
+IMAGE_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+# Pillow format, extension, mimetype and encoder options per output format, in the
+# order <picture> offers them; JPEG or PNG (for images with transparency) is the fallback
+IMAGE_FORMATS = {
+    'avif': ('AVIF', '.avif', 'image/avif', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', '.webp', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', '.png', 'image/png', {'optimize': True})
+}
+
+
+# Removes comments and whitespace from a stylesheet, leaving strings alone. Spaces are
+# kept wherever they can mean something (descendant selectors, `and (`, calc()).
+def minify_css(text):
+    out = []
+    pending_space = False
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            pending_space = True
+            continue
+        if c.isspace():
+            pending_space = True
+            i += 1
+            continue
+        last = out[-1][-1] if out else ''
+        if pending_space and last and last not in '{};,>:' and c not in '{};,>':
+            out.append(' ')
+        pending_space = False
+        if c in '"\'':
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+            continue
+        if c == '}' and last == ';':
+            out.pop()
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+# Previous tokens after which `/` starts a regular expression rather than a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                  'throw', 'instanceof', 'yield', 'await'}
+# Space next to these characters never separates two tokens that would otherwise merge
+JS_PUNCTUATION = set('{}()[];,:=<>?!&|*%^~')
+
+def _skip_string(text, i, quote):
+    n = len(text)
+    j = i + 1
+    while j < n and text[j] != quote:
+        j += 2 if text[j] == '\\' else 1
+    return j + 1
+
+def _skip_regex(text, i):
+    n = len(text)
+    j = i + 1
+    in_class = False
+    while j < n:
+        c = text[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            break
+        elif c == '\n':
+            break
+        j += 1
+    j += 1
+    while j < n and (text[j].isalnum() or text[j] == '_'):
+        j += 1
+    return j
+
+# Scans a template literal from i (just after ` or the } closing a ${}); returns the
+# index after it and whether it stopped at a ${ rather than at the closing `
+def _skip_template(text, i):
+    n = len(text)
+    j = i
+    while j < n:
+        c = text[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '`':
+            return j + 1, True
+        if text.startswith('${', j):
+            return j + 2, False
+        j += 1
+    return n, True
+
+# Conservative JavaScript minifier: drops comments, indentation and blank lines and
+# collapses runs of spaces, but keeps line breaks that automatic semicolon insertion
+# may depend on. Strings, template literals and regular expressions are copied as is.
+def minify_js(text):
+    out = []
+    pending = ''
+    templates = []  # brace depth at which each open ${...} closes
+    depth = 0
+    i, n = 0, len(text)
+
+    def last_char():
+        return out[-1][-1] if out else ''
+
+    def last_word():
+        match = re.search(r'[A-Za-z_$][\w$]*$', out[-1]) if out else None
+        return match.group(0) if match else ''
+
+    def flush(next_char):
+        last = last_char()
+        if not last or not pending:
+            return
+        if pending == '\n':
+            if last not in '{;,([' and next_char not in '})]':
+                out.append('\n')
+                return
+        if last in JS_PUNCTUATION or next_char in JS_PUNCTUATION:
+            return
+        out.append(' ')
+
+    while i < n:
+        c = text[i]
+        if c in ' \t\r\n\f\v':
+            if c == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+            continue
+        if text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if '\n' in text[i:end]:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i = end
+            continue
+        flush(c)
+        pending = ''
+        if c in '"\'':
+            j = _skip_string(text, i, c)
+            out.append(text[i:j])
+            i = j
+        elif c == '`':
+            j, ended = _skip_template(text, i + 1)
+            out.append(text[i:j])
+            if not ended:
+                templates.append(depth)
+            i = j
+        elif c == '/' and (last_char() in REGEX_PRECEDERS or not out or last_word() in REGEX_KEYWORDS):
+            j = _skip_regex(text, i)
+            out.append(text[i:j])
+            i = j
+        elif c == '{':
+            depth += 1
+            out.append(c)
+            i += 1
+        elif c == '}':
+            if templates and templates[-1] == depth:
+                templates.pop()
+                j, ended = _skip_template(text, i + 1)
+                out.append(text[i:j])
+                if not ended:
+                    templates.append(depth)
+                i = j
+            else:
+                depth -= 1
+                out.append(c)
+                i += 1
+        else:
+            j = i + 1
+            while j < n and (text[j].isalnum() or text[j] in '_$'):
+                j += 1
+            out.append(text[i:j])
+            i = j
+    return ''.join(out) + '\n'
+
+# Parses a minified script with `node --check` when node is installed; None when it
+# cannot be checked
+def js_syntax_ok(source):
+    node = shutil.which('node')
+    if node is None:
+        return None
+    with tempfile.NamedTemporaryFile('w', suffix='.js', encoding='utf-8', delete=False) as f:
+        f.write(source)
+    try:
+        return subprocess.run([node, '--check', f.name], capture_output=True, timeout=30).returncode == 0
+    finally:
+        os.unlink(f.name)
+
+
+def fingerprint(name, data):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def is_external(url):
+    return url.startswith(('data:', 'http:', 'https:', '//', '#')) or not url
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+# Builds every file under static_folder (except the build directory itself) into
+# <static_folder>/build/: CSS and JS minified, every name fingerprinted with the hash of
+# its content, text formats written again as .gz and, with the brotli package, .br.
+# Relative url() references in stylesheets are rewritten to the fingerprinted names.
+# The result is described in build/manifest.json:
+#   {"files": {"css/main.css": {"path": "build/css/main.<hash>.css",
+#                               "encodings": ["br", "gzip"], "sizes": {...}}}, "built": ...}
+# Files from earlier builds stay in place (pages cached by browsers may still link to
+# them) unless clean=True.
+class AssetBuilder:
+    def __init__(self, static_folder, clean=False):
+        self.static_folder = static_folder
+        self.build_folder = os.path.join(static_folder, BUILD_DIR)
+        self.clean = clean
+        self.files = {}
+        self.sources = set()
+
+    def source_names(self):
+        names = []
+        for root, dirs, files in os.walk(self.static_folder):
+            if os.path.abspath(root) == os.path.abspath(self.static_folder):
+                dirs[:] = [d for d in dirs if d != BUILD_DIR]
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(root, filename)
+                names.append(os.path.relpath(path, self.static_folder).replace(os.sep, '/'))
+        return names
+
+    def build(self):
+        if self.clean:
+            shutil.rmtree(self.build_folder, ignore_errors=True)
+        names = self.source_names()
+        self.sources = set(names)
+        for name in names:
+            self.build_file(name)
+        manifest = {'files': self.files, 'built': time.time()}
+        os.makedirs(self.build_folder, exist_ok=True)
+        path = os.path.join(self.build_folder, MANIFEST_FILE)
+        with tempfile.NamedTemporaryFile('w', dir=self.build_folder, suffix='.tmp', encoding='utf-8',
+                                         delete=False) as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(f.name, path)
+        return manifest
+
+    def build_file(self, name, parents=()):
+        if name in self.files:
+            return self.files[name]
+        with open(os.path.join(self.static_folder, name), 'rb') as f:
+            original = f.read()
+        ext = posixpath.splitext(name)[1].lower()
+        data = original
+        if ext == '.css':
+            text = minify_css(original.decode('utf-8'))
+            data = self.rewrite_urls(name, text, parents + (name,)).encode('utf-8')
+        elif ext == '.js':
+            minified = minify_js(original.decode('utf-8'))
+            if js_syntax_ok(minified) is False:
+                logger.warning('assets.minify_failed file=%s', name)
+            else:
+                data = minified.encode('utf-8')
+
+        built = posixpath.join(BUILD_DIR, fingerprint(name, data))
+        write_file(os.path.join(self.static_folder, built), data)
+        entry = {'path': built, 'encodings': [], 'sizes': {'source': len(original), 'built': len(data)}}
+        if ext in IMAGE_EXTENSIONS and Image is not None:
+            entry.update(self.build_image(name, original))
+        if ext in COMPRESSIBLE:
+            variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            for encoding, suffix in ENCODINGS:
+                compressed = variants.get(encoding)
+                # Tiny files can come out larger than they went in
+                if compressed is not None and len(compressed) < len(data):
+                    write_file(os.path.join(self.static_folder, built + suffix), compressed)
+                    entry['encodings'].append(encoding)
+                    entry['sizes'][encoding] = len(compressed)
+        self.files[name] = entry
+        return entry
+
+    # Resized copies of an image at IMAGE_WIDTHS in every format Pillow can write here.
+    # Their names hash the source and the encoder settings, so unchanged images are not
+    # re-encoded (AVIF is slow) on the next build.
+    def build_image(self, name, original):
+        with Image.open(io.BytesIO(original)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+        width, height = image.size
+        transparent = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        formats = [f for f in ('avif', 'webp') if image_features.check(f)]
+        formats.append('png' if transparent else 'jpeg')
+        widths = [w for w in IMAGE_WIDTHS if w < width] + [width]
+        settings = json.dumps({f: IMAGE_FORMATS[f] for f in formats}, sort_keys=True).encode('utf-8')
+        root = posixpath.splitext(fingerprint(name, original + settings))[0]
+
+        variants = {}
+        for image_format in formats:
+            pil_format, extension, _, options = IMAGE_FORMATS[image_format]
+            variants[image_format] = []
+            for variant_width in widths:
+                path = posixpath.join(BUILD_DIR, f'{root}-{variant_width}w{extension}')
+                target = os.path.join(self.static_folder, path)
+                if not os.path.exists(target):
+                    resized = image
+                    if variant_width != width:
+                        resized = image.resize((variant_width, max(1, round(height * variant_width / width))),
+                                               Image.LANCZOS)
+                    if image_format == 'jpeg' and resized.mode != 'RGB':
+                        resized = resized.convert('RGB')
+                    buffer = io.BytesIO()
+                    resized.save(buffer, pil_format, **options)
+                    write_file(target, buffer.getvalue())
+                variants[image_format].append({'width': variant_width, 'path': path,
+                                               'bytes': os.path.getsize(target)})
+        return {'width': width, 'height': height, 'variants': variants}
+
+    # Points url() references at other static files to their fingerprinted copies
+    def rewrite_urls(self, name, text, parents):
+        directory = posixpath.dirname(name)
+
+        def replace(match):
+            quote, url = match.group(1), match.group(2).strip()
+            if is_external(url):
+                return match.group(0)
+            path, _, suffix = url.partition('?')
+            if path.startswith('/static/'):
+                target = path[len('/static/'):]
+            elif path.startswith('/'):
+                return match.group(0)
+            else:
+                target = posixpath.normpath(posixpath.join(directory, path))
+            if target not in self.sources or target in parents:
+                return match.group(0)
+            entry = self.build_file(target, parents)
+            if path.startswith('/static/'):
+                new = '/static/' + entry['path']
+            else:
+                new = posixpath.relpath(entry['path'], posixpath.join(BUILD_DIR, directory))
+            return f"url({quote}{new}{'?' + suffix if suffix else ''}{quote})"
+        return CSS_URL.sub(replace, text)
+
+
+# Runtime side of the build: maps source names to fingerprinted ones for url_for and
+# tells the static view which files are fingerprinted and which encodings they have.
+# The manifest is re-read when it changes on disk (checked at most once a second), so a
+# new build is picked up without a restart.
+class StaticAssets:
+    def __init__(self, static_folder, check_interval=1.0):
+        self.static_folder = static_folder
+        self.manifest_path = os.path.join(static_folder, BUILD_DIR, MANIFEST_FILE)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self._files = {}
+        self._built = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except OSError:
+                self._mtime, self._files, self._built = None, {}, {}
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    files = json.load(f)['files']
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning('assets.manifest_unreadable path=%s error=%r', self.manifest_path, e)
+                return
+            self._mtime = mtime
+            self._files = files
+            built = {}
+            for entry in files.values():
+                built[entry['path']] = entry
+                for variants in entry.get('variants', {}).values():
+                    for variant in variants:
+                        built[variant['path']] = {'encodings': []}
+            self._built = built
+
+    # Fingerprinted name for a source file, or the name itself when it is not built
+    def resolve(self, filename):
+        self._refresh()
+        entry = self._files.get(filename)
+        return entry['path'] if entry else filename
+
+    # (file to send, Content-Encoding or None, mimetype) for a fingerprinted file, picking
+    # the first variant with a non-zero quality in accepted (a werkzeug Accept); None for
+    # any other file
+    def variant(self, filename, accepted):
+        self._refresh()
+        entry = self._built.get(filename)
+        if entry is None:
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry['encodings'] and accepted[encoding] > 0:
+                return filename + suffix, encoding, mimetype
+        return filename, None, mimetype
+
+    # mtime (ns) of the manifest in use, None without a build; changes with every build
+    @property
+    def version(self):
+        self._refresh()
+        return self._mtime
+
+    # {'width', 'height', 'variants': {format: [{'width', 'path', 'bytes'}]}} for an image
+    # with resized copies in the build, else None
+    def image(self, filename):
+        self._refresh()
+        entry = self._files.get(filename)
+        if entry is None or 'variants' not in entry:
+            return None
+        return entry
+
+    def stats(self):
+        self._refresh()
+        return {
+            'manifest': self.manifest_path if self._mtime is not None else None,
+            'files': len(self._files),
+            'brotli': brotli is not None,
+            'images': Image is not None,
+            'sizes': {name: entry['sizes'] for name, entry in sorted(self._files.items())}
+        }